@@ -1,22 +1,191 @@
 from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
-from croniter import croniter
-from datetime import datetime
+from pydantic import BaseModel, Field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.cron import CronTime, compile_cron, cron_registry, resolve_datetime
 
 router = APIRouter()
 
 class CronCheckResponse(BaseModel):
     shouldRun: bool
 
+class CronCheckItem(BaseModel):
+    cron: str
+    datetime_str: Optional[str] = Field(None, description="ISO format datetime, defaults to the batch datetime_str")
+    id: Optional[str] = Field(None, description="Caller supplied identifier echoed in the result")
+
+class CronBatchRequest(BaseModel):
+    items: List[CronCheckItem] = Field(..., max_length=settings.CRON_BATCH_MAX_ITEMS)
+    datetime_str: Optional[str] = Field(None, description="ISO format datetime shared by items without their own")
+    tz: Optional[str] = Field(None, description="Timezone to evaluate in, e.g. Asia/Taipei")
+
+class CronCheckResult(BaseModel):
+    id: Optional[str] = None
+    cron: str
+    shouldRun: Optional[bool] = None
+    error: Optional[str] = None
+
+class CronBatchResponse(BaseModel):
+    results: List[CronCheckResult]
+
+class CronJob(BaseModel):
+    id: str
+    cron: str
+
+class CronJobsRequest(BaseModel):
+    jobs: List[CronJob] = Field(..., max_length=settings.CRON_BATCH_MAX_ITEMS)
+
+class CronJobsResponse(BaseModel):
+    registered: int
+    total: int
+    errors: Dict[str, str] = {}
+
+class CronDueResponse(BaseModel):
+    datetime_str: str
+    jobs: List[str]
+
+class CronWindowJob(BaseModel):
+    id: str
+    first_fire: str
+
+class CronWindowResponse(BaseModel):
+    start: str
+    end: str
+    jobs: List[CronWindowJob]
+
+class CronNextResponse(BaseModel):
+    cron: str
+    tz: Optional[str] = None
+    next: List[str]
+
 @router.get("/check", response_model=CronCheckResponse)
-def check_cron(cron: str = Query(..., description="Cron expression"), datetime_str: str = Query(..., description="ISO format datetime")):
+def check_cron(
+    cron: str = Query(..., description="Cron expression"),
+    datetime_str: str = Query(..., description="ISO format datetime"),
+    tz: Optional[str] = Query(None, description="Timezone to evaluate in, e.g. Asia/Taipei")
+):
+    try:
+        dt = resolve_datetime(datetime_str, tz)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid datetime format or timezone. Use ISO format.")
+    try:
+        # 解析過的表達式會被快取，比對只需位元運算
+        should_run = compile_cron(cron).match(CronTime.from_datetime(dt))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cron expression.")
+    return CronCheckResponse(shouldRun=should_run)
+
+@router.post("/check/batch", response_model=CronBatchResponse)
+def check_cron_batch(request: CronBatchRequest):
+    """
+    一次比對多個 (cron, 時間)
+    - 項目沒有 datetime_str 時使用 request 的 datetime_str（多個表達式比對同一時間）
+    - 單一項目無效時只在該項目回傳 error
+    """
+    # 相同時間只解析一次
+    times: Dict[str, CronTime] = {}
+    results = []
+    for item in request.items:
+        value = item.datetime_str or request.datetime_str
+        if value is None:
+            results.append(CronCheckResult(id=item.id, cron=item.cron, error="Missing datetime_str"))
+            continue
+        if value not in times:
+            try:
+                times[value] = CronTime.from_datetime(resolve_datetime(value, request.tz))
+            except Exception:
+                results.append(CronCheckResult(id=item.id, cron=item.cron, error="Invalid datetime format or timezone. Use ISO format."))
+                continue
+        try:
+            should_run = compile_cron(item.cron).match(times[value])
+        except Exception:
+            results.append(CronCheckResult(id=item.id, cron=item.cron, error="Invalid cron expression."))
+            continue
+        results.append(CronCheckResult(id=item.id, cron=item.cron, shouldRun=should_run))
+    return CronBatchResponse(results=results)
+
+@router.get("/next", response_model=CronNextResponse)
+def next_cron(
+    cron: str = Query(..., description="Cron expression"),
+    count: int = Query(5, ge=1, le=settings.CRON_NEXT_MAX_COUNT, description="Number of fire times"),
+    datetime_str: Optional[str] = Query(None, description="ISO format start datetime, defaults to now"),
+    tz: Optional[str] = Query(None, description="Timezone to evaluate in, e.g. Asia/Taipei")
+):
+    """
+    回傳 datetime_str 之後的下 count 個觸發時間
+    - 永遠不會觸發的表達式（例如 0 0 31 2 *）回傳空清單
+    """
     try:
-        dt = datetime.fromisoformat(datetime_str)
+        # 未指定開始時間時使用現在時間（指定時區時換算為該時區）
+        now = datetime.now(timezone.utc) if tz else datetime.now()
+        start = resolve_datetime(datetime_str or now.isoformat(), tz)
     except Exception:
-        raise HTTPException(status_code=400, detail="Invalid datetime format. Use ISO format.")
+        raise HTTPException(status_code=400, detail="Invalid datetime format or timezone. Use ISO format.")
     try:
-        # croniter.match returns True if dt matches the cron expression
-        should_run = croniter.match(cron, dt)
+        compiled = compile_cron(cron)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid cron expression.")
-    return CronCheckResponse(shouldRun=should_run) 
\ No newline at end of file
+    return CronNextResponse(cron=cron, tz=tz, next=[moment.isoformat() for moment in compiled.next_times(start, count)])
+
+@router.put("/jobs", response_model=CronJobsResponse)
+def register_cron_jobs(request: CronJobsRequest):
+    """
+    註冊或取代排程工作（以 id 識別），之後可用 /jobs/due 與 /jobs/window 查詢
+    - 超過工作數量上限時整批不註冊
+    """
+    try:
+        errors = cron_registry.register_many([(job.id, job.cron) for job in request.jobs])
+    except OverflowError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return CronJobsResponse(registered=len(request.jobs) - len(errors), total=len(cron_registry), errors=errors)
+
+@router.get("/jobs", response_model=List[CronJob])
+def list_cron_jobs():
+    return cron_registry.jobs()
+
+@router.delete("/jobs/{job_id}", status_code=204)
+def delete_cron_job(job_id: str):
+    if not cron_registry.remove(job_id):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+@router.get("/jobs/due", response_model=CronDueResponse)
+def due_cron_jobs(
+    datetime_str: str = Query(..., description="ISO format datetime"),
+    tz: Optional[str] = Query(None, description="Timezone to evaluate in, e.g. Asia/Taipei")
+):
+    """
+    在 datetime_str 這一分鐘觸發的已註冊工作
+    """
+    try:
+        dt = resolve_datetime(datetime_str, tz)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid datetime format or timezone. Use ISO format.")
+    return CronDueResponse(datetime_str=dt.isoformat(), jobs=cron_registry.due(dt))
+
+@router.get("/jobs/window", response_model=CronWindowResponse)
+def window_cron_jobs(
+    start: str = Query(..., description="ISO format window start"),
+    end: str = Query(..., description="ISO format window end (inclusive)"),
+    tz: Optional[str] = Query(None, description="Timezone to evaluate in, e.g. Asia/Taipei")
+):
+    """
+    在 [start, end] 之間會觸發的已註冊工作，以及各自的第一次觸發時間
+    """
+    try:
+        start_dt = resolve_datetime(start, tz)
+        end_dt = resolve_datetime(end, tz)
+        if end_dt < start_dt:
+            raise ValueError("end before start")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid window. Use ISO format datetimes with start <= end.")
+    if end_dt - start_dt > timedelta(days=settings.CRON_WINDOW_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Window is longer than {settings.CRON_WINDOW_MAX_DAYS} days")
+    
+    fired = cron_registry.window(start_dt, end_dt)
+    jobs = sorted(fired.items(), key=lambda item: (item[1], item[0]))
+    return CronWindowResponse(
+        start=start_dt.isoformat(),
+        end=end_dt.isoformat(),
+        jobs=[CronWindowJob(id=job_id, first_fire=moment.isoformat()) for job_id, moment in jobs]
+    )
@@ -1,22 +1,30 @@
-import finnhub
-from fastapi import APIRouter, HTTPException, Query, WebSocket
-from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from app.core.config import settings
 from app.core.logging_config import setup_logger
+from app.core.rate_limit import RateLimitExceeded
+from app.core.responses import FastJSONResponse
+from app.services.finnhub_client import finnhub_client, FinnhubAPIException
+from app.services.finance_cache import finance_cache
+from app.services.news_store import news_store
+from app.services.ws_hub import ClientSubscriber, ws_hub
+from app.services.screener import screener, SORT_FIELDS as SCREENER_SORT_FIELDS
+from app.services.trade_bars import trade_bars, BAR_INTERVALS, RESOLUTION_INTERVALS
+from app.core.cache import LRUCache
+from app.services.candle_store import candle_store, SETTLE_SECONDS
+from app.services import candle_format, indicators
 import json
-import threading
 import time
 import asyncio
+import numpy as np
 
 # 設置日誌記錄器
 logger = setup_logger(__name__, "finance_api.log")
 
 router = APIRouter()
 
-# 初始化 Finnhub 客戶端
-finnhub_client = finnhub.Client(api_key="d0esb69r01qlbf85mkq0d0esb69r01qlbf85mkqg")
-
 # 預定義的股票列表
 POPULAR_US_STOCKS = [
     "AAPL", "MSFT", "GOOGL", "AMZN", "META",  # 科技股
@@ -47,7 +55,7 @@ async def list_stocks(
     - limit: 返回的最大股票數量
     """
     try:
-        logger.info(f"Fetching stocks for market: {market} with limit: {limit}")
+        logger.info("Fetching stocks for market: %s with limit: %s", market, limit)
         stocks = set()
         
         if market in ["all", "us"]:
@@ -63,161 +71,560 @@ async def list_stocks(
         if limit > 0:
             stock_list = stock_list[:limit]
         
-        logger.info(f"Successfully fetched {len(stock_list)} stocks")
+        logger.info("Successfully fetched %s stocks", len(stock_list))
         return {
             "total": len(stock_list),
             "market": market,
             "stocks": stock_list
         }
     except Exception as e:
-        logger.error(f"Failed to fetch stocks: {str(e)}", exc_info=True)
+        logger.error("Failed to fetch stocks: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to fetch stocks: {str(e)}")
 
+@router.get("/screener")
+async def screen_stocks(
+    market: Optional[str] = Query(None, description="Market (us, tw)"),
+    sector: Optional[str] = Query(None, description="Comma separated sectors"),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    min_change: Optional[float] = Query(None, description="Minimum change percent"),
+    max_change: Optional[float] = Query(None, description="Maximum change percent"),
+    min_volume: Optional[float] = Query(None),
+    max_volume: Optional[float] = Query(None),
+    min_market_cap: Optional[float] = Query(None, description="Minimum market cap (millions)"),
+    max_market_cap: Optional[float] = Query(None, description="Maximum market cap (millions)"),
+    sort: str = Query("change_percent", description="Sort field (price, change_percent, volume, market_cap, symbol)"),
+    order: str = Query("desc", description="Sort order (asc, desc)"),
+    limit: int = Query(20, ge=1, le=500, description="Number of results")
+):
+    """
+    從背景更新的快照篩選股票
+    - 請求不會呼叫上游，資料新舊見 snapshot.oldest_age_seconds
+    """
+    if sort not in SCREENER_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort. Choose from: {', '.join(SCREENER_SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Invalid order. Choose from: asc, desc")
+    if market and market.lower() not in ("us", "tw"):
+        raise HTTPException(status_code=400, detail="Invalid market. Choose from: us, tw")
+    
+    result = screener.query(
+        market=market,
+        sectors=[s for s in sector.split(",") if s.strip()] if sector else None,
+        ranges={
+            "price": (min_price, max_price),
+            "change_percent": (min_change, max_change),
+            "volume": (min_volume, max_volume),
+            "market_cap": (min_market_cap, max_market_cap),
+        },
+        sort=sort,
+        descending=order == "desc",
+        limit=limit,
+    )
+    return {"snapshot": screener.stats(), **result}
+
+def normalize_symbol(symbol: str) -> str:
+    """處理台股代碼：純數字代碼加上 .TW"""
+    symbol = symbol.strip().upper()
+    if not symbol.endswith('.TW') and symbol.isdigit():
+        symbol = f"{symbol}.TW"
+    return symbol
+
+def format_quote(quote: Dict[str, Any]) -> Dict[str, Any]:
+    """將 Finnhub quote 轉換為回應中的價格欄位"""
+    return {
+        "current_price": quote.get('c', 0),
+        "previous_close": quote.get('pc', 0),
+        "open": quote.get('o', 0),
+        "day_high": quote.get('h', 0),
+        "day_low": quote.get('l', 0),
+        "volume": quote.get('t', 0),
+        "fifty_two_week_high": quote.get('h52', 0),
+        "fifty_two_week_low": quote.get('l52', 0),
+    }
+
+@router.get("/quotes")
+async def get_quotes(
+    symbols: Optional[str] = Query(None, description="Comma-separated symbols"),
+    market: Optional[str] = Query(None, description="Popular stocks of a market (all, us, tw)")
+):
+    """
+    批次獲取多個股票的報價
+    - symbols 與 market 可同時使用，重複的代碼只查詢一次
+    - 上游請求依共用的配額排程，已快取的報價直接回傳
+    - 個別股票失敗時以 status 標示，不影響其他股票
+    """
+    try:
+        requested: List[str] = []
+        if symbols:
+            requested.extend(symbol for symbol in symbols.split(",") if symbol.strip())
+        if market:
+            if market not in ("all", "us", "tw"):
+                raise HTTPException(status_code=400, detail="Invalid market. Choose from: all, us, tw")
+            if market in ["all", "us"]:
+                requested.extend(POPULAR_US_STOCKS)
+            if market in ["all", "tw"]:
+                requested.extend(POPULAR_TW_STOCKS)
+        if not requested:
+            raise HTTPException(status_code=400, detail="Either symbols or market is required")
+        
+        # 去除重複的代碼並保留順序
+        unique_symbols = list(dict.fromkeys(normalize_symbol(symbol) for symbol in requested))
+        if len(unique_symbols) > settings.FINANCE_QUOTES_MAX_SYMBOLS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many symbols ({len(unique_symbols)}), maximum is {settings.FINANCE_QUOTES_MAX_SYMBOLS}"
+            )
+        
+        logger.info("Fetching quotes for %s symbols", len(unique_symbols))
+        results, errors = await fetch_concurrently(
+            {symbol: finance_cache.quote(symbol) for symbol in unique_symbols},
+            settings.FINANCE_QUOTES_TIMEOUT
+        )
+        
+        quotes = []
+        for symbol in unique_symbols:
+            item: Dict[str, Any] = {
+                "symbol": symbol,
+                "currency": "TWD" if symbol.endswith('.TW') else "USD",
+            }
+            if symbol in errors:
+                error = errors[symbol]
+                item["status"] = "rate_limited" if error == "rate_limited" else "error"
+                item["error"] = error
+            elif not results[symbol] or not results[symbol].get('t'):
+                item["status"] = "not_found"
+            else:
+                item["status"] = "ok"
+                item.update(format_quote(results[symbol]))
+            quotes.append(item)
+        
+        succeeded = sum(1 for item in quotes if item["status"] == "ok")
+        logger.info("Successfully fetched %s/%s quotes", succeeded, len(quotes))
+        return {
+            "total": len(quotes),
+            "succeeded": succeeded,
+            "partial": succeeded < len(quotes),
+            "quotes": quotes,
+            "timestamp": datetime.now().isoformat()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to fetch quotes: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch quotes: {str(e)}")
+
+# /stock/{symbol} 可選擇的資料區塊
+STOCK_INFO_PARTS = ("quote", "profile", "news")
+
+async def fetch_concurrently(calls: Dict[str, Awaitable], timeout: float) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    同時執行多個上游請求，每個請求各自逾時
+
+    Returns:
+        (成功的結果, 失敗的原因)
+    """
+    names = list(calls)
+    outcomes = await asyncio.gather(
+        *(asyncio.wait_for(calls[name], timeout=timeout) for name in names),
+        return_exceptions=True
+    )
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            errors[name] = "timeout"
+        elif isinstance(outcome, RateLimitExceeded) or (
+            isinstance(outcome, FinnhubAPIException) and outcome.status_code == 429
+        ):
+            errors[name] = "rate_limited"
+        elif isinstance(outcome, Exception):
+            errors[name] = str(outcome)
+        else:
+            results[name] = outcome
+    return results, errors
+
 @router.get("/stock/{symbol}")
-async def get_stock_info(symbol: str):
+async def get_stock_info(
+    symbol: str,
+    include: str = Query("quote,profile,news", description="Comma-separated parts to fetch (quote, profile, news)")
+):
     """
     獲取特定股票的詳細信息
+    - include: 需要的資料區塊，只要價格時用 include=quote 可略過新聞與公司資料
+    - 部分上游請求逾時或失敗時仍回傳其餘資料，並以 partial 與 errors 標示
     """
     try:
-        logger.info(f"Fetching stock info for symbol: {symbol}")
+        logger.info("Fetching stock info for symbol: %s", symbol)
+        
+        parts = [part.strip() for part in include.split(",") if part.strip()]
+        unknown = [part for part in parts if part not in STOCK_INFO_PARTS]
+        if unknown or not parts:
+            raise HTTPException(status_code=400, detail=f"Invalid include value. Choose from: {', '.join(STOCK_INFO_PARTS)}")
         
         # 處理台股代碼
         if not symbol.endswith('.TW') and symbol.isdigit():
             symbol = f"{symbol}.TW"
         
-        # 獲取股票基本信息
-        quote = finnhub_client.quote(symbol)
-        company_profile = finnhub_client.company_profile2(symbol=symbol)
+        # 同時獲取股票報價、公司資料與新聞
+        calls = {}
+        if "quote" in parts:
+            calls["quote"] = finance_cache.quote(symbol)
+        if "profile" in parts:
+            calls["profile"] = finance_cache.company_profile2(symbol=symbol)
+        if "news" in parts:
+            calls["news"] = finance_cache.company_news(symbol, _from=(datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d'),
+                                                       to=datetime.now().strftime('%Y-%m-%d'))
+        results, errors = await fetch_concurrently(calls, settings.FINNHUB_SUBCALL_TIMEOUT)
         
-        if not quote or not company_profile:
+        if not results:
+            raise HTTPException(status_code=502, detail=f"All upstream requests failed: {errors}")
+        if ("quote" in results and not results["quote"]) or ("profile" in results and not results["profile"]):
             raise HTTPException(status_code=404, detail=f"No data found for symbol {symbol}")
+        if errors:
+            logger.warning("Partial stock info for %s: %s", symbol, errors)
         
-        # 獲取股票新聞
-        news = finnhub_client.company_news(symbol, _from=(datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d'),
-                                         to=datetime.now().strftime('%Y-%m-%d'))
-        
-        return {
+        info = {
             "symbol": symbol,
-            "name": company_profile.get('name', ''),
-            "current_price": quote.get('c', 0),
             "currency": "TWD" if symbol.endswith('.TW') else "USD",
-            "market_cap": company_profile.get('marketCapitalization', 0),
-            "sector": company_profile.get('finnhubIndustry', ''),
-            "industry": company_profile.get('finnhubIndustry', ''),
-            "exchange": company_profile.get('exchange', ''),
-            "previous_close": quote.get('pc', 0),
-            "open": quote.get('o', 0),
-            "day_high": quote.get('h', 0),
-            "day_low": quote.get('l', 0),
-            "volume": quote.get('t', 0),
-            "fifty_two_week_high": quote.get('h52', 0),
-            "fifty_two_week_low": quote.get('l52', 0),
-            "pe_ratio": company_profile.get('pe', 0),
-            "eps": company_profile.get('eps', 0),
-            "beta": company_profile.get('beta', 0),
-            "latest_news": news[:5] if news else [],
-            "timestamp": datetime.now().isoformat()
         }
+        if "quote" in results:
+            info.update(format_quote(results["quote"]))
+        if "profile" in results:
+            company_profile = results["profile"]
+            info.update({
+                "name": company_profile.get('name', ''),
+                "market_cap": company_profile.get('marketCapitalization', 0),
+                "sector": company_profile.get('finnhubIndustry', ''),
+                "industry": company_profile.get('finnhubIndustry', ''),
+                "exchange": company_profile.get('exchange', ''),
+                "pe_ratio": company_profile.get('pe', 0),
+                "eps": company_profile.get('eps', 0),
+                "beta": company_profile.get('beta', 0),
+            })
+        if "news" in parts:
+            news = results.get("news")
+            info["latest_news"] = news[:5] if news else []
+        info.update({
+            "partial": bool(errors),
+            "errors": errors,
+            "timestamp": datetime.now().isoformat()
+        })
+        return info
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to fetch stock info for {symbol}: {str(e)}", exc_info=True)
+        logger.error("Failed to fetch stock info for %s: %s", symbol, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to fetch stock info: {str(e)}")
 
+# 支援的 K 線週期（分鐘、日、週、月）
+HISTORY_RESOLUTIONS = ("1", "5", "15", "30", "60", "D", "W", "M")
+HISTORY_FORMATS = ("rows", "columnar", "csv")
+HISTORY_SOURCES = ("store", "live", "auto")
+
+def resolve_history_range(symbol: str, from_date: Optional[str], to_date: Optional[str], resolution: str) -> Tuple[str, str, str, int, int]:
+    """
+    處理台股代碼與查詢區間（預設過去 30 天）
+
+    Returns:
+        (symbol, from_date, to_date, from_ts, to_ts)
+    """
+    if not symbol.endswith('.TW') and symbol.isdigit():
+        symbol = f"{symbol}.TW"
+    
+    if not from_date:
+        from_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    if not to_date:
+        to_date = datetime.now().strftime('%Y-%m-%d')
+    
+    try:
+        from_ts = int(datetime.strptime(from_date, '%Y-%m-%d').timestamp())
+        to_ts = int(datetime.strptime(to_date, '%Y-%m-%d').timestamp())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    if resolution.isdigit():
+        # 分鐘線包含 to_date 整天
+        to_ts += 86400 - 1
+    return symbol, from_date, to_date, from_ts, to_ts
+
 @router.get("/stock/{symbol}/history")
 async def get_stock_history(
     symbol: str,
     from_date: str = Query(None, description="Start date (YYYY-MM-DD)"),
-    to_date: str = Query(None, description="End date (YYYY-MM-DD)")
+    to_date: str = Query(None, description="End date (YYYY-MM-DD)"),
+    resolution: str = Query("D", description="Candle resolution (1, 5, 15, 30, 60, D, W, M)"),
+    format: str = Query("rows", description="Response format (rows, columnar, csv)"),
+    source: str = Query("store", description="Data source (store, live, auto)")
 ):
     """
     獲取股票的歷史數據
+    - resolution: K 線週期，分鐘線會包含 to_date 當天的資料
+    - format: rows（逐筆）、columnar（t/o/h/l/c/v 陣列）、csv
+    - source: store（本機 K 線儲存）、live（即時成交聚合的 1/5 分鐘線）、
+      auto（即時聚合涵蓋的部分使用 live，其餘使用 store）
+    - 資料量大時以串流方式回傳
     """
     try:
-        # 處理台股代碼
-        if not symbol.endswith('.TW') and symbol.isdigit():
-            symbol = f"{symbol}.TW"
+        if resolution not in HISTORY_RESOLUTIONS:
+            raise HTTPException(status_code=400, detail=f"Invalid resolution. Choose from: {', '.join(HISTORY_RESOLUTIONS)}")
+        if format not in HISTORY_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid format. Choose from: {', '.join(HISTORY_FORMATS)}")
+        if source not in HISTORY_SOURCES:
+            raise HTTPException(status_code=400, detail=f"Invalid source. Choose from: {', '.join(HISTORY_SOURCES)}")
+        if source == "live" and resolution not in RESOLUTION_INTERVALS:
+            raise HTTPException(status_code=400, detail=f"Live source supports resolutions: {', '.join(RESOLUTION_INTERVALS)}")
+        
+        symbol, from_date, to_date, from_ts, to_ts = resolve_history_range(symbol, from_date, to_date, resolution)
         
-        # 如果沒有指定日期，使用過去30天
-        if not from_date:
-            from_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        if not to_date:
-            to_date = datetime.now().strftime('%Y-%m-%d')
+        # 即時聚合的 K 線（當日盤中不需向上游取得）
+        live = None
+        if source != "store" and resolution in RESOLUTION_INTERVALS:
+            live = trade_bars.bars(symbol, RESOLUTION_INTERVALS[resolution], from_ts, to_ts)
         
-        # 獲取歷史數據
-        hist = finnhub_client.stock_candles(symbol, 'D', int(datetime.strptime(from_date, '%Y-%m-%d').timestamp()),
-                                          int(datetime.strptime(to_date, '%Y-%m-%d').timestamp()))
+        if source == "live" or (live is not None and live["t"].size and live["t"][0] <= from_ts):
+            arrays = live if live is not None else candle_format.to_arrays({})
+        else:
+            # 獲取歷史數據（本機已有的區間直接讀取，只向上游補缺口），即時聚合涵蓋的部分不再向上游取得
+            store_to = int(live["t"][0]) - 1 if live is not None and live["t"].size else to_ts
+            hist = await candle_store.get_candles(symbol, resolution, from_ts, store_to)
+            # 以 NumPy 陣列批次格式化數據
+            arrays = candle_format.to_arrays(hist)
+            if live is not None and live["t"].size:
+                arrays = {key: np.concatenate([arrays[key], live[key]]) for key in arrays}
         
-        if hist['s'] != 'ok':
+        if arrays["t"].size == 0:
             raise HTTPException(status_code=404, detail=f"No historical data found for symbol {symbol}")
         
-        # 格式化數據
-        history_data = []
-        for i in range(len(hist['t'])):
-            history_data.append({
-                "date": datetime.fromtimestamp(hist['t'][i]).strftime("%Y-%m-%d %H:%M:%S"),
-                "open": hist['o'][i],
-                "high": hist['h'][i],
-                "low": hist['l'][i],
-                "close": hist['c'][i],
-                "volume": hist['v'][i]
-            })
+        header = {
+            "symbol": symbol,
+            "from_date": from_date,
+            "to_date": to_date,
+            "resolution": resolution,
+        }
+        
+        if format == "csv":
+            filename = f"{symbol}_{resolution}_{from_date}_{to_date}.csv"
+            return StreamingResponse(
+                candle_format.iter_csv(arrays),
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+            )
+        
+        if arrays["t"].size > settings.HISTORY_STREAM_THRESHOLD:
+            # 大範圍資料分段串流，避免一次建立完整的回應
+            iterator = (candle_format.iter_columnar_json if format == "columnar" else candle_format.iter_rows_json)(header, arrays)
+            return StreamingResponse(iterator, media_type="application/json")
+        
+        # 資料量大，直接序列化以省略 jsonable_encoder
+        if format == "columnar":
+            return FastJSONResponse({**header, **candle_format.columnar(arrays)})
+        return FastJSONResponse({**header, "data": candle_format.rows(arrays)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to fetch stock history for %s: %s", symbol, e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to fetch stock history: {str(e)}")
+
+@router.post("/stock/{symbol}/bars/track")
+async def track_stock_bars(symbol: str):
+    """
+    開始聚合股票的即時成交（向上游訂閱，之後的成交才會出現在 /bars）
+    - 啟動時就要追蹤的股票可設定 TRADE_BARS_SYMBOLS
+    """
+    symbol = normalize_symbol(symbol)
+    if not await trade_bars.track(symbol):
+        raise HTTPException(status_code=503, detail="Too many tracked symbols")
+    return {"symbol": symbol, "tracking": True}
+
+@router.delete("/stock/{symbol}/bars/track")
+async def untrack_stock_bars(symbol: str):
+    """
+    停止聚合股票的即時成交（已聚合的 K 線保留到被淘汰為止）
+    """
+    symbol = normalize_symbol(symbol)
+    if not await trade_bars.untrack(symbol):
+        raise HTTPException(status_code=404, detail=f"Symbol {symbol} is not tracked")
+    return {"symbol": symbol, "tracking": False}
+
+@router.get("/stock/{symbol}/bars")
+async def get_stock_bars(
+    symbol: str,
+    interval: str = Query("1m", description="Bar interval (1s, 1m, 5m)"),
+    limit: int = Query(120, ge=1, le=10000, description="Number of latest bars"),
+):
+    """
+    獲取即時成交聚合的最新 K 線（欄位式）
+    - 只讀取已聚合的資料；尚未追蹤的股票需先 POST /stock/{symbol}/bars/track
+    """
+    if interval not in BAR_INTERVALS:
+        raise HTTPException(status_code=400, detail=f"Invalid interval. Choose from: {', '.join(BAR_INTERVALS)}")
+    symbol = normalize_symbol(symbol)
+    
+    arrays = trade_bars.bars(symbol, interval, limit=limit)
+    if arrays is None:
+        arrays = candle_format.to_arrays({})
+    return {
+        "symbol": symbol,
+        "interval": interval,
+        "tracking": symbol in trade_bars.tracked,
+        **candle_format.columnar(arrays)
+    }
+
+def indicator_nbytes(value: Any) -> int:
+    """快取值（NumPy 陣列或其 dict）的大小"""
+    if isinstance(value, dict):
+        return sum(line.nbytes for line in value.values())
+    return value.nbytes
+
+# 技術指標結果快取，key 為 (股票, 週期, 區間, 時間軸版本, 指標與參數)
+# 時間軸與指標以 NumPy 陣列保存，依實際大小限制總量，回應時才轉為 JSON 值
+indicator_cache = LRUCache(
+    max_entries=settings.INDICATOR_CACHE_MAX_ENTRIES,
+    ttl=settings.INDICATOR_CACHE_TTL,
+    max_bytes=settings.INDICATOR_CACHE_MAX_BYTES,
+    sizeof=indicator_nbytes,
+)
+
+def axis_version(t: np.ndarray) -> str:
+    """時間軸版本（筆數與最後一根 K 線時間），K 線有增加時指標快取自然失效"""
+    return f"{t.size}:{int(t[-1]) if t.size else 0}"
+
+@router.get("/stock/{symbol}/indicators")
+async def get_stock_indicators(
+    symbol: str,
+    indicators_param: str = Query(
+        "sma:20,ema:20,rsi:14,macd:12:26:9,bbands:20:2",
+        alias="indicators",
+        description="Comma separated indicators with optional parameters (sma:20, ema:50, rsi:14, macd:12:26:9, bbands:20:2, vwap)"
+    ),
+    from_date: str = Query(None, description="Start date (YYYY-MM-DD)"),
+    to_date: str = Query(None, description="End date (YYYY-MM-DD)"),
+    resolution: str = Query("D", description="Candle resolution (1, 5, 15, 30, 60, D, W, M)")
+):
+    """
+    計算股票的技術指標
+    - 所有指標一次對同一份 K 線陣列計算，相同週期的中間結果共用
+    - 結果依 (股票, 週期, 區間, 指標) 快取，只計算未命中的指標
+    - 暖身期間（資料不足）的值為 null
+    """
+    try:
+        if resolution not in HISTORY_RESOLUTIONS:
+            raise HTTPException(status_code=400, detail=f"Invalid resolution. Choose from: {', '.join(HISTORY_RESOLUTIONS)}")
+        try:
+            specs = [indicators.IndicatorSpec.parse(text) for text in indicators_param.split(",") if text.strip()]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not specs:
+            raise HTTPException(status_code=400, detail="No indicators requested")
+        if len(specs) > settings.INDICATOR_MAX_PER_REQUEST:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many indicators (max {settings.INDICATOR_MAX_PER_REQUEST})"
+            )
+        
+        symbol, from_date, to_date, from_ts, to_ts = resolve_history_range(symbol, from_date, to_date, resolution)
+        prefix = f"{symbol}|{resolution}|{from_ts}|{to_ts}"
+        
+        # 區間內 K 線皆已定案時結果不會再變動，可快取較久
+        settled = to_ts <= time.time() - SETTLE_SECONDS.get(resolution, 86400)
+        ttl = settings.INDICATOR_CACHE_TTL_SETTLED if settled else settings.INDICATOR_CACHE_TTL
+        
+        # 指標 key 帶有時間軸版本，只會取用與目前時間軸對齊的結果
+        axis = indicator_cache.get(f"{prefix}|axis")
+        version = axis_version(axis) if axis is not None else None
+        results = {
+            spec.key: indicator_cache.get(f"{prefix}|{version}|{spec.key}") if version is not None else None
+            for spec in specs
+        }
+        missing = [spec for spec in specs if results[spec.key] is None]
+        
+        if axis is None or missing:
+            hist = await candle_store.get_candles(symbol, resolution, from_ts, to_ts)
+            if hist['s'] != 'ok':
+                raise HTTPException(status_code=404, detail=f"No historical data found for symbol {symbol}")
+            arrays = candle_format.to_arrays(hist)
+            
+            def compute() -> Dict[str, Any]:
+                # K 線有更新時已快取的指標也要重新計算，確保與時間軸對齊
+                targets = missing if axis is not None and np.array_equal(axis, arrays["t"]) else specs
+                # 分鐘線的 VWAP 每個交易日重新累計
+                session = candle_format.format_dates(arrays["t"]).astype("<U10") if resolution.isdigit() else None
+                return indicators.compute_indicators(arrays, targets, session)
+            
+            computed = await asyncio.to_thread(compute)
+            axis = arrays["t"]
+            version = axis_version(axis)
+            indicator_cache.set(f"{prefix}|axis", axis, ttl=ttl)
+            for key, value in computed.items():
+                indicator_cache.set(f"{prefix}|{version}|{key}", value, ttl=ttl)
+                results[key] = value
+        
+        def serialize() -> Dict[str, Any]:
+            return {
+                "t": axis.tolist(),
+                "date": candle_format.format_dates(axis).tolist(),
+                "indicators": {key: indicators.serialize(value) for key, value in results.items()},
+            }
         
         return {
             "symbol": symbol,
             "from_date": from_date,
             "to_date": to_date,
-            "data": history_data
+            "resolution": resolution,
+            **await asyncio.to_thread(serialize),
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to fetch stock history for {symbol}: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Failed to fetch stock history: {str(e)}")
+        logger.error("Failed to compute indicators for %s: %s", symbol, e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to compute indicators: {str(e)}")
 
 @router.get("/stock/{symbol}/news")
-async def get_stock_news(symbol: str):
+async def get_stock_news(
+    symbol: str,
+    page: int = Query(1, ge=1, description="Page number (1-based)"),
+    page_size: int = Query(settings.NEWS_PAGE_SIZE, ge=1, le=settings.NEWS_MAX_PAGE_SIZE, description="News items per page")
+):
     """
     獲取股票的最新新聞
+    - 台股從背景更新的新聞索引查詢（依股票代碼與公司別名）
+    - 美股使用過去 7 天的公司新聞
     """
     try:
-        logger.info(f"Fetching news for symbol: {symbol}")
+        logger.info("Fetching news for symbol: %s", symbol)
         
         # 處理台股代碼
         is_tw_stock = False
-        if not symbol.endswith('.TW') and symbol.isdigit():
-            symbol = f"{symbol}.TW"
+        if symbol.isdigit() or symbol.upper().endswith('.TW'):
+            symbol = normalize_symbol(symbol)
             is_tw_stock = True
         
-        # 獲取過去7天的新聞
+        offset = (page - 1) * page_size
         try:
             if is_tw_stock:
-                # 對於台股，直接使用一般新聞並過濾
-                news = finnhub_client.general_news('general', min_id=0)
-                # 過濾相關新聞，包括股票代碼和公司名稱
-                filtered_news = []
-                for item in news:
-                    headline = item.get('headline', '').lower()
-                    summary = item.get('summary', '').lower()
-                    # 移除 .TW 後綴進行匹配
-                    symbol_base = symbol.replace('.TW', '')
-                    if (symbol_base in headline or symbol_base in summary or
-                        symbol in headline or symbol in summary):
-                        filtered_news.append(item)
-                news = filtered_news
+                # 對於台股，從新聞索引查詢
+                await news_store.ensure_loaded()
+                total, news = news_store.search(symbol, offset, page_size)
             else:
                 # 對於美股，使用公司新聞
-                news = finnhub_client.company_news(
+                company_news = await finance_cache.company_news(
                     symbol,
                     _from=(datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d'),
                     to=datetime.now().strftime('%Y-%m-%d')
                 )
+                total, news = len(company_news), company_news[offset:offset + page_size]
         except Exception as e:
-            logger.error(f"Error fetching news: {str(e)}")
-            news = []
+            logger.error("Error fetching news: %s", e)
+            total, news = 0, []
         
         if not news:
-            logger.warning(f"No news found for symbol {symbol}")
+            logger.warning("No news found for symbol %s", symbol)
             return {
                 "symbol": symbol,
-                "total_news": 0,
+                "total_news": total,
+                "page": page,
+                "page_size": page_size,
                 "news": [],
                 "message": "No news found for this symbol"
             }
@@ -236,32 +643,34 @@ async def get_stock_news(symbol: str):
                     "image": item.get('image', '')
                 })
             except Exception as e:
-                logger.error(f"Error formatting news item: {str(e)}")
+                logger.error("Error formatting news item: %s", e)
                 continue
         
-        logger.info(f"Successfully fetched {len(formatted_news)} news items for {symbol}")
+        logger.info("Successfully fetched %s news items for %s", len(formatted_news), symbol)
         return {
             "symbol": symbol,
-            "total_news": len(formatted_news),
+            "total_news": total,
+            "page": page,
+            "page_size": page_size,
             "news": formatted_news
         }
     except Exception as e:
-        logger.error(f"Failed to fetch stock news for {symbol}: {str(e)}", exc_info=True)
+        logger.error("Failed to fetch stock news for %s: %s", symbol, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to fetch stock news: {str(e)}")
 
 @router.get("/test/{symbol}")
 async def test_stock_fetch(symbol: str):
     """
-    測試股票資料獲取
+    測試股票資料獲取（直接呼叫上游，不經過快取）
     """
     try:
-        logger.info(f"Testing stock fetch for symbol: {symbol}")
+        logger.info("Testing stock fetch for symbol: %s", symbol)
         
         # 處理台股代碼
         if not symbol.endswith('.TW') and symbol.isdigit():
             symbol = f"{symbol}.TW"
             
-        stock = finnhub_client.quote(symbol)
+        stock = await finnhub_client.quote(symbol)
         info = stock
         
         return {
@@ -271,98 +680,103 @@ async def test_stock_fetch(symbol: str):
         }
         
     except Exception as e:
-        logger.error(f"Test failed for {symbol}: {str(e)}", exc_info=True)
+        logger.error("Test failed for %s: %s", symbol, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Test failed: {str(e)}")
 
+# 客戶端訂閱指令（與 Finnhub WebSocket 相同）-> (頻道, 是否訂閱)
+WS_CLIENT_ACTIONS = {
+    "subscribe": ("trade", True),
+    "unsubscribe": ("trade", False),
+    "subscribe-news": ("news", True),
+    "unsubscribe-news": ("news", False),
+}
+
 @router.websocket("/ws/test")
-async def websocket_test(websocket: WebSocket):
+async def websocket_test(
+    websocket: WebSocket,
+    symbols: str = Query("", description="Comma separated symbols to subscribe trades for"),
+    news: str = Query("AAPL,AMZN,MSFT,BYND", description="Comma separated symbols to subscribe news for"),
+    policy: str = Query(settings.WS_CLIENT_POLICY, description="Slow consumer policy (coalesce, drop_oldest, drop_newest)")
+):
     """
-    測試 WebSocket 連接
+    即時成交與新聞
+    - 所有客戶端共用一條上游 Finnhub 連線，只會收到自己訂閱的股票
+    - 連線後可送出 {"type": "subscribe" | "unsubscribe" | "subscribe-news" | "unsubscribe-news", "symbol": "AAPL"}
     """
     await websocket.accept()
+    try:
+        client = ClientSubscriber(websocket.send_text, policy=policy)
+    except ValueError as e:
+        await websocket.send_text(json.dumps({"type": "error", "msg": str(e)}))
+        await websocket.close(code=1008)
+        return
     
-    def on_message(ws, message):
-        try:
-            # 將消息發送到客戶端
-            asyncio.run(websocket.send_text(message))
-        except Exception as e:
-            logger.error(f"Error sending message: {str(e)}")
-    
-    def on_error(ws, error):
-        logger.error(f"WebSocket error: {str(error)}")
-        try:
-            asyncio.run(websocket.send_text(f"Error: {str(error)}"))
-        except Exception as e:
-            logger.error(f"Error sending error message: {str(e)}")
-    
-    def on_close(ws, close_status_code, close_msg):
-        logger.info("WebSocket connection closed")
-        try:
-            asyncio.run(websocket.send_text("Connection closed"))
-        except Exception as e:
-            logger.error(f"Error sending close message: {str(e)}")
-    
-    def on_open(ws):
-        logger.info("WebSocket connection opened")
-        # 訂閱股票新聞
-        symbols = ["AAPL", "AMZN", "MSFT", "BYND"]
-        for symbol in symbols:
-            ws.send(json.dumps({
-                "type": "subscribe-news",
-                "symbol": symbol
-            }))
-    
+    ws_hub.register(client)
     try:
-        # 創建 WebSocket 連接
-        ws = websocket.WebSocketApp(
-            "wss://ws.finnhub.io?token=d0esb69r01qlbf85mkq0d0esb69r01qlbf85mkqg",
-            on_message=on_message,
-            on_error=on_error,
-            on_close=on_close
-        )
-        ws.on_open = on_open
+        for channel, initial in (("trade", symbols), ("news", news)):
+            for symbol in filter(None, (normalize_symbol(s) for s in initial.split(","))):
+                await ws_hub.subscribe(client, channel, symbol)
         
-        # 在新線程中運行 WebSocket
-        ws_thread = threading.Thread(target=ws.run_forever)
-        ws_thread.daemon = True
-        ws_thread.start()
-        
-        # 保持連接開啟
         while True:
+            data = await websocket.receive_text()
             try:
-                # 等待客戶端消息
-                data = await websocket.receive_text()
-                logger.info(f"Received from client: {data}")
-            except Exception as e:
-                logger.error(f"Error receiving message: {str(e)}")
-                break
-            
+                message = json.loads(data)
+                channel, subscribe = WS_CLIENT_ACTIONS[message.get("type")]
+                symbol = normalize_symbol(str(message["symbol"]))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                client.put(json.dumps({"type": "error", "msg": f"Invalid message: {data[:100]}"}))
+                continue
+            if subscribe:
+                await ws_hub.subscribe(client, channel, symbol)
+            else:
+                await ws_hub.unsubscribe(client, channel, symbol)
+    except WebSocketDisconnect:
+        logger.info("WebSocket client disconnected")
     except Exception as e:
-        logger.error(f"WebSocket error: {str(e)}")
-        await websocket.close()
+        logger.error("WebSocket error: %s", e)
     finally:
-        if 'ws' in locals():
-            ws.close()
+        await ws_hub.unregister(client)
+
+@router.get("/ws/stats")
+async def get_websocket_stats():
+    """
+    獲取共用上游 WebSocket 的連線與分送統計
+    """
+    return ws_hub.stats()
 
 @router.get("/finnhub/news")
-async def test_finnhub_news():
+async def test_finnhub_news(
+    page: int = Query(1, ge=1, description="Page number (1-based)"),
+    page_size: int = Query(settings.NEWS_PAGE_SIZE, ge=1, le=settings.NEWS_MAX_PAGE_SIZE, description="News items per page"),
+    symbol: Optional[str] = Query(None, description="Only news mentioning this symbol")
+):
     """
-    測試 Finnhub 新聞 API
+    查詢新聞索引中的一般新聞（由新到舊）
     """
     try:
-        logger.info("Testing Finnhub news API")
-        
-        # 獲取一般新聞
-        news = finnhub_client.general_news('general', min_id=0)
+        await news_store.ensure_loaded()
+        offset = (page - 1) * page_size
+        if symbol:
+            total, news = news_store.search(symbol, offset, page_size)
+        else:
+            total, news = news_store.latest(offset, page_size)
         
-        logger.info(f"Successfully fetched {len(news)} news items")
-        return {
+        return FastJSONResponse({
             "status": "success",
-            "total_news": len(news),
+            "total_news": total,
+            "page": page,
+            "page_size": page_size,
             "news": news
-        }
+        })
         
     except Exception as e:
-        logger.error(f"Failed to fetch Finnhub news: {str(e)}", exc_info=True)
+        logger.error("Failed to fetch Finnhub news: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to fetch news: {str(e)}")
 
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    獲取各類型資料快取的命中率統計
+    """
+    return finance_cache.stats()
@@ -0,0 +1,854 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+from urllib.parse import unquote, urlparse
+
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+
+logger = setup_logger(__name__, "cache.log")
+
+T = TypeVar("T")
+
+
+class CacheEntry:
+    """快取項目，記錄值、寫入時間與過期時間（time.time()）"""
+
+    __slots__ = ("value", "stored_at", "expires_at", "size")
+
+    def __init__(self, value: Any, ttl: float, size: int = 0):
+        self.value = value
+        self.stored_at = time.time()
+        self.expires_at = self.stored_at + ttl
+        self.size = size
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+
+class LRUCache:
+    """
+    具 TTL 的記憶體 LRU 快取
+
+    Args:
+        max_entries: 最大項目數量
+        ttl: 預設存活時間（秒）
+        max_bytes: 總大小上限（0 表示不限制），大小由 sizeof 計算
+        sizeof: 計算值大小的函式
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 300,
+        max_bytes: int = 0,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._data: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and not entry.expired
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """取得項目（包含已過期的），並標記為最近使用"""
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry.expired:
+            self.delete(key)
+            return None
+        self._data.move_to_end(key)
+        return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        size = self.sizeof(value) if self.sizeof else 0
+        if self.max_bytes and size > self.max_bytes:
+            # 單一值超過總上限時不快取
+            self.delete(key)
+            return
+        self.delete(key)
+        self._data[key] = CacheEntry(value, self.ttl if ttl is None else ttl, size)
+        self.total_bytes += size
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.total_bytes = 0
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self.total_bytes > self.max_bytes)
+        ):
+            _, entry = self._data.popitem(last=False)
+            self.total_bytes -= entry.size
+
+
+class DiskStore:
+    """
+    以 JSON 檔案儲存快取的磁碟層，每個 key 一個檔案
+
+    讀寫為阻塞操作，async 方法會在執行緒中執行
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def _read(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("expires_at", 0) <= time.time():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        return data.get("value")
+
+    def _write(self, key: str, value: Any, ttl: float) -> None:
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "expires_at": time.time() + ttl, "value": value}, f)
+        # 先寫入暫存檔再替換，避免讀到寫一半的檔案
+        os.replace(tmp_path, path)
+
+    def _delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self._write, key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+
+class SingleFlight:
+    """
+    合併相同 key 的並行請求，只執行一次
+
+    工作在獨立的 task 中執行，發起者被取消時不會影響其他等待者
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        執行 fn，若相同 key 已在執行中則等待其結果
+
+        Returns:
+            (結果, 是否與其他請求共用)
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task), shared
+
+    def _done(self, key: str, task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 標記例外已讀取，避免沒有等待者時出現警告
+            task.exception()
+
+
+# 後端回傳的項目：(值, 寫入時間 time.time())
+Entry = Tuple[Any, float]
+
+CACHE_BACKENDS = ("memory", "sqlite", "redis")
+
+
+class CacheBackend:
+    """
+    快取後端介面
+
+    - get / set / delete 以 namespace 隔離不同快取的 key，值需可 JSON 序列化（memory 除外）
+    - acquire_lock / release_lock 為跨程序的互斥鎖，鎖有存活時間，持有者崩潰後會自動釋放
+    - shared 為 True 表示資料在多個 worker 程序之間共用
+    """
+
+    name = "base"
+    shared = False
+
+    def __init__(self, namespace: str = ""):
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    async def get(self, key: str) -> Optional[Entry]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        """
+        Returns:
+            鎖的 token，已被其他持有者鎖住時回傳 None
+        """
+        raise NotImplementedError
+
+    async def release_lock(self, key: str, token: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """程序內的 LRU，每個 worker 各自一份"""
+
+    name = "memory"
+
+    def __init__(self, namespace: str = "", max_entries: int = 1024, max_bytes: int = 0,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        super().__init__(namespace)
+        self.memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes, sizeof=sizeof)
+        self._locks: Dict[str, Tuple[str, float]] = {}
+
+    async def get(self, key: str) -> Optional[Entry]:
+        entry = self.memory.get_entry(key)
+        if entry is None:
+            return None
+        if entry.expired:
+            self.memory.delete(key)
+            return None
+        return entry.value, entry.stored_at
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self.memory.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str) -> None:
+        self.memory.delete(key)
+
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        now = time.monotonic()
+        held = self._locks.get(key)
+        if held is not None and held[1] > now:
+            return None
+        token = uuid.uuid4().hex
+        self._locks[key] = (token, now + ttl)
+        return token
+
+    async def release_lock(self, key: str, token: str) -> None:
+        if self._locks.get(key, ("",))[0] == token:
+            del self._locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "entries": len(self.memory), "bytes": self.memory.total_bytes}
+
+
+class _SQLiteCacheDatabase:
+    """
+    本機磁碟上的共用快取（SQLite WAL），同一台主機的多個 worker 可同時讀寫
+
+    sqlite3 為阻塞操作，SQLiteBackend 會在執行緒中呼叫
+    """
+
+    # 每寫入幾次清除一次過期項目
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str, mmap_size: int = 0, max_entries: int = 0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # timeout：其他程序寫入時等待的秒數
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self._writes = 0
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            if mmap_size > 0:
+                self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_entries (expires_at)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_locks (
+                    key TEXT PRIMARY KEY,
+                    token TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM cache_entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, payload: str, ttl: float) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._purge(now)
+
+    def _purge(self, now: float) -> None:
+        # 呼叫者需持有 self._lock 並在交易中
+        self._conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+        self._conn.execute("DELETE FROM cache_locks WHERE expires_at <= ?", (now,))
+        if self.max_entries > 0:
+            # 超過上限時移除最快過期的項目
+            self._conn.execute(
+                """
+                DELETE FROM cache_entries WHERE key IN (
+                    SELECT key FROM cache_entries ORDER BY expires_at
+                    LIMIT MAX(0, (SELECT COUNT(*) FROM cache_entries) - ?)
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def acquire_lock(self, key: str, token: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock, self._conn:
+            # 沒有鎖或鎖已過期時才取得
+            cursor = self._conn.execute(
+                """
+                INSERT INTO cache_locks (key, token, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at
+                WHERE cache_locks.expires_at <= ?
+                """,
+                (key, token, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release_lock(self, key: str, token: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache_locks WHERE key = ? AND token = ?", (key, token))
+
+    def count(self, prefix: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE key >= ? AND key < ? AND expires_at > ?",
+                (prefix, prefix + "\uffff", time.time()),
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SQLiteBackend(CacheBackend):
+    """同一台主機的 worker 共用的 SQLite（WAL + mmap）快取"""
+
+    name = "sqlite"
+    shared = True
+
+    # 相同路徑共用一個連線，最後一個使用者關閉時才關閉
+    _databases: Dict[str, _SQLiteCacheDatabase] = {}
+    _references: Dict[str, int] = {}
+
+    # 項目數量（COUNT(*)）在背景定期更新，stats 不在事件迴圈中查詢資料庫
+    COUNT_INTERVAL = 10.0
+
+    def __init__(self, namespace: str = "", path: str = settings.CACHE_SQLITE_PATH,
+                 mmap_size: int = settings.CACHE_SQLITE_MMAP_SIZE, max_entries: int = settings.CACHE_SQLITE_MAX_ENTRIES):
+        super().__init__(namespace)
+        self.path = path
+        self.mmap_size = mmap_size
+        self.max_entries = max_entries
+        self._db: Optional[_SQLiteCacheDatabase] = None
+        self._entries = 0
+        self._counted_at = float("-inf")
+        self._count_task: Optional[asyncio.Task] = None
+
+    async def _get_db(self) -> _SQLiteCacheDatabase:
+        # 第一次使用時才在執行緒中開啟資料庫，不拖慢 import 與服務啟動
+        if self._db is None:
+            db = self._databases.get(self.path)
+            if db is None:
+                db = await asyncio.to_thread(_SQLiteCacheDatabase, self.path, self.mmap_size, self.max_entries)
+                existing = self._databases.setdefault(self.path, db)
+                if existing is not db:
+                    # 其他呼叫者已先開啟同一路徑
+                    await asyncio.to_thread(db.close)
+                    db = existing
+            if self._db is None:
+                self._db = db
+                self._references[self.path] = self._references.get(self.path, 0) + 1
+        return self._db
+
+    async def get(self, key: str) -> Optional[Entry]:
+        db = await self._get_db()
+        row = await asyncio.to_thread(db.get, self._key(key))
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        db = await self._get_db()
+        await asyncio.to_thread(db.set, self._key(key), json.dumps(value), ttl)
+
+    async def delete(self, key: str) -> None:
+        db = await self._get_db()
+        await asyncio.to_thread(db.delete, self._key(key))
+
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        db = await self._get_db()
+        acquired = await asyncio.to_thread(db.acquire_lock, self._key(key), token, ttl)
+        return token if acquired else None
+
+    async def release_lock(self, key: str, token: str) -> None:
+        db = await self._get_db()
+        await asyncio.to_thread(db.release_lock, self._key(key), token)
+
+    def stats(self) -> Dict[str, Any]:
+        """entries 為最近一次背景計算的近似值"""
+        self._refresh_count()
+        return {"backend": self.name, "entries": self._entries}
+
+    def _refresh_count(self) -> None:
+        if self._db is None or self._count_task is not None:
+            return
+        if time.monotonic() - self._counted_at < self.COUNT_INTERVAL:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._count_task = loop.create_task(self._count(self._db))
+
+    async def _count(self, db: _SQLiteCacheDatabase) -> None:
+        try:
+            self._entries = await asyncio.to_thread(db.count, self._key(""))
+        except Exception as e:
+            logger.warning("Failed to count cache entries: %s", e)
+        finally:
+            self._counted_at = time.monotonic()
+            self._count_task = None
+
+    async def close(self) -> None:
+        if self._count_task is not None:
+            self._count_task.cancel()
+            await asyncio.gather(self._count_task, return_exceptions=True)
+        db, self._db = self._db, None
+        if db is None:
+            return
+        self._references[self.path] -= 1
+        if self._references[self.path] > 0:
+            return
+        del self._references[self.path]
+        if self._databases.get(self.path) is db:
+            del self._databases[self.path]
+        await asyncio.to_thread(db.close)
+
+
+class RedisError(Exception):
+    """Redis 回傳的錯誤"""
+
+
+class _RedisConnection:
+    """單一 RESP2 連線，一次只處理一個指令"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def command(self, *args: Any) -> Any:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.writer.write(b"".join(parts))
+        await self.writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> Any:
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = await self.reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            if count < 0:
+                return None
+            return [await self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def close(self) -> None:
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+
+# 只刪除自己持有的鎖（token 相符）
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+
+class RedisBackend(CacheBackend):
+    """
+    透過 Redis 協定共用的快取，可跨主機
+
+    內建精簡的 RESP 客戶端與連線池，不需要額外套件；測試時可指向 tools/fake_redis.py
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, namespace: str = "", url: str = settings.CACHE_REDIS_URL,
+                 max_connections: int = settings.CACHE_REDIS_MAX_CONNECTIONS, timeout: float = settings.CACHE_REDIS_TIMEOUT):
+        super().__init__(namespace)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self.errors = 0
+        self._idle: List[_RedisConnection] = []
+        # 同步原語在事件迴圈中才建立（Python 3.9 會在建構時綁定迴圈）
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._eval_supported = True
+
+    async def _connect(self) -> _RedisConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = _RedisConnection(reader, writer)
+        try:
+            if self.password:
+                await connection.command("AUTH", self.password)
+            if self.db:
+                await connection.command("SELECT", self.db)
+        except BaseException:
+            await connection.close()
+            raise
+        return connection
+
+    async def execute(self, *args: Any) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        async with self._semaphore:
+            if self._idle:
+                connection = self._idle.pop()
+            else:
+                try:
+                    # 連線（含 AUTH / SELECT）同樣受 timeout 限制，Redis 無法連線時不會卡住
+                    connection = await asyncio.wait_for(self._connect(), timeout=self.timeout)
+                except BaseException:
+                    self.errors += 1
+                    raise
+            try:
+                reply = await asyncio.wait_for(connection.command(*args), timeout=self.timeout)
+            except RedisError:
+                self._idle.append(connection)
+                raise
+            except BaseException:
+                # 連線狀態未知（逾時或中斷），直接丟棄
+                self.errors += 1
+                await connection.close()
+                raise
+            self._idle.append(connection)
+            return reply
+
+    async def get(self, key: str) -> Optional[Entry]:
+        payload = await self.execute("GET", self._key(key))
+        if payload is None:
+            return None
+        data = json.loads(payload)
+        return data["v"], data["t"]
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        payload = json.dumps({"v": value, "t": time.time()})
+        await self.execute("SET", self._key(key), payload, "PX", max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str) -> None:
+        await self.execute("DEL", self._key(key))
+
+    async def acquire_lock(self, key: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        reply = await self.execute("SET", self._key(f"lock:{key}"), token, "NX", "PX", max(1, int(ttl * 1000)))
+        return token if reply == "OK" else None
+
+    async def release_lock(self, key: str, token: str) -> None:
+        lock_key = self._key(f"lock:{key}")
+        if self._eval_supported:
+            try:
+                await self.execute("EVAL", _RELEASE_SCRIPT, 1, lock_key, token)
+                return
+            except RedisError:
+                # 不支援 Lua 的相容伺服器：改為先比對再刪除（非原子，鎖的存活時間限制了影響範圍）
+                self._eval_supported = False
+        current = await self.execute("GET", lock_key)
+        if current is not None and current.decode("utf-8") == token:
+            await self.execute("DEL", lock_key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "connections": len(self._idle), "errors": self.errors}
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await connection.close()
+
+
+def create_backend(namespace: str, max_entries: int = 1024, max_bytes: int = 0,
+                   sizeof: Optional[Callable[[Any], int]] = None,
+                   backend: Optional[str] = None) -> CacheBackend:
+    """
+    依 CACHE_BACKEND 建立快取後端
+
+    max_entries / max_bytes / sizeof 只用於 memory（共用後端由 SQLite 或 Redis 自己的上限管理）
+    """
+    backend = backend or settings.CACHE_BACKEND
+    if backend == "sqlite":
+        return SQLiteBackend(namespace)
+    if backend == "redis":
+        return RedisBackend(namespace)
+    if backend != "memory":
+        raise ValueError(f"Unknown cache backend: {backend}. Use one of {', '.join(CACHE_BACKENDS)}")
+    return MemoryBackend(namespace, max_entries=max_entries, max_bytes=max_bytes, sizeof=sizeof)
+
+
+class DistributedSingleFlight:
+    """
+    跨程序的 single-flight：相同 key 在所有 worker 中只有一個在更新
+
+    程序內先以 SingleFlight 合併，再以後端的鎖決定由哪個 worker 執行；
+    沒拿到鎖的 worker 輪詢後端，直到持有者寫入新值，或鎖釋放（例如結果不可快取）後自己執行。
+    後端不共用（memory）時只做程序內的合併。
+    """
+
+    def __init__(self, backend: "CacheBackend", lock_ttl: float = settings.CACHE_LOCK_TTL,
+                 poll_interval: float = settings.CACHE_LOCK_POLL_INTERVAL):
+        self.backend = backend
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self.local = SingleFlight()
+        self.waits = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.local
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        fn 需自行把結果寫入後端（以 key 為鍵），等待中的 worker 才能讀到
+
+        Returns:
+            (結果, 是否與其他請求或 worker 共用)
+        """
+        if not self.backend.shared:
+            return await self.local.do(key, fn)
+        (value, shared_remote), shared_local = await self.local.do(key, lambda: self._run(key, fn))
+        return value, shared_local or shared_remote
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        waiting_since: Optional[float] = None
+        while True:
+            try:
+                token = await self.backend.acquire_lock(key, self.lock_ttl)
+            except Exception as e:
+                # 後端無法使用時退回只在程序內合併
+                logger.warning("Cache lock for %s unavailable, fetching without it: %s", key, e)
+                return await fn(), False
+            if token is not None:
+                try:
+                    if waiting_since is not None:
+                        # 取得鎖之前持有者可能剛寫入
+                        entry = await self.backend.get(key)
+                        if entry is not None and entry[1] >= waiting_since:
+                            return entry[0], True
+                    return await fn(), False
+                finally:
+                    try:
+                        await self.backend.release_lock(key, token)
+                    except Exception as e:
+                        # 鎖會在 lock_ttl 後自動過期
+                        logger.warning("Failed to release cache lock for %s: %s", key, e)
+
+            if waiting_since is None:
+                waiting_since = time.time()
+                self.waits += 1
+            await asyncio.sleep(self.poll_interval)
+            try:
+                entry = await self.backend.get(key)
+            except Exception:
+                entry = None
+            if entry is not None and entry[1] >= waiting_since:
+                return entry[0], True
+
+
+class StaleWhileRevalidateCache:
+    """
+    stale-while-revalidate 快取
+
+    - 存活時間 ttl 內直接回傳
+    - 過期但仍在 stale_ttl 內時回傳舊值，並在背景更新
+    - 超過 ttl + stale_ttl 時等待重新取得（相同 key 在所有 worker 中只會取得一次）
+
+    Args:
+        name: 統計資料中使用的名稱
+        backend: 快取後端，預設依 CACHE_BACKEND 建立（namespace 為 name）
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0, max_entries: int = 1024,
+                 backend: Optional[CacheBackend] = None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend or create_backend(name, max_entries=max_entries)
+        self.flight = DistributedSingleFlight(self.backend)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self.backend_errors = 0
+        self._background: "Set[asyncio.Task[Any]]" = set()
+
+    def stats(self) -> dict:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            **self.backend.stats(),
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refresh_errors": self.refresh_errors,
+            "backend_errors": self.backend_errors,
+            "hit_rate": (self.hits + self.stale_hits) / total if total else 0.0,
+        }
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        try:
+            entry = await self.backend.get(key)
+        except Exception as e:
+            # 後端無法使用時視為未命中，直接向上游取得
+            self.backend_errors += 1
+            logger.warning("Cache backend read failed for %s: %s", self.name, e)
+            entry = None
+        if entry is not None:
+            value, stored_at = entry
+            if time.time() - stored_at < self.ttl:
+                self.hits += 1
+                return value
+            self.stale_hits += 1
+            self._refresh_in_background(key, fetch)
+            return value
+
+        self.misses += 1
+        value, _ = await self.flight.do(key, lambda: self._fetch_and_store(key, fetch))
+        return value
+
+    async def invalidate(self, key: str) -> None:
+        await self.backend.delete(key)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        value = await fetch()
+        try:
+            # 後端只保留到 stale 期間結束
+            await self.backend.set(key, value, self.ttl + self.stale_ttl)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning("Cache backend write failed for %s: %s", self.name, e)
+        return value
+
+    def _refresh_in_background(self, key: str, fetch: Callable[[], Awaitable[T]]) -> None:
+        if key in self.flight:
+            return
+
+        async def refresh() -> None:
+            try:
+                await self.flight.do(key, lambda: self._fetch_and_store(key, fetch))
+            except Exception:
+                # 更新失敗時保留舊值，直到超過 stale_ttl
+                self.refresh_errors += 1
+
+        task = asyncio.ensure_future(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
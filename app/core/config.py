@@ -8,13 +8,153 @@ class Settings(BaseSettings):
     
     # CORS 設置
     BACKEND_CORS_ORIGINS: list = ["*"]
+
+    # worker 程序數量（uvicorn / gunicorn 的 --workers 預設也讀取此變數）
+    # 每個 worker 各自限流與背景更新，上游配額依此平均分攤
+    WEB_CONCURRENCY: int = 1
+
+    # 共用快取設置（finance 與 /scrape）
+    CACHE_BACKEND: str = "memory"  # memory（每個 worker 各自一份）、sqlite（同主機共用）、redis（跨主機共用）
+    CACHE_SQLITE_PATH: str = "data/cache.sqlite3"
+    CACHE_SQLITE_MMAP_SIZE: int = 64 * 1024 * 1024  # SQLite mmap 大小（bytes，0 表示停用）
+    CACHE_SQLITE_MAX_ENTRIES: int = 100000  # 超過時移除最快過期的項目（0 表示不限制）
+    CACHE_REDIS_URL: str = "redis://127.0.0.1:6379/0"  # 測試時可指向 tools/fake_redis.py
+    CACHE_REDIS_MAX_CONNECTIONS: int = 20
+    CACHE_REDIS_TIMEOUT: float = 2.0  # 單一指令逾時（秒）
+    CACHE_LOCK_TTL: float = 30.0  # 跨 worker 更新鎖的存活時間（秒），持有者崩潰後自動釋放
+    CACHE_LOCK_POLL_INTERVAL: float = 0.05  # 等待其他 worker 更新時輪詢的間隔（秒）
+    CACHE_SCRAPE_LOCK_TTL: float = 120.0  # /scrape 渲染較久，使用較長的鎖
+
+    # 指標設置
+    METRICS_ENABLED: bool = True  # 記錄指標並提供 /metrics（Prometheus 格式）
+    METRICS_SERVER_TIMING: bool = False  # 在回應加上 Server-Timing header
+    METRICS_LOOP_LAG_INTERVAL: float = 0.5  # 量測事件迴圈延遲的間隔（秒），0 表示不量測
+
+    # 日誌設置
+    LOG_FORMAT: str = "text"  # text 或 json（結構化日誌）
+    LOG_QUEUE_ENABLED: bool = False  # 由背景執行緒寫入 stdout 與檔案，記錄時不阻塞
+    LOG_QUEUE_SIZE: int = 10000  # 佇列已滿時丟棄新的日誌
+    LOG_SAMPLE_RATE: float = 1.0  # DEBUG / INFO 日誌的取樣比例（WARNING 以上一律保留）
+    LOG_RATE_LIMIT_PER_SECOND: float = 0.0  # 每個 logger 每秒最多的 DEBUG / INFO 日誌數量（0 表示不限制）
+
+    # 回應壓縮設置
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # 小於此大小（bytes）的回應不壓縮
+
+    # 條件式 GET：回應加上 ETag，If-None-Match 相符時回傳 304
+    ETAG_ENABLED: bool = True
     
     # N8N 設置
     N8N_API_URL: Optional[str] = None
     N8N_API_KEY: Optional[str] = None
 
+    # Finnhub 設置
+    FINNHUB_API_KEY: str = "d0esb69r01qlbf85mkq0d0esb69r01qlbf85mkqg"
+    FINNHUB_API_URL: str = "https://api.finnhub.io/api/v1"  # 測試時可指向 tools/fake_finnhub.py
+    FINNHUB_TIMEOUT: float = 10.0  # 上游請求逾時（秒）
+    FINNHUB_MAX_CONNECTIONS: int = 20  # 連線池大小
+    FINNHUB_SUBCALL_TIMEOUT: float = 5.0  # 同時發出的多個上游請求各自的逾時（秒）
+    FINNHUB_RATE_LIMIT_PER_MINUTE: int = 60  # 上游每分鐘配額（所有 worker 合計，0 表示不限制）
+    FINNHUB_RATE_LIMIT_BURST: int = 30  # 允許的瞬間請求數量（所有 worker 合計）
+    FINNHUB_RATE_LIMIT_MAX_WAIT: float = 30.0  # 等待配額的最長時間（秒）
+    FINNHUB_RATE_LIMIT_PENALTY: float = 5.0  # 收到 429 且沒有 Retry-After 時暫停的秒數
+    FINNHUB_WS_URL: str = "wss://ws.finnhub.io"  # 即時資料 WebSocket，測試時可指向 tools/fake_finnhub_ws.py
+    FINNHUB_WS_RECONNECT_MAX_DELAY: float = 30.0  # 上游斷線重連的最長等待（秒）
+    WS_CLIENT_QUEUE_SIZE: int = 256  # 每個客戶端待送訊息的上限
+    WS_CLIENT_POLICY: str = "coalesce"  # 客戶端跟不上時的處理方式（coalesce、drop_oldest、drop_newest）
+    FINANCE_QUOTES_MAX_SYMBOLS: int = 100  # /finance/quotes 單次最多的股票數量
+    FINANCE_QUOTES_TIMEOUT: float = 30.0  # /finance/quotes 每個股票的逾時（秒）
+
+    # K 線本機儲存設置
+    CANDLE_STORE_PATH: str = "data/candles.sqlite3"
+    CANDLE_STORE_MMAP_SIZE: int = 256 * 1024 * 1024  # SQLite mmap 大小（bytes，0 表示停用）
+    HISTORY_STREAM_THRESHOLD: int = 20000  # K 線數量超過此值時以串流回傳
+
+    # 即時成交聚合設置（1s / 1m / 5m K 線，各以固定大小的環狀緩衝保存）
+    TRADE_BARS_SYMBOLS: List[str] = []  # 啟動時即向上游訂閱並聚合的股票
+    TRADE_BARS_MAX_SYMBOLS: int = 200  # 最多保留的股票數量，超過時移除最久沒有成交的
+    TRADE_BARS_CAPACITY_1S: int = 900  # 保留最近 15 分鐘的秒線
+    TRADE_BARS_CAPACITY_1M: int = 1440  # 保留最近一天的分鐘線
+    TRADE_BARS_CAPACITY_5M: int = 576  # 保留最近兩天的 5 分鐘線
+
+    # 選股快照設置（/finance/screener）
+    SCREENER_ENABLED: bool = True  # 是否在背景更新快照
+    SCREENER_RATE_BUDGET: float = 0.5  # 背景更新最多使用的上游每分鐘配額比例
+    SCREENER_MIN_CYCLE_SECONDS: float = 60.0  # 每輪更新完整個股票池的最短時間（秒）
+
+    # 技術指標設置
+    INDICATOR_MAX_PER_REQUEST: int = 20  # 單次請求最多的指標數量
+    INDICATOR_CACHE_MAX_ENTRIES: int = 4096
+    INDICATOR_CACHE_MAX_BYTES: int = 128 * 1024 * 1024  # 時間軸與指標陣列的總大小上限
+    INDICATOR_CACHE_TTL: int = 300  # 區間包含未定案 K 線時的快取時間（秒）
+    INDICATOR_CACHE_TTL_SETTLED: int = 86400  # 區間內 K 線皆已定案時的快取時間（秒）
+
+    # 新聞索引設置
+    NEWS_REFRESH_INTERVAL: float = 60.0  # 背景輪詢 general_news 的間隔（秒，0 表示停用背景輪詢）
+    NEWS_RETRY_INTERVAL: float = 30.0  # 尚未載入成功時，查詢觸發同步更新的最短間隔（秒）
+    NEWS_MAX_ARTICLES: int = 5000  # 最多保留的新聞數量
+    NEWS_PAGE_SIZE: int = 20  # 新聞查詢預設每頁數量
+    NEWS_MAX_PAGE_SIZE: int = 100
+
+    # Cron 設置
+    CRON_CACHE_SIZE: int = 4096  # 已解析的 cron 表達式快取數量
+    CRON_BATCH_MAX_ITEMS: int = 10000  # /cron/check/batch 單次最多的項目數量
+    CRON_NEXT_MAX_COUNT: int = 100  # /cron/next 最多回傳的觸發時間數量
+    CRON_REGISTRY_MAX_JOBS: int = 100000  # 註冊的排程工作上限
+    CRON_WINDOW_MAX_DAYS: int = 31  # 區間查詢的最長天數
+
     # Yahoo Finance 設置
-    YAHOO_FINANCE_CACHE_EXPIRY: int = 3600  # 快取過期時間（秒）
+    YAHOO_FINANCE_CACHE_EXPIRY: int = 3600  # 快取過期時間（秒），公司資料預設使用此值
+
+    # 金融資料快取設置（各類型的存活時間與過期後仍可回傳舊值的時間，單位秒）
+    FINANCE_CACHE_MAX_ENTRIES: int = 2048  # 每種類型最多保留的項目數量
+    FINANCE_CACHE_TTL_QUOTE: int = 10
+    FINANCE_CACHE_STALE_QUOTE: int = 50
+    FINANCE_CACHE_TTL_PROFILE: Optional[int] = None  # 未設定時使用 YAHOO_FINANCE_CACHE_EXPIRY
+    FINANCE_CACHE_STALE_PROFILE: int = 7 * 86400
+    FINANCE_CACHE_TTL_NEWS: int = 300
+    FINANCE_CACHE_STALE_NEWS: int = 600
+    FINANCE_CACHE_TTL_CANDLES: int = 300
+    FINANCE_CACHE_STALE_CANDLES: int = 3600
+
+    # 瀏覽器池設置（/scrape）
+    BROWSER_POOL_SIZE: int = 2  # 常駐的 Chromium 數量
+    BROWSER_MAX_CONCURRENT_PAGES: int = 8  # 同時開啟的頁面上限
+    BROWSER_MAX_PAGES_PER_BROWSER: int = 200  # 每個瀏覽器處理多少頁面後回收
+    BROWSER_ACQUIRE_TIMEOUT: float = 120.0  # 池滿時排隊等待的最長時間（秒）
+    BROWSER_WARMUP_IN_BACKGROUND: bool = True  # 啟動時在背景預熱瀏覽器，不延遲服務啟動
+
+    # 批次抓取設置（/scrape/batch）
+    SCRAPE_BATCH_MAX_ITEMS: int = 500  # 單次批次的最大 URL 數量
+    SCRAPE_BATCH_DEFAULT_CONCURRENCY: int = 4  # 未指定時的併發數量
+    SCRAPE_BATCH_MAX_CONCURRENCY: int = 16  # 併發數量上限
+
+    # 非同步抓取工作設置（/scrape/jobs）
+    SCRAPE_JOB_DB: str = "data/scrape_jobs.sqlite3"  # 工作紀錄的 SQLite 檔案
+    SCRAPE_JOB_WORKERS: int = 4  # 同時執行的工作數量
+    SCRAPE_JOB_MAX_QUEUED: int = 10000  # 排隊中工作的上限
+    SCRAPE_JOB_RETENTION: int = 86400  # 已完成工作的保留時間（秒）
+    SCRAPE_JOB_LEASE: float = 120.0  # 執行中工作的心跳租約（秒），逾時未更新視為中斷並重新排隊
+    SCRAPE_JOB_CALLBACK_TIMEOUT: float = 10.0  # webhook 逾時（秒）
+    SCRAPE_JOB_CALLBACK_RETRIES: int = 3  # webhook 失敗的重試次數
+
+    # 抓取方式（auto: 先用 HTTP，必要時改用瀏覽器；http；browser）
+    SCRAPE_DEFAULT_MODE: str = "auto"
+    SCRAPE_HTTP_TIMEOUT: float = 15.0  # HTTP 抓取逾時（秒）
+    SCRAPE_HTTP_MAX_CONNECTIONS: int = 100
+    SCRAPE_HTTP_MAX_KEEPALIVE: int = 20
+    SCRAPE_HTTP_MIN_TEXT_LENGTH: int = 200  # 可見文字少於此長度時視為需要瀏覽器渲染
+    SCRAPE_HTTP_MAX_BYTES: int = 10 * 1024 * 1024  # HTTP 抓取的回應大小上限（解壓後），超過時回傳 413
+    SCRAPE_HTTP_VERIFY_TLS: bool = True  # 是否驗證 HTTPS 憑證
+
+    # 抓取時預設攔截的資源類型
+    SCRAPE_BLOCKED_RESOURCES: List[str] = ["image", "font", "media"]
+
+    # 抓取結果快取設置
+    SCRAPE_CACHE_ENABLED: bool = True
+    SCRAPE_CACHE_TTL: int = 300  # 快取過期時間（秒）
+    SCRAPE_CACHE_MAX_ENTRIES: int = 256  # 記憶體中最多保留的頁面數量
+    SCRAPE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 記憶體快取總大小上限
+    SCRAPE_CACHE_DIR: Optional[str] = None  # 設定後同時寫入磁碟（例如 "cache/scrape"）
 
     class Config:
         case_sensitive = True
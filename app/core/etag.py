@@ -0,0 +1,87 @@
+import hashlib
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 304 回應不帶內容，移除描述內容的 headers
+_ENTITY_HEADERS = {b"content-length", b"content-type", b"content-encoding"}
+
+
+def make_etag(body: bytes) -> str:
+    # 弱 ETag：壓縮前後的內容視為同一版本
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 使用弱比較（忽略 W/ 前綴）"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ETagMiddleware:
+    """
+    為 GET / HEAD 的 200 回應加上 ETag，If-None-Match 相符時改回 304（不傳送內容）
+
+    只處理一次送出的回應；串流回應與已自帶 ETag 的回應（例如靜態檔案）原樣傳送。
+    需放在壓縮之內，ETag 以未壓縮的內容計算
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int = 16 * 1024 * 1024):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        if_none_match = Headers(scope=scope).get("if-none-match")
+
+        start_message: Optional[Message] = None
+        started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, started
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or started:
+                await send(message)
+                return
+
+            started = True
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            taggable = (
+                start_message["status"] == 200
+                and not message.get("more_body", False)
+                and "etag" not in headers
+                and len(body) <= self.max_size
+                and (body or scope["method"] == "GET")
+            )
+            if not taggable:
+                await send(start_message)
+                await send(message)
+                return
+
+            etag = make_etag(body)
+            headers["ETag"] = etag
+            if if_none_match and etag_matches(if_none_match, etag):
+                raw: List[Tuple[bytes, bytes]] = [
+                    (name, value) for name, value in start_message["headers"] if name.lower() not in _ENTITY_HEADERS
+                ]
+                await send({"type": "http.response.start", "status": 304, "headers": raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,7 +1,17 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Optional
+
+from app.core.config import settings
 
 # 創建日誌目錄
 log_dir = Path("logs")
@@ -12,38 +22,213 @@ log_format = logging.Formatter(
     '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# LogRecord 的標準屬性，其餘屬性（logger.info(..., extra={...})）會輸出到 JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """結構化日誌：每筆紀錄輸出為一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    DEBUG / INFO 日誌的取樣與限流（WARNING 以上一律保留）
+
+    Args:
+        sample_rate: 保留的比例（0 ~ 1）
+        rate_per_second: 每個 logger 每秒最多保留的數量（0 表示不限制）
+    """
+
+    def __init__(self, sample_rate: float = 1.0, rate_per_second: float = 0.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_per_second = rate_per_second
+        self.dropped = 0
+        self._buckets: Dict[str, List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.dropped += 1
+            return False
+        if self.rate_per_second > 0:
+            # 每個 logger 一個 token bucket：[tokens, 上次更新時間]
+            now = time.monotonic()
+            bucket = self._buckets.setdefault(record.name, [self.rate_per_second, now])
+            bucket[0] = min(self.rate_per_second, bucket[0] + (now - bucket[1]) * self.rate_per_second)
+            bucket[1] = now
+            if bucket[0] < 1:
+                self.dropped += 1
+                return False
+            bucket[0] -= 1
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    只把 LogRecord 放入佇列，訊息格式化與寫入都在背景執行緒進行
+
+    佇列在同一個程序內，不需要像預設的 prepare 一樣先格式化；佇列已滿時丟棄並計數
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _RoutingHandler(logging.Handler):
+    """背景執行緒中依 logger 名稱把紀錄交給對應的 handler（各 logger 有自己的日誌檔）"""
+
+    def __init__(self):
+        super().__init__()
+        self.routes: Dict[str, List[logging.Handler]] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        for handler in self.routes.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class _QueuePipeline:
+    """佇列模式共用的佇列、背景執行緒與 handler"""
+
+    def __init__(self, formatter: logging.Formatter):
+        self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        self.formatter = formatter
+        self.router = _RoutingHandler()
+        self.console = _console_handler(formatter)
+        self.files: Dict[str, logging.Handler] = {}
+        self.queue_handler = LazyQueueHandler(self.queue)
+        self.listener = QueueListener(self.queue, self.router)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def route(self, name: str, log_file: Optional[str]) -> None:
+        handlers = [self.console]
+        if log_file:
+            # 同一個檔案只開一個 handler
+            if log_file not in self.files:
+                self.files[log_file] = _file_handler(log_file, self.formatter)
+            handlers.append(self.files[log_file])
+        self.router.routes[name] = handlers
+
+    def stop(self) -> None:
+        # 送出佇列中剩下的日誌
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+
+_pipeline: Optional[_QueuePipeline] = None
+_pipeline_lock = threading.Lock()
+_filter: Optional[SamplingFilter] = None
+
+
+def _formatter() -> logging.Formatter:
+    return JsonFormatter() if settings.LOG_FORMAT == "json" else log_format
+
+
+def _console_handler(formatter: logging.Formatter) -> logging.Handler:
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    return console_handler
+
+
+def _file_handler(log_file: str, formatter: logging.Formatter) -> logging.Handler:
+    file_handler = RotatingFileHandler(
+        log_dir / log_file,
+        maxBytes=10*1024*1024,  # 10MB
+        backupCount=5,
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(formatter)
+    return file_handler
+
+
+def _get_pipeline() -> _QueuePipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = _QueuePipeline(_formatter())
+        return _pipeline
+
+
+def _get_filter() -> SamplingFilter:
+    global _filter
+    with _pipeline_lock:
+        if _filter is None:
+            _filter = SamplingFilter(settings.LOG_SAMPLE_RATE, settings.LOG_RATE_LIMIT_PER_SECOND)
+        return _filter
+
+
+def logging_stats() -> Dict[str, int]:
+    """被取樣 / 限流丟棄，以及佇列模式下佇列已滿丟棄的日誌數量"""
+    return {
+        "queued": _pipeline.queue.qsize() if _pipeline else 0,
+        "sampled_out": _filter.dropped if _filter else 0,
+        "queue_full": _pipeline.queue_handler.dropped if _pipeline else 0,
+    }
+
+
 def setup_logger(name: str, log_file: str = None, level=logging.INFO):
     """
     設置日誌記錄器
-    
+
+    LOG_QUEUE_ENABLED 時只掛上共用的佇列 handler，實際寫入由背景執行緒進行；
+    LOG_FORMAT=json 時輸出結構化 JSON。取樣 / 限流在兩種模式下都掛在 logger 上，
+    被丟棄的紀錄不會建立訊息，也不會進入佇列。
+
     Args:
         name: 日誌記錄器名稱
         log_file: 日誌文件名（可選）
         level: 日誌級別
-    
+
     Returns:
         logging.Logger: 配置好的日誌記錄器
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # 清除現有的處理器
     logger.handlers.clear()
-    
+    logger.addFilter(_get_filter())
+
+    if settings.LOG_QUEUE_ENABLED:
+        pipeline = _get_pipeline()
+        pipeline.route(name, log_file)
+        logger.addHandler(pipeline.queue_handler)
+        return logger
+
+    formatter = _formatter()
+
     # 控制台處理器
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(log_format)
-    logger.addHandler(console_handler)
-    
+    logger.addHandler(_console_handler(formatter))
+
     # 文件處理器（如果指定了日誌文件）
     if log_file:
-        file_handler = RotatingFileHandler(
-            log_dir / log_file,
-            maxBytes=10*1024*1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
-        )
-        file_handler.setFormatter(log_format)
-        logger.addHandler(file_handler)
-    
-    return logger 
\ No newline at end of file
+        logger.addHandler(_file_handler(log_file, formatter))
+
+    return logger
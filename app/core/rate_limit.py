@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class RateLimitExceeded(Exception):
+    """等待配額的時間超過上限"""
+
+
+class TokenBucket:
+    """
+    非同步 token bucket 限流器
+
+    每秒補充 rate 個 token，最多累積 capacity 個；等待者依先來後到取得 token。
+    上游回傳 429 時可呼叫 penalize 暫停一段時間。
+
+    Args:
+        rate: 每秒補充的 token 數量（0 表示不限制）
+        capacity: 最多可累積的 token 數量（允許的瞬間爆量）
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        # 可為負數：代表已預約給排隊中呼叫者的 token
+        self.tokens = self.capacity
+        # 上次補充的時間；penalize 時移到暫停結束，暫停期間不補充
+        self._updated = time.monotonic()
+        # penalize 累計延後的秒數，排隊中的呼叫者醒來時依此順延預約的時間
+        self._shift = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    async def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> None:
+        """
+        取得 token，不足時等待
+
+        呼叫時立即預約 token 並算出可用的時間，等待期間不持有鎖，
+        預計等待超過 timeout 的呼叫者會立刻失敗，不需排在其他等待者之後
+
+        Raises:
+            RateLimitExceeded: 預計等待時間超過 timeout
+        """
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        deadline = now + timeout if timeout is not None else None
+        self._refill(now)
+        ready = max(now, self._updated) + max(tokens - self.tokens, 0.0) / self.rate
+        if deadline is not None and ready > deadline:
+            raise RateLimitExceeded(f"Rate limit wait of {ready - now:.1f}s exceeds timeout")
+        self.tokens -= tokens
+        shift = self._shift
+        try:
+            while ready > now:
+                await asyncio.sleep(ready - now)
+                # 等待期間被 penalize 時，預約的時間整體順延，仍與其他等待者保持間隔
+                now = time.monotonic()
+                ready += self._shift - shift
+                shift = self._shift
+                if deadline is not None and ready > deadline:
+                    raise RateLimitExceeded(f"Rate limit wait of {ready - now:.1f}s exceeds timeout")
+        except BaseException:
+            # 逾時或取消時歸還預約的 token
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + tokens)
+            raise
+
+    def penalize(self, seconds: float) -> None:
+        """
+        暫停 seconds 秒（例如收到 429 時）
+
+        清空累積的 token，已預約的呼叫者整體延後，暫停結束後仍依 rate 間隔送出
+        """
+        now = time.monotonic()
+        self._refill(now)
+        base = max(now, self._updated)
+        end = max(base, now + seconds)
+        self.tokens = min(self.tokens, 0)
+        self._updated = end
+        self._shift += end - base
@@ -0,0 +1,24 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson 為可選依賴，未安裝時使用標準 json
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    app 預設的 JSON 回應，安裝 orjson 時使用 orjson 序列化（可直接輸出 NumPy 陣列）
+
+    FastAPI 對沒有 response_model 的回傳值仍會先經過 jsonable_encoder，
+    資料量大的端點可直接回傳 FastJSONResponse 省略這一步（內容需為 JSON 基本型別）
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=_ORJSON_OPTIONS)
+        return super().render(content)
@@ -1,19 +1,85 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from app.api.v1.api import api_router
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.etag import ETagMiddleware
+from app.core.responses import FastJSONResponse
+from app.core.metrics import LoopLagMonitor, MetricsMiddleware, registry
 import os
-from pydantic import BaseModel, HttpUrl
-from playwright.async_api import async_playwright
-import asyncio
-from typing import Optional
+from app.services.browser_pool import browser_pool
+from app.services.http_fetcher import http_fetcher
+from app.services.finnhub_client import finnhub_client
+from app.services.finance_cache import finance_cache
+from app.services.scrape_cache import scrape_cache
+from app.services.candle_store import candle_store
+from app.services.news_store import news_store
+from app.services.ws_hub import ws_hub
+from app.services.trade_bars import trade_bars
+from app.services.screener import screener
+from app.api.v1.endpoints.finance import POPULAR_US_STOCKS, POPULAR_TW_STOCKS
+from app.services.scraper import (
+    URLRequest, ScrapeResponse, BatchScrapeRequest, cached_scrape, scrape_batch
+)
+from app.services.scrape_jobs import ScrapeJob, ScrapeJobRequest, scrape_jobs
+from contextlib import asynccontextmanager
+
+loop_lag_monitor = LoopLagMonitor(settings.METRICS_LOOP_LAG_INTERVAL)
+
+def collect_service_metrics():
+    """/metrics 輸出時才讀取的數值：快取命中率、瀏覽器池與事件迴圈延遲"""
+    caches = {"scrape": scrape_cache.stats()}
+    for name, stats in finance_cache.stats().items():
+        caches[f"finance_{name}"] = {
+            "hits": stats["hits"] + stats["stale_hits"],
+            "misses": stats["misses"],
+            "hit_ratio": stats["hit_rate"],
+        }
+    yield ("cache_hits_total", "counter", "Cache hits (including stale hits)",
+           [({"cache": name}, stats["hits"]) for name, stats in caches.items()])
+    yield ("cache_misses_total", "counter", "Cache misses",
+           [({"cache": name}, stats["misses"]) for name, stats in caches.items()])
+    yield ("cache_hit_ratio", "gauge", "Cache hit ratio since startup",
+           [({"cache": name}, stats["hit_ratio"]) for name, stats in caches.items()])
+    pool = browser_pool.stats()
+    yield "browser_pool_browsers", "gauge", "Healthy browsers in the pool", [({}, pool["healthy"])]
+    yield "browser_pool_active_pages", "gauge", "Pages currently open", [({}, pool["active_pages"])]
+    yield "event_loop_lag_max_seconds", "gauge", "Largest event loop lag since startup", [({}, loop_lag_monitor.max_lag)]
+
+registry.add_collector(collect_service_metrics)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 啟動時預熱瀏覽器池、恢復排隊中的抓取工作並開始輪詢新聞，關閉時釋放所有瀏覽器與 HTTP 連線
+    if settings.METRICS_ENABLED:
+        await loop_lag_monitor.start()
+    await browser_pool.start()
+    await scrape_jobs.start()
+    await news_store.start()
+    await trade_bars.start()
+    await screener.start(POPULAR_US_STOCKS + POPULAR_TW_STOCKS)
+    yield
+    await screener.stop()
+    await trade_bars.stop()
+    await ws_hub.stop()
+    await news_store.stop()
+    await scrape_jobs.stop()
+    await browser_pool.stop()
+    await http_fetcher.close()
+    await finnhub_client.close()
+    await candle_store.close()
+    await finance_cache.close()
+    await scrape_cache.close()
+    await loop_lag_monitor.stop()
 
 app = FastAPI(
     title="N8N API",
     description="API for N8N integration with FFmpeg and Yahoo Finance support",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS 設置
@@ -25,111 +91,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 為 GET 回應加上 ETag，內容未變時回傳 304；放在壓縮內層，以未壓縮的內容計算
+if settings.ETAG_ENABLED:
+    app.add_middleware(ETagMiddleware)
+
+# 壓縮較大的回應（gzip / brotli）
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
+# 記錄每個請求的延遲，放在最外層以包含壓縮的時間
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, server_timing=settings.METRICS_SERVER_TIMING)
+
 # 掛載靜態文件目錄
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 # 包含 API 路由
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
-class URLRequest(BaseModel):
-    url: HttpUrl
-    wait_time: Optional[int] = 5  # 等待時間（秒）
+@app.post("/scrape", response_model=ScrapeResponse)
+async def scrape_url(request: URLRequest, response: Response):
+    result, cache_status = await cached_scrape(request)
+    response.headers["X-Cache"] = cache_status
+    response.headers["X-Scrape-Tier"] = result.tier
+    return result
+
+@app.post("/scrape/batch")
+async def scrape_url_batch(request: BatchScrapeRequest):
+    """
+    批次抓取多個頁面，每完成一個就以 NDJSON 串流回傳 BatchScrapeResult
+    """
+    return StreamingResponse(scrape_batch(request), media_type="application/x-ndjson")
 
-class ScrapeResponse(BaseModel):
-    title: str
-    content: str
-    status: int
+@app.post("/scrape/jobs", response_model=ScrapeJob, status_code=202)
+async def create_scrape_job(request: ScrapeJobRequest):
+    """
+    建立非同步抓取工作，立即回傳工作 ID
+    """
+    return await scrape_jobs.submit(request)
 
-@app.post("/scrape", response_model=ScrapeResponse)
-async def scrape_url(request: URLRequest):
-    try:
-        async with async_playwright() as p:
-            # 啟動瀏覽器，添加額外的參數來模擬真實瀏覽器
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-features=IsolateOrigins,site-per-process',
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-accelerated-2d-canvas',
-                    '--disable-gpu',
-                    '--window-size=1920,1080',
-                ]
-            )
-            
-            # 創建新的上下文，設置用戶代理
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-                viewport={'width': 1920, 'height': 1080},
-                java_script_enabled=True,
-                ignore_https_errors=True,
-                bypass_csp=True,
-            )
-            
-            # 創建新頁面
-            page = await context.new_page()
-            
-            # 設置額外的 headers
-            await page.set_extra_http_headers({
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Cache-Control': 'max-age=0',
-            })
-            
-            # 設置超時時間
-            page.set_default_timeout(60000)  # 60 seconds
-            
-            try:
-                # 訪問頁面
-                response = await page.goto(
-                    str(request.url),
-                    wait_until='domcontentloaded',  # 改用 domcontentloaded 而不是 networkidle
-                    timeout=60000  # 60 seconds
-                )
-                
-                if not response:
-                    raise HTTPException(status_code=400, detail="Failed to load page")
-                
-                # 等待指定時間
-                await asyncio.sleep(request.wait_time)
-                
-                # 獲取頁面內容
-                title = await page.title()
-                content = await page.content()
-                
-                return ScrapeResponse(
-                    title=title,
-                    content=content,
-                    status=response.status
-                )
-                
-            except Exception as e:
-                # 如果頁面加載失敗，嘗試獲取當前內容
-                try:
-                    title = await page.title()
-                    content = await page.content()
-                    return ScrapeResponse(
-                        title=title,
-                        content=content,
-                        status=500
-                    )
-                except:
-                    raise HTTPException(status_code=500, detail=str(e))
-            finally:
-                # 確保瀏覽器被關閉
-                await browser.close()
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/scrape/jobs/{job_id}", response_model=ScrapeJob)
+async def get_scrape_job(job_id: str):
+    """
+    查詢抓取工作的狀態與結果
+    """
+    job = await scrape_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Prometheus 格式的指標
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
@@ -0,0 +1,266 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Set
+
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+from app.core.metrics import registry
+
+if TYPE_CHECKING:
+    # Playwright 載入較慢，在第一次啟動瀏覽器時才匯入
+    from playwright.async_api import Browser, BrowserContext, Page, Playwright
+
+logger = setup_logger(__name__, "browser_pool.log")
+
+# 瀏覽器各階段耗時：launch、acquire（排隊）、context、page，以及 scraper 記錄的 navigate / ready / content
+BROWSER_PHASE_DURATION = registry.histogram(
+    "browser_phase_duration_seconds", "Browser timing breakdown per phase", ("phase",)
+)
+
+# 啟動瀏覽器的額外參數，用來模擬真實瀏覽器
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-features=IsolateOrigins,site-per-process',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-accelerated-2d-canvas',
+    '--disable-gpu',
+    '--window-size=1920,1080',
+]
+
+# 上下文設置（用戶代理、視窗大小等）
+CONTEXT_OPTIONS = {
+    "user_agent": 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+    "viewport": {'width': 1920, 'height': 1080},
+    "java_script_enabled": True,
+    "ignore_https_errors": True,
+    "bypass_csp": True,
+}
+
+
+class BrowserPoolTimeout(Exception):
+    """排隊等待頁面逾時"""
+
+
+class _BrowserSlot:
+    """池中的單一瀏覽器"""
+
+    def __init__(self, browser: "Browser"):
+        self.browser = browser
+        self.pages_served = 0
+        self.active_pages = 0
+        self.retiring = False
+
+    @property
+    def healthy(self) -> bool:
+        return not self.retiring and self.browser.is_connected()
+
+    async def close(self) -> None:
+        try:
+            await self.browser.close()
+        except Exception as e:
+            logger.warning("Error closing browser: %s", e)
+
+
+class BrowserPool:
+    """
+    常駐的 Chromium 瀏覽器池
+
+    - 維持 size 個已啟動的瀏覽器；每個頁面使用新的上下文，用完即關閉，
+      cookies、localStorage、IndexedDB、service worker、權限與 HTTP 快取不會帶到下一個請求
+    - 同時開啟的頁面數量受 max_concurrent_pages 限制，超過時排隊等待
+    - 瀏覽器處理 max_pages_per_browser 個頁面或崩潰後會被回收並替換
+    - 瀏覽器在背景 task 中啟動，其他請求可繼續使用已啟動的瀏覽器，不需等待
+    """
+
+    def __init__(
+        self,
+        size: int = settings.BROWSER_POOL_SIZE,
+        max_concurrent_pages: int = settings.BROWSER_MAX_CONCURRENT_PAGES,
+        max_pages_per_browser: int = settings.BROWSER_MAX_PAGES_PER_BROWSER,
+        acquire_timeout: float = settings.BROWSER_ACQUIRE_TIMEOUT,
+    ):
+        self.size = max(1, size)
+        self.max_pages_per_browser = max_pages_per_browser
+        self.acquire_timeout = acquire_timeout
+        self.max_concurrent_pages = max(1, max_concurrent_pages)
+        # 同步原語在事件迴圈中才建立（Python 3.9 會在建構時綁定迴圈）
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock: Optional[asyncio.Lock] = None  # 只保護 Playwright 的啟動與關閉
+        self._playwright: Optional["Playwright"] = None
+        self._slots: List[_BrowserSlot] = []
+        self._launches: Set[asyncio.Task] = set()
+        self._warmup_task: Optional[asyncio.Task] = None
+
+    async def start(self, background: bool = settings.BROWSER_WARMUP_IN_BACKGROUND) -> None:
+        """
+        啟動 Playwright 並預熱瀏覽器
+
+        background 時在背景預熱，不延遲服務啟動；預熱完成前的請求會等待預熱結束
+        """
+        self._init_primitives()
+        if background:
+            self._warmup_task = asyncio.create_task(self._warm_up())
+        else:
+            await self._warm_up()
+
+    async def _warm_up(self) -> None:
+        self._start_launches()
+        results = await asyncio.gather(*self._launches, return_exceptions=True)
+        # 預熱失敗時不阻止服務啟動，之後請求時再嘗試啟動（錯誤已由 _launch_done 記錄）
+        logger.info(
+            "Browser pool started with %s browsers (%s failed)",
+            len(self._slots),
+            sum(1 for r in results if isinstance(r, Exception)),
+        )
+
+    async def stop(self) -> None:
+        """關閉所有瀏覽器與 Playwright"""
+        self._init_primitives()
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+            await asyncio.gather(self._warmup_task, return_exceptions=True)
+            self._warmup_task = None
+        launches = list(self._launches)
+        for task in launches:
+            task.cancel()
+        await asyncio.gather(*launches, return_exceptions=True)
+        async with self._lock:
+            slots, self._slots = self._slots, []
+            for slot in slots:
+                await slot.close()
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+        logger.info("Browser pool stopped")
+
+    def stats(self) -> dict:
+        return {
+            "browsers": len(self._slots),
+            "healthy": sum(1 for s in self._slots if s.healthy),
+            "active_pages": sum(s.active_pages for s in self._slots),
+            "pages_served": [s.pages_served for s in self._slots],
+        }
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator["Page"]:
+        """
+        從池中取得一個新頁面，離開時自動關閉並歸還上下文
+
+        Raises:
+            BrowserPoolTimeout: 池已滿且等待超過 acquire_timeout
+        """
+        self._init_primitives()
+        try:
+            with BROWSER_PHASE_DURATION.time("acquire", server_timing="browser-acquire"):
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise BrowserPoolTimeout("Timed out waiting for a free browser page")
+
+        try:
+            slot = await self._acquire_slot()
+            context = None
+            page = None
+            try:
+                with BROWSER_PHASE_DURATION.time("context"):
+                    context = await slot.browser.new_context(**CONTEXT_OPTIONS)
+                with BROWSER_PHASE_DURATION.time("page", server_timing="browser-page"):
+                    page = await context.new_page()
+                yield page
+            finally:
+                slot.active_pages -= 1
+                slot.pages_served += 1
+                await self._release(slot, context, page)
+        finally:
+            self._semaphore.release()
+
+    def _init_primitives(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_pages)
+
+    async def _ensure_playwright(self) -> "Playwright":
+        async with self._lock:
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+
+                self._playwright = await async_playwright().start()
+            return self._playwright
+
+    async def _launch(self) -> _BrowserSlot:
+        playwright = await self._ensure_playwright()
+        with BROWSER_PHASE_DURATION.time("launch", server_timing="browser-launch"):
+            browser = await playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        slot = _BrowserSlot(browser)
+        browser.on("disconnected", lambda _: logger.warning("Browser disconnected, will be replaced"))
+        return slot
+
+    def _start_launches(self) -> None:
+        """以背景 task 補足到 size 個健康的瀏覽器（包含啟動中的）"""
+        missing = self.size - sum(1 for s in self._slots if s.healthy) - len(self._launches)
+        for _ in range(missing):
+            task = asyncio.create_task(self._launch_into_pool())
+            self._launches.add(task)
+            task.add_done_callback(self._launch_done)
+
+    async def _launch_into_pool(self) -> None:
+        self._slots.append(await self._launch())
+
+    def _launch_done(self, task: asyncio.Task) -> None:
+        self._launches.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Failed to launch browser: %s", task.exception())
+
+    async def _acquire_slot(self) -> _BrowserSlot:
+        """
+        佔用進行中頁面最少的健康瀏覽器
+
+        選擇與佔用之間沒有 await，不需要鎖；沒有健康的瀏覽器時等待背景啟動完成
+
+        Raises:
+            Exception: 沒有可用的瀏覽器且啟動失敗
+        """
+        while True:
+            # 移除已閒置的失效瀏覽器（先全部移出池再關閉，其他呼叫者不會重複處理）
+            dead = [s for s in self._slots if not s.healthy and s.active_pages == 0]
+            self._slots = [s for s in self._slots if s not in dead]
+            for slot in dead:
+                await slot.close()
+            self._start_launches()
+            healthy = [s for s in self._slots if s.healthy]
+            if healthy:
+                slot = min(healthy, key=lambda s: s.active_pages)
+                slot.active_pages += 1
+                return slot
+            done, _ = await asyncio.wait(list(self._launches), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+
+    async def _release(self, slot: _BrowserSlot, context: Optional["BrowserContext"], page: Optional["Page"]) -> None:
+        if page is not None:
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+        if self.max_pages_per_browser > 0 and slot.pages_served >= self.max_pages_per_browser:
+            slot.retiring = True
+
+        if context is not None:
+            # 上下文不重用：儲存空間、service worker、權限與 HTTP 快取都隨上下文一起清除
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+        # 已退役或崩潰的瀏覽器在所有頁面結束後才關閉
+        if not slot.healthy and slot.active_pages == 0 and slot in self._slots:
+            self._slots.remove(slot)
+            logger.info("Recycling browser after %s pages", slot.pages_served)
+            await slot.close()
+
+
+# 全域瀏覽器池，由 app 的 lifespan 管理
+browser_pool = BrowserPool()
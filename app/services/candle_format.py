@@ -0,0 +1,114 @@
+import json
+import time
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+# 每次串流輸出的 K 線數量
+CHUNK_ROWS = 5000
+
+_ROW_FIELDS = (("open", "o"), ("high", "h"), ("low", "l"), ("close", "c"), ("volume", "v"))
+
+
+def to_arrays(candles: Dict[str, List[Any]]) -> Dict[str, np.ndarray]:
+    """將 Finnhub 格式的 K 線轉為 NumPy 陣列"""
+    return {
+        "t": np.asarray(candles.get("t", []), dtype=np.int64),
+        "o": np.asarray(candles.get("o", []), dtype=np.float64),
+        "h": np.asarray(candles.get("h", []), dtype=np.float64),
+        "l": np.asarray(candles.get("l", []), dtype=np.float64),
+        "c": np.asarray(candles.get("c", []), dtype=np.float64),
+        "v": np.asarray(candles.get("v", []), dtype=np.float64),
+    }
+
+
+def format_dates(timestamps: np.ndarray) -> np.ndarray:
+    """
+    批次將 Unix 時間轉為本地時間字串（"%Y-%m-%d %H:%M:%S"）
+
+    時區位移只對不重複的小時計算一次（夏令時間切換都在整點），其餘以向量運算完成
+    """
+    if timestamps.size == 0:
+        return np.asarray([], dtype="<U19")
+    hours, inverse = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.fromiter(
+        (time.localtime(int(hour) * 3600).tm_gmtoff for hour in hours), dtype=np.int64, count=hours.size
+    )
+    local = (timestamps + offsets[inverse]).astype("datetime64[s]")
+    return np.char.replace(np.datetime_as_string(local, unit="s"), "T", " ")
+
+
+def _plain(values: np.ndarray) -> List[Any]:
+    # 成交量為整數時輸出整數，與上游格式一致
+    if values.dtype.kind == "f" and values.size and np.all(np.mod(values, 1) == 0):
+        return values.astype(np.int64).tolist()
+    return values.tolist()
+
+
+def columnar(arrays: Dict[str, np.ndarray]) -> Dict[str, List[Any]]:
+    """欄位式輸出：date 與 t/o/h/l/c/v 陣列"""
+    return {
+        "date": format_dates(arrays["t"]).tolist(),
+        "t": arrays["t"].tolist(),
+        "o": arrays["o"].tolist(),
+        "h": arrays["h"].tolist(),
+        "l": arrays["l"].tolist(),
+        "c": arrays["c"].tolist(),
+        "v": _plain(arrays["v"]),
+    }
+
+
+def rows(arrays: Dict[str, np.ndarray], start: int = 0, stop: int = None) -> List[Dict[str, Any]]:
+    """逐筆輸出（與原本的 data 格式相同）"""
+    dates = format_dates(arrays["t"][start:stop]).tolist()
+    columns = [arrays[key][start:stop].tolist() for _, key in _ROW_FIELDS[:-1]] + [_plain(arrays["v"][start:stop])]
+    names = [name for name, _ in _ROW_FIELDS]
+    return [
+        {"date": date, **dict(zip(names, values))}
+        for date, *values in zip(dates, *columns)
+    ]
+
+
+def iter_rows_json(header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> Iterator[str]:
+    """以串流方式輸出 {...header, "data": [rows]}，每次處理 CHUNK_ROWS 筆"""
+    prefix = json.dumps(header)
+    yield prefix[:-1] + (', "data": [' if header else '"data": [')
+    total = arrays["t"].size
+    for start in range(0, total, CHUNK_ROWS):
+        chunk = json.dumps(rows(arrays, start, start + CHUNK_ROWS))[1:-1]
+        yield chunk if start == 0 else "," + chunk
+    yield "]}"
+
+
+def iter_columnar_json(header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> Iterator[str]:
+    """以串流方式輸出欄位式 JSON，每個欄位分段輸出"""
+    prefix = json.dumps(header)
+    yield prefix[:-1] + (", " if header else "")
+    total = arrays["t"].size
+    fields = ["date", "t", "o", "h", "l", "c", "v"]
+    for index, field in enumerate(fields):
+        yield ("" if index == 0 else ", ") + f'"{field}": ['
+        for start in range(0, total, CHUNK_ROWS):
+            if field == "date":
+                values = format_dates(arrays["t"][start:start + CHUNK_ROWS]).tolist()
+            elif field == "v":
+                values = _plain(arrays["v"][start:start + CHUNK_ROWS])
+            else:
+                values = arrays[field][start:start + CHUNK_ROWS].tolist()
+            chunk = json.dumps(values)[1:-1]
+            yield chunk if start == 0 else "," + chunk
+        yield "]"
+    yield "}"
+
+
+def iter_csv(arrays: Dict[str, np.ndarray]) -> Iterator[str]:
+    """以串流方式輸出 CSV"""
+    yield "date,open,high,low,close,volume\n"
+    total = arrays["t"].size
+    for start in range(0, total, CHUNK_ROWS):
+        stop = start + CHUNK_ROWS
+        dates = format_dates(arrays["t"][start:stop]).tolist()
+        columns = [arrays[key][start:stop].tolist() for _, key in _ROW_FIELDS[:-1]] + [_plain(arrays["v"][start:stop])]
+        yield "".join(
+            f"{date},{o},{h},{l},{c},{v}\n" for date, o, h, l, c, v in zip(dates, *columns)
+        )
@@ -0,0 +1,205 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+from app.services.finance_cache import finance_cache
+
+logger = setup_logger(__name__, "candle_store.log")
+
+# 每種 K 線週期在多久之後才視為不會再變動（秒），未定案的部分每次都會向上游重新取得
+SETTLE_SECONDS = {
+    "1": 3600,
+    "5": 3600,
+    "15": 3600,
+    "30": 3600,
+    "60": 7200,
+    "D": 2 * 86400,
+    "W": 8 * 86400,
+    "M": 32 * 86400,
+}
+
+CANDLE_FIELDS = ("t", "o", "h", "l", "c", "v")
+
+
+def find_gaps(start: int, end: int, covered: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """回傳 [start, end] 中尚未被 covered 區間涵蓋的部分（皆為閉區間）"""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in sorted(covered):
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - 1))
+        cursor = max(cursor, covered_end + 1)
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """合併重疊或相鄰的閉區間"""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class CandleDatabase:
+    """
+    K 線資料的 SQLite 儲存
+
+    candles 保存每根 K 線，coverage 記錄已向上游取得過的時間區間（包含沒有資料的假日），
+    使用 mmap 讀取以減少複製。sqlite3 為阻塞操作，CandleStore 會在執行緒中呼叫。
+    """
+
+    def __init__(self, path: str, mmap_size: int = 0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            if mmap_size > 0:
+                self._conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS candles (
+                    symbol TEXT NOT NULL,
+                    resolution TEXT NOT NULL,
+                    t INTEGER NOT NULL,
+                    o REAL, h REAL, l REAL, c REAL, v REAL,
+                    PRIMARY KEY (symbol, resolution, t)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS coverage (
+                    symbol TEXT NOT NULL,
+                    resolution TEXT NOT NULL,
+                    start INTEGER NOT NULL,
+                    end INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_coverage ON coverage (symbol, resolution)")
+
+    def coverage(self, symbol: str, resolution: str) -> List[Tuple[int, int]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start, end FROM coverage WHERE symbol = ? AND resolution = ? ORDER BY start",
+                (symbol, resolution),
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def save(self, symbol: str, resolution: str, candles: Dict[str, List[Any]], covered: Optional[Tuple[int, int]]) -> None:
+        """寫入 K 線，並將 covered 區間併入已取得的範圍"""
+        rows = [
+            (symbol, resolution, int(t), o, h, l, c, v)
+            for t, o, h, l, c, v in zip(*(candles.get(field, []) for field in CANDLE_FIELDS))
+        ]
+        with self._lock, self._conn:
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO candles (symbol, resolution, t, o, h, l, c, v) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            if covered is not None:
+                existing = self._conn.execute(
+                    "SELECT start, end FROM coverage WHERE symbol = ? AND resolution = ?", (symbol, resolution)
+                ).fetchall()
+                merged = merge_ranges([(row[0], row[1]) for row in existing] + [covered])
+                self._conn.execute("DELETE FROM coverage WHERE symbol = ? AND resolution = ?", (symbol, resolution))
+                self._conn.executemany(
+                    "INSERT INTO coverage (symbol, resolution, start, end) VALUES (?, ?, ?, ?)",
+                    [(symbol, resolution, start, end) for start, end in merged],
+                )
+
+    def load(self, symbol: str, resolution: str, start: int, end: int) -> Dict[str, List[Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t, o, h, l, c, v FROM candles WHERE symbol = ? AND resolution = ? AND t BETWEEN ? AND ? ORDER BY t",
+                (symbol, resolution, start, end),
+            ).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * len(CANDLE_FIELDS)
+        return {field: list(column) for field, column in zip(CANDLE_FIELDS, columns)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CandleStore:
+    """
+    本機 K 線快取
+
+    查詢時只向上游取得本機尚未涵蓋的時間區間並合併寫入，已定案的歷史資料直接從磁碟讀取
+    """
+
+    def __init__(self, path: str = settings.CANDLE_STORE_PATH, mmap_size: int = settings.CANDLE_STORE_MMAP_SIZE):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._db: Optional[CandleDatabase] = None
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.upstream_fetches = 0
+
+    async def _get_db(self) -> CandleDatabase:
+        if self._db is None:
+            self._db = await asyncio.to_thread(CandleDatabase, self.path, self.mmap_size)
+        return self._db
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await asyncio.to_thread(self._db.close)
+            self._db = None
+
+    async def get_candles(self, symbol: str, resolution: str, start: int, end: int) -> Dict[str, Any]:
+        """
+        取得 [start, end] 區間的 K 線，格式與 Finnhub stock_candles 相同
+
+        Returns:
+            {"s": "ok" | "no_data", "t": [...], "o": [...], "h": [...], "l": [...], "c": [...], "v": [...]}
+        """
+        db = await self._get_db()
+        settle = SETTLE_SECONDS.get(resolution, 86400)
+        # 定案界線對齊到整點或日界，未定案區間的起點（上游快取 key）不會每次請求都不同
+        align = min(settle, 86400)
+        settled_until = (int(time.time()) - settle) // align * align
+
+        # 同一個股票與週期同時只補一次缺口
+        async with self._locks[(symbol, resolution)]:
+            covered = await asyncio.to_thread(db.coverage, symbol, resolution)
+            gaps = find_gaps(start, end, covered)
+            if gaps:
+                fetched = await asyncio.gather(
+                    *(finance_cache.stock_candles(symbol, resolution, gap_start, gap_end) for gap_start, gap_end in gaps)
+                )
+                self.upstream_fetches += len(gaps)
+                for (gap_start, gap_end), candles in zip(gaps, fetched):
+                    if candles.get("s") not in ("ok", "no_data"):
+                        raise ValueError(f"Unexpected candle status {candles.get('s')!r} for {symbol}")
+                    # 只有已定案的部分記為已取得
+                    covered_range = (gap_start, min(gap_end, settled_until)) if gap_start <= settled_until else None
+                    await asyncio.to_thread(
+                        db.save, symbol, resolution, candles if candles.get("s") == "ok" else {}, covered_range
+                    )
+                logger.info("Fetched %s missing ranges of %s (%s) from upstream", len(gaps), symbol, resolution)
+
+        data = await asyncio.to_thread(db.load, symbol, resolution, start, end)
+        data["s"] = "ok" if data["t"] else "no_data"
+        return data
+
+
+# 全域 K 線儲存，由 app 的 lifespan 關閉
+candle_store = CandleStore()
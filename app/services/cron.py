@@ -0,0 +1,445 @@
+import calendar
+import copy
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pytz
+from croniter import CroniterBadDateError, croniter
+
+from app.core.config import settings
+
+
+class CronTime(NamedTuple):
+    """比對 cron 時需要的時間欄位，同一時間比對多個表達式時只計算一次"""
+
+    moment: datetime
+    second: int
+    minute: int
+    hour: int
+    day: int
+    month: int
+    weekday: int  # 0 = 星期日，與 cron 相同
+    last_day: bool  # 是否為當月最後一天
+
+    @classmethod
+    def from_datetime(cls, moment: datetime) -> "CronTime":
+        days_in_month = calendar.monthrange(moment.year, moment.month)[1]
+        return cls(
+            moment=moment,
+            second=moment.second,
+            minute=moment.minute,
+            hour=moment.hour,
+            day=moment.day,
+            month=moment.month,
+            weekday=(moment.weekday() + 1) % 7,
+            last_day=moment.day == days_in_month,
+        )
+
+
+# 各月份最多的天數（2 月以閏年計）
+_MONTH_DAYS = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _mask(values: list, all_bits: int) -> int:
+    """將 croniter 展開的欄位轉為 bitmask（第 n 位代表值 n），'*' 為全部"""
+    if values == ["*"]:
+        return all_bits
+    mask = 0
+    for value in values:
+        if not isinstance(value, int):
+            raise TypeError(f"Unsupported cron field value {value!r}")
+        mask |= 1 << value
+    return mask
+
+
+class CompiledCron:
+    """
+    解析過的 cron 表達式
+
+    各欄位轉為 bitmask，比對時只需位元運算，語意與 croniter.match 相同
+    （日期與星期都有限制時任一符合即可）。第 n 個星期幾（#、L）等不支援的語法
+    改用 croniter.match 比對：croniter 對這類表達式的日期與星期組合規則不同。
+
+    Raises:
+        croniter 的 CroniterError: 表達式無效
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.croniter = croniter(expression)
+        expanded = self.croniter.expanded
+        self.has_seconds = len(expanded) == 6
+        # 第 n 個星期幾（5#2、5L）一律交給 croniter
+        self.fallback = len(expanded) > 6 or bool(self.croniter.nth_weekday_of_month)
+        try:
+            self.minutes = _mask(expanded[0], (1 << 60) - 1)
+            self.hours = _mask(expanded[1], (1 << 24) - 1)
+            # 日期欄位的 L 代表當月最後一天
+            self.last_day = "l" in expanded[2]
+            self.days = _mask([v for v in expanded[2] if v != "l"], (1 << 32) - 2)
+            self.months = _mask(expanded[3], (1 << 13) - 2)
+            self.weekdays = _mask(expanded[4], (1 << 7) - 1)
+            self.seconds = _mask(expanded[5], (1 << 60) - 1) if self.has_seconds else (1 << 60) - 1
+            self.days_any = expanded[2] == ["*"]
+            self.weekdays_any = expanded[4] == ["*"]
+        except TypeError:
+            self.fallback = True
+            return
+        # 指定的日期在所有指定月份都不存在時（例如 31 6,11），croniter 即使星期符合也不會比對成功
+        max_days = max(_MONTH_DAYS[month] for month in range(1, 13) if (self.months >> month) & 1)
+        if not self.last_day and not self.days & ((1 << (max_days + 1)) - 1):
+            self.fallback = True
+
+    def match(self, time: CronTime) -> bool:
+        if self.fallback:
+            return croniter.match(self.expression, time.moment)
+        if not (
+            (self.minutes >> time.minute) & 1
+            and (self.hours >> time.hour) & 1
+            and (self.months >> time.month) & 1
+            and (self.seconds >> time.second) & 1
+        ):
+            return False
+        if self.days_any and self.weekdays_any:
+            return True
+        day_match = bool((self.days >> time.day) & 1) or (self.last_day and time.last_day)
+        weekday_match = bool((self.weekdays >> time.weekday) & 1)
+        if self.days_any:
+            return weekday_match
+        if self.weekdays_any:
+            return day_match
+        return day_match or weekday_match
+
+    def next_times(self, start: datetime, count: int) -> List[datetime]:
+        """
+        start 之後的 count 個觸發時間（保留 start 的時區）
+
+        不會觸發的表達式（例如 0 0 31 2 *）在 croniter 找不到下一次時停止，可能少於 count 個
+        """
+        iterator = copy.copy(self.croniter)
+        iterator.set_current(start, force=True)
+        times = []
+        try:
+            for _ in range(count):
+                times.append(iterator.get_next(datetime))
+        except CroniterBadDateError:
+            pass
+        return times
+
+
+@lru_cache(maxsize=settings.CRON_CACHE_SIZE)
+def compile_cron(expression: str) -> CompiledCron:
+    """解析並快取 cron 表達式（無效的表達式不會被快取）"""
+    return CompiledCron(expression)
+
+
+def resolve_datetime(value: str, tz: Optional[str] = None) -> datetime:
+    """
+    解析 ISO 格式時間，指定 tz 時在該時區比對（沒有時區的時間視為該時區的本地時間）
+
+    Raises:
+        ValueError: 時間格式或時區無效
+    """
+    moment = datetime.fromisoformat(value)
+    if tz:
+        try:
+            zone = pytz.timezone(tz)
+        except pytz.UnknownTimeZoneError:
+            raise ValueError(f"Unknown timezone: {tz}")
+        moment = zone.localize(moment) if moment.tzinfo is None else moment.astimezone(zone)
+    return moment
+
+
+def _localize(naive: datetime, tzinfo) -> datetime:
+    """將本地時間加上時區（pytz 時區需使用 localize）"""
+    if tzinfo is None:
+        return naive
+    if hasattr(tzinfo, "localize"):
+        return tzinfo.localize(naive)
+    return naive.replace(tzinfo=tzinfo)
+
+
+def _iter_bits(bits: int) -> Iterator[int]:
+    """依序產生 bits 中為 1 的位置，成本與 1 的數量成正比"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def _values(bits: int) -> np.ndarray:
+    return np.fromiter(_iter_bits(bits), dtype=np.intp)
+
+
+class _JobBits(NamedTuple):
+    """工作在各索引中佔用的欄位值"""
+
+    months: np.ndarray
+    days: np.ndarray
+    weekdays: np.ndarray
+    hours: np.ndarray
+    minute_of_day: np.ndarray
+    last_day: bool
+    day_or: bool
+
+    @classmethod
+    def from_compiled(cls, compiled: CompiledCron) -> "_JobBits":
+        hours = _values(compiled.hours)
+        return cls(
+            months=_values(compiled.months),
+            days=_values(compiled.days),
+            weekdays=_values(compiled.weekdays),
+            hours=hours,
+            minute_of_day=np.add.outer(hours * 60, _values(compiled.minutes)).ravel(),
+            last_day=compiled.last_day,
+            day_or=not compiled.days_any and not compiled.weekdays_any,
+        )
+
+
+# 各欄位值的索引表：名稱 -> 值的數量
+_TABLES = {"_months": 13, "_days": 32, "_weekdays": 7, "_hours": 24, "_minute_of_day": 1440}
+
+
+class CronRegistry:
+    """
+    已註冊排程工作的索引
+
+    每個工作佔一個位置，每個欄位值對應一列「包含該值的工作」bitset（NumPy uint8，每個 byte 8 個工作）：
+    月份、日期、星期、小時，以及以一天中第幾分鐘（hour * 60 + minute）為 key 的索引。
+    註冊與移除只更新該工作的欄位值所在的 byte，成本與工作總數無關；批次註冊一次寫入所有工作。
+    查詢某一分鐘時只需數列 bitset 交集，再列舉結果中的工作；區間查詢逐日、逐小時交集，
+    沒有工作的日期與小時直接跳過。
+
+    秒級、第 n 個星期幾與其他 bitset 無法表示的表達式另外保存，以 croniter 個別比對。
+    """
+
+    def __init__(self, max_jobs: int = settings.CRON_REGISTRY_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._jobs: List[Optional[Tuple[str, CompiledCron]]] = []
+        self._free: List[int] = []
+        self._capacity = 0  # 每列的 byte 數
+        self._months = np.zeros((13, 0), dtype=np.uint8)
+        self._days = np.zeros((32, 0), dtype=np.uint8)
+        self._weekdays = np.zeros((7, 0), dtype=np.uint8)
+        self._hours = np.zeros((24, 0), dtype=np.uint8)
+        self._minute_of_day = np.zeros((1440, 0), dtype=np.uint8)
+        self._last_day = np.zeros(0, dtype=np.uint8)  # 日期欄位包含 L 的工作
+        self._day_or = np.zeros(0, dtype=np.uint8)  # 日期與星期都有限制（任一符合即可）的工作
+        self._slow: Dict[int, CompiledCron] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _is_slow(compiled: CompiledCron) -> bool:
+        return compiled.fallback or compiled.has_seconds
+
+    def register(self, job_id: str, expression: str) -> None:
+        """
+        註冊或取代排程工作
+
+        Raises:
+            croniter 的 CroniterError: 表達式無效
+            OverflowError: 工作數量已達上限
+        """
+        compiled = compile_cron(expression)
+        with self._lock:
+            self._add([(job_id, compiled)])
+
+    def register_many(self, jobs: Sequence[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        批次註冊或取代排程工作，所有工作的 bitset 一次寫入
+
+        Returns:
+            無效的工作 id -> 錯誤訊息（其餘工作照常註冊）
+
+        Raises:
+            OverflowError: 註冊後會超過上限（此時不會註冊任何工作）
+        """
+        compiled_jobs: Dict[str, CompiledCron] = {}
+        errors: Dict[str, str] = {}
+        for job_id, expression in jobs:
+            try:
+                compiled_jobs[job_id] = compile_cron(expression)
+                errors.pop(job_id, None)
+            except Exception:
+                compiled_jobs.pop(job_id, None)
+                errors[job_id] = "Invalid cron expression."
+        with self._lock:
+            self._add(list(compiled_jobs.items()))
+        return errors
+
+    def remove(self, job_id: str) -> bool:
+        with self._lock:
+            if job_id not in self._ids:
+                return False
+            self._remove(job_id)
+            return True
+
+    def _add(self, jobs: List[Tuple[str, CompiledCron]]) -> None:
+        # 呼叫者需持有 self._lock
+        added = sum(1 for job_id, _ in jobs if job_id not in self._ids)
+        if len(self._ids) + added > self.max_jobs:
+            raise OverflowError(f"Too many registered jobs (max {self.max_jobs})")
+        fast: List[Tuple[int, CompiledCron]] = []
+        for job_id, compiled in jobs:
+            if job_id in self._ids:
+                self._remove(job_id)
+            index = self._free.pop() if self._free else len(self._jobs)
+            if index == len(self._jobs):
+                self._jobs.append(None)
+            self._jobs[index] = (job_id, compiled)
+            self._ids[job_id] = index
+            if self._is_slow(compiled):
+                self._slow[index] = compiled
+            else:
+                fast.append((index, compiled))
+        if fast:
+            self._grow(len(self._jobs))
+            self._set_bits(fast)
+
+    def _remove(self, job_id: str) -> None:
+        index = self._ids.pop(job_id)
+        _, compiled = self._jobs[index]
+        if self._slow.pop(index, None) is None:
+            self._clear_bits(index, compiled)
+        self._jobs[index] = None
+        self._free.append(index)
+
+    def _grow(self, jobs: int) -> None:
+        """確保每列可容納 jobs 個工作，不足時容量加倍"""
+        needed = (jobs + 7) // 8
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, 16)
+        for name in _TABLES:
+            table = getattr(self, name)
+            grown = np.zeros((table.shape[0], capacity), dtype=np.uint8)
+            grown[:, :self._capacity] = table
+            setattr(self, name, grown)
+        for name in ("_last_day", "_day_or"):
+            grown = np.zeros(capacity, dtype=np.uint8)
+            grown[:self._capacity] = getattr(self, name)
+            setattr(self, name, grown)
+        self._capacity = capacity
+
+    def _set_bits(self, jobs: List[Tuple[int, CompiledCron]]) -> None:
+        """一次寫入多個工作的 bit（相同表達式只展開一次）"""
+        expanded: Dict[int, _JobBits] = {}
+        job_bits = []
+        for index, compiled in jobs:
+            bits = expanded.get(id(compiled))
+            if bits is None:
+                bits = expanded[id(compiled)] = _JobBits.from_compiled(compiled)
+            job_bits.append(bits)
+        indices = np.fromiter((index for index, _ in jobs), dtype=np.intp, count=len(jobs))
+        columns, masks = indices >> 3, (1 << (indices & 7)).astype(np.uint8)
+        for name in _TABLES:
+            values = [getattr(bits, name[1:]) for bits in job_bits]
+            counts = [len(v) for v in values]
+            np.bitwise_or.at(
+                getattr(self, name),
+                (np.concatenate(values), np.repeat(columns, counts)),
+                np.repeat(masks, counts),
+            )
+        for name in ("_last_day", "_day_or"):
+            selected = np.fromiter((getattr(bits, name[1:]) for bits in job_bits), dtype=bool, count=len(jobs))
+            np.bitwise_or.at(getattr(self, name), columns[selected], masks[selected])
+
+    def _clear_bits(self, index: int, compiled: CompiledCron) -> None:
+        """只清除該工作設定過的欄位值"""
+        bits = _JobBits.from_compiled(compiled)
+        column, mask = index >> 3, np.uint8(~(1 << (index & 7)) & 0xFF)
+        for name in _TABLES:
+            getattr(self, name)[getattr(bits, name[1:]), column] &= mask
+        self._last_day[column] &= mask
+        self._day_or[column] &= mask
+
+    def _job_ids(self, bits: np.ndarray) -> List[str]:
+        return [self._jobs[index][0] for index in np.flatnonzero(np.unpackbits(bits, bitorder="little")).tolist()]
+
+    def _day_bits(self, time: CronTime) -> np.ndarray:
+        """當天（月份、日期、星期）符合的工作"""
+        days = (self._days[time.day] | self._last_day) if time.last_day else self._days[time.day]
+        weekdays = self._weekdays[time.weekday]
+        matched = (days & weekdays & ~self._day_or) | ((days | weekdays) & self._day_or)
+        return matched & self._months[time.month]
+
+    def jobs(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [{"id": job[0], "cron": job[1].expression} for job in self._jobs if job is not None]
+
+    def due(self, moment: datetime) -> List[str]:
+        """在 moment 這一分鐘觸發的工作"""
+        time = CronTime.from_datetime(moment)
+        with self._lock:
+            matched = self._job_ids(self._minute_of_day[time.hour * 60 + time.minute] & self._day_bits(time))
+            matched.extend(self._jobs[index][0] for index, compiled in self._slow.items() if compiled.match(time))
+        return matched
+
+    def window(self, start: datetime, end: datetime) -> Dict[str, datetime]:
+        """
+        [start, end] 之間會觸發的工作與各自的第一次觸發時間
+
+        以 start 的時區逐日計算（牆上時間）；每個小時只處理有工作的 byte，一次找出各工作的第一個觸發分鐘
+        """
+        first: Dict[str, datetime] = {}
+        tzinfo = start.tzinfo
+        end = end.astimezone(tzinfo) if end.tzinfo is not None and tzinfo is not None else end
+        # 觸發時間為整分鐘，從 start 之後的第一個整分鐘開始
+        first_minute = start.replace(second=0, microsecond=0)
+        if first_minute < start:
+            first_minute += timedelta(minutes=1)
+        first_minute_of_day = first_minute.hour * 60 + first_minute.minute
+        last_minute_of_day = end.hour * 60 + end.minute
+
+        with self._lock:
+            pending = np.full(self._capacity, 0xFF, dtype=np.uint8)  # 尚未找到觸發時間的工作
+            day = first_minute.date()
+            while day <= end.date():
+                moment = datetime(day.year, day.month, day.day)
+                bits = self._day_bits(CronTime.from_datetime(moment)) & pending
+                low = first_minute_of_day if day == first_minute.date() else 0
+                high = last_minute_of_day if day == end.date() else 1439
+                if bits.any():
+                    for hour in range(low // 60, high // 60 + 1):
+                        columns = np.flatnonzero(bits & self._hours[hour])
+                        if not columns.size:
+                            continue
+                        start_minute, end_minute = max(low, hour * 60), min(high, hour * 60 + 59)
+                        # 列為分鐘、欄為工作：每個工作取第一個為 1 的分鐘
+                        block = self._minute_of_day[start_minute:end_minute + 1, columns] & bits[columns]
+                        flags = np.unpackbits(block, axis=1, bitorder="little").astype(bool)
+                        hit = flags.any(axis=0)
+                        if not hit.any():
+                            continue
+                        positions = np.flatnonzero(hit)
+                        rows = flags.argmax(axis=0)[positions]
+                        indices = columns[positions >> 3] * 8 + (positions & 7)
+                        fired_at: Dict[int, datetime] = {}
+                        for index, row in zip(indices.tolist(), rows.tolist()):
+                            if row not in fired_at:
+                                fired_at[row] = _localize(moment + timedelta(minutes=start_minute + row), tzinfo)
+                            first[self._jobs[index][0]] = fired_at[row]
+                        found = np.packbits(hit, bitorder="little")
+                        bits[columns] &= ~found
+                        pending[columns] &= ~found
+                        if not bits.any():
+                            break
+                day += timedelta(days=1)
+
+            slow = [(self._jobs[index][0], compiled) for index, compiled in self._slow.items()]
+        for job_id, compiled in slow:
+            fired = compiled.next_times(start - timedelta(microseconds=1), 1)
+            if fired and fired[0] <= end:
+                first[job_id] = fired[0]
+        return first
+
+
+# 全域排程工作索引（只存在記憶體中，重新啟動後需重新註冊）
+cron_registry = CronRegistry()
@@ -0,0 +1,178 @@
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+# 擷取正文時移除的元素
+_NOISE_TAGS = [
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas",
+    "nav", "header", "footer", "aside", "form", "button", "select",
+]
+_NOISE_PATTERN = re.compile(
+    r"comment|sidebar|footer|header|menu|nav|share|social|promo|advert|banner|cookie|related|subscribe",
+    re.I,
+)
+_BLOCK_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre", "td", "th", "dd", "dt", "figcaption"}
+_WHITESPACE = re.compile(r"\s+")
+
+
+def parse_html(content: str) -> Optional[lxml.html.HtmlElement]:
+    if not content or not content.strip():
+        return None
+    try:
+        return lxml.html.document_fromstring(content)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _clean_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _strip_noise(root: lxml.html.HtmlElement) -> None:
+    for element in root.xpath("|".join(f"//{tag}" for tag in _NOISE_TAGS)):
+        element.drop_tree()
+    for element in root.xpath("//*[@class or @id]"):
+        if element.tag in ("html", "body", "main", "article"):
+            continue
+        marker = f"{element.get('class', '')} {element.get('id', '')}"
+        if _NOISE_PATTERN.search(marker) and len(element.text_content()) < 2000:
+            element.drop_tree()
+
+
+def _best_container(root: lxml.html.HtmlElement) -> lxml.html.HtmlElement:
+    """找出段落文字最多的容器"""
+    candidates = root.xpath("//article") or root.xpath("//main") or root.xpath("//*[@role='main']")
+    if candidates:
+        return max(candidates, key=lambda element: len(element.text_content()))
+
+    scores: Dict[lxml.html.HtmlElement, int] = {}
+    for paragraph in root.iter("p"):
+        length = len(_clean_text(paragraph.text_content()))
+        if length < 25:
+            continue
+        parent = paragraph.getparent()
+        if parent is not None:
+            scores[parent] = scores.get(parent, 0) + length
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + length // 2
+    if scores:
+        return max(scores, key=scores.get)
+    body = root.find("body")
+    return body if body is not None else root
+
+
+def extract_main_text(content: str) -> str:
+    """
+    擷取頁面的主要文字內容
+
+    移除導覽列、頁尾、腳本等雜訊，優先使用 article/main，否則選擇段落文字最多的容器；
+    每個段落一行
+    """
+    root = parse_html(content)
+    if root is None:
+        return ""
+    _strip_noise(root)
+    container = _best_container(root)
+
+    lines: List[str] = []
+    for element in container.iter():
+        if element.tag in _BLOCK_TAGS:
+            # 巢狀的區塊只取最外層，避免重複
+            if any(ancestor.tag in _BLOCK_TAGS for ancestor in element.iterancestors()):
+                continue
+            text = _clean_text(element.text_content())
+            if text:
+                lines.append(text)
+    if not lines:
+        text = _clean_text(container.text_content())
+        return text
+    return "\n".join(lines)
+
+
+def extract_fragments(content: str, selectors: List[str], as_text: bool = False) -> Dict[str, List[str]]:
+    """
+    依 CSS 或 XPath 選擇器擷取片段
+
+    以 "/"、"./" 或 "xpath=" 開頭的選擇器視為 XPath，其他視為 CSS
+
+    Raises:
+        ValueError: 選擇器語法錯誤
+    """
+    root = parse_html(content)
+    fragments: Dict[str, List[str]] = {}
+    for selector in selectors:
+        if root is None:
+            fragments[selector] = []
+            continue
+        try:
+            if selector.startswith("xpath="):
+                matches = root.xpath(selector[len("xpath="):])
+            elif selector.startswith(("/", "./", "(")):
+                matches = root.xpath(selector)
+            else:
+                matches = CSSSelector(selector)(root)
+        except Exception as e:
+            raise ValueError(f"Invalid selector {selector!r}: {str(e)}")
+
+        values: List[str] = []
+        for match in matches if isinstance(matches, list) else [matches]:
+            if isinstance(match, etree._Element):
+                if as_text:
+                    values.append(_clean_text(match.text_content()))
+                else:
+                    values.append(etree.tostring(match, encoding="unicode", method="html", with_tail=False))
+            else:
+                # XPath 可回傳屬性值或文字
+                values.append(str(match))
+        fragments[selector] = values
+    return fragments
+
+
+def extract_links(content: str, base_url: str) -> List[Dict[str, str]]:
+    """擷取頁面中的所有連結（轉為絕對網址並去除重複）"""
+    root = parse_html(content)
+    if root is None:
+        return []
+    seen = set()
+    links: List[Dict[str, str]] = []
+    for anchor in root.iter("a"):
+        href = (anchor.get("href") or "").strip()
+        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
+            continue
+        url = urljoin(base_url, href)
+        if url in seen:
+            continue
+        seen.add(url)
+        links.append({"url": url, "text": _clean_text(anchor.text_content())})
+    return links
+
+
+def extract_metadata(content: str, base_url: str) -> Dict[str, str]:
+    """擷取標題、描述、canonical、語言以及 Open Graph / Twitter meta"""
+    root = parse_html(content)
+    if root is None:
+        return {}
+    metadata: Dict[str, str] = {}
+    title = root.findtext(".//title")
+    if title:
+        metadata["title"] = _clean_text(title)
+    lang = root.get("lang")
+    if lang:
+        metadata["lang"] = lang
+    for meta in root.iter("meta"):
+        name = (meta.get("property") or meta.get("name") or "").strip().lower()
+        value = meta.get("content")
+        if not name or value is None:
+            continue
+        if name in ("description", "keywords", "author") or name.startswith(("og:", "twitter:", "article:")):
+            metadata.setdefault(name, value.strip())
+    for link in root.iter("link"):
+        if "canonical" in (link.get("rel") or "").lower().split() and link.get("href"):
+            metadata["canonical"] = urljoin(base_url, link.get("href"))
+            break
+    return metadata
@@ -0,0 +1,76 @@
+from typing import Any, Dict
+
+from app.core.cache import StaleWhileRevalidateCache
+from app.core.config import settings
+from app.services.finnhub_client import AsyncFinnhubClient, finnhub_client
+
+
+class CachedFinnhubClient:
+    """
+    在 AsyncFinnhubClient 前加上依資料類型分層的快取
+
+    - quote: 數秒（FINANCE_CACHE_TTL_QUOTE）
+    - profile: 公司資料幾乎不變，預設沿用 YAHOO_FINANCE_CACHE_EXPIRY
+    - news: 數分鐘（FINANCE_CACHE_TTL_NEWS）
+    - candles: 歷史 K 線（FINANCE_CACHE_TTL_CANDLES）
+
+    過期後在 stale 期間內先回傳舊值並在背景更新。
+    CACHE_BACKEND 為 sqlite / redis 時多個 worker 共用快取，同一個 key 只有一個 worker 向上游取得
+    """
+
+    def __init__(self, client: AsyncFinnhubClient):
+        self.client = client
+        max_entries = settings.FINANCE_CACHE_MAX_ENTRIES
+        profile_ttl = settings.FINANCE_CACHE_TTL_PROFILE or settings.YAHOO_FINANCE_CACHE_EXPIRY
+        self.caches: Dict[str, StaleWhileRevalidateCache] = {
+            "quote": StaleWhileRevalidateCache(
+                "quote", settings.FINANCE_CACHE_TTL_QUOTE, settings.FINANCE_CACHE_STALE_QUOTE, max_entries
+            ),
+            "profile": StaleWhileRevalidateCache(
+                "profile", profile_ttl, settings.FINANCE_CACHE_STALE_PROFILE, max_entries
+            ),
+            "news": StaleWhileRevalidateCache(
+                "news", settings.FINANCE_CACHE_TTL_NEWS, settings.FINANCE_CACHE_STALE_NEWS, max_entries
+            ),
+            "candles": StaleWhileRevalidateCache(
+                "candles", settings.FINANCE_CACHE_TTL_CANDLES, settings.FINANCE_CACHE_STALE_CANDLES, max_entries
+            ),
+        }
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+    async def close(self) -> None:
+        for cache in self.caches.values():
+            await cache.close()
+
+    async def quote(self, symbol: str) -> Dict[str, Any]:
+        return await self.caches["quote"].get_or_fetch(
+            f"quote:{symbol}", lambda: self.client.quote(symbol)
+        )
+
+    async def company_profile2(self, **params: Any) -> Dict[str, Any]:
+        key = "profile:" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        return await self.caches["profile"].get_or_fetch(
+            key, lambda: self.client.company_profile2(**params)
+        )
+
+    async def company_news(self, symbol: str, _from: str, to: str) -> Any:
+        return await self.caches["news"].get_or_fetch(
+            f"company_news:{symbol}:{_from}:{to}", lambda: self.client.company_news(symbol, _from=_from, to=to)
+        )
+
+    async def general_news(self, category: str, min_id: int = 0) -> Any:
+        return await self.caches["news"].get_or_fetch(
+            f"general_news:{category}:{min_id}", lambda: self.client.general_news(category, min_id=min_id)
+        )
+
+    async def stock_candles(self, symbol: str, resolution: str, _from: int, to: int) -> Dict[str, Any]:
+        return await self.caches["candles"].get_or_fetch(
+            f"candles:{symbol}:{resolution}:{_from}:{to}",
+            lambda: self.client.stock_candles(symbol, resolution, _from, to),
+        )
+
+
+# 全域快取後的 Finnhub 客戶端
+finance_cache = CachedFinnhubClient(finnhub_client)
@@ -0,0 +1,128 @@
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.rate_limit import TokenBucket
+
+FINNHUB_REQUEST_DURATION = registry.histogram(
+    "finnhub_request_duration_seconds", "Finnhub REST latency per endpoint (excluding rate limit wait)", ("endpoint",)
+)
+FINNHUB_RATE_LIMIT_WAIT = registry.histogram(
+    "finnhub_rate_limit_wait_seconds", "Time spent waiting for the Finnhub rate limiter"
+)
+FINNHUB_ERRORS = registry.counter(
+    "finnhub_errors_total", "Failed Finnhub requests per endpoint and status (error for transport failures)",
+    ("endpoint", "status")
+)
+
+
+class FinnhubAPIException(Exception):
+    """Finnhub 回傳錯誤狀態碼"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"FinnhubAPIException(status_code: {self.status_code}): {self.message}"
+
+
+class AsyncFinnhubClient:
+    """
+    非阻塞的 Finnhub REST 客戶端
+
+    使用共用連線池（keep-alive）的 httpx.AsyncClient，方法名稱與參數與 finnhub-python 相同，
+    base_url 可指向本機的假 Finnhub 伺服器（見 tools/fake_finnhub.py）。
+    所有請求共用一個 token bucket，依 Finnhub 的每分鐘配額排程。
+    """
+
+    def __init__(
+        self,
+        api_key: str = settings.FINNHUB_API_KEY,
+        base_url: str = settings.FINNHUB_API_URL,
+        timeout: float = settings.FINNHUB_TIMEOUT,
+        max_connections: int = settings.FINNHUB_MAX_CONNECTIONS,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        # 配額以 API key 計算，由所有 worker 平分
+        workers = max(1, settings.WEB_CONCURRENCY)
+        self.limiter = TokenBucket(
+            rate=settings.FINNHUB_RATE_LIMIT_PER_MINUTE / 60 / workers,
+            capacity=settings.FINNHUB_RATE_LIMIT_BURST / workers,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Accept": "application/json",
+                    "User-Agent": "n8n-api",
+                    "X-Finnhub-Token": self.api_key,
+                },
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, path: str, params: Dict[str, Any]) -> Any:
+        # 等待配額，預計等待過久時直接失敗（RateLimitExceeded）
+        with FINNHUB_RATE_LIMIT_WAIT.time():
+            await self.limiter.acquire(timeout=settings.FINNHUB_RATE_LIMIT_MAX_WAIT)
+        try:
+            with FINNHUB_REQUEST_DURATION.time(path, server_timing="finnhub"):
+                response = await self._get_client().get(path, params=params)
+        except httpx.HTTPError:
+            FINNHUB_ERRORS.inc(path, "error")
+            raise
+        if response.status_code == 429:
+            # 超過上游配額時暫停所有請求
+            try:
+                retry_after = float(response.headers.get("Retry-After", ""))
+            except ValueError:
+                retry_after = settings.FINNHUB_RATE_LIMIT_PENALTY
+            self.limiter.penalize(retry_after)
+        if response.status_code >= 400:
+            FINNHUB_ERRORS.inc(path, str(response.status_code))
+            try:
+                message = response.json().get("error", response.text)
+            except ValueError:
+                message = response.text
+            raise FinnhubAPIException(response.status_code, message)
+        return response.json()
+
+    async def quote(self, symbol: str) -> Dict[str, Any]:
+        return await self._get("/quote", {"symbol": symbol})
+
+    async def company_profile2(self, **params: Any) -> Dict[str, Any]:
+        return await self._get("/stock/profile2", params)
+
+    async def company_news(self, symbol: str, _from: str, to: str) -> Any:
+        return await self._get("/company-news", {"symbol": symbol, "from": _from, "to": to})
+
+    async def stock_candles(self, symbol: str, resolution: str, _from: int, to: int) -> Dict[str, Any]:
+        return await self._get(
+            "/stock/candle", {"symbol": symbol, "resolution": resolution, "from": _from, "to": to}
+        )
+
+    async def general_news(self, category: str, min_id: int = 0) -> Any:
+        return await self._get("/news", {"category": category, "minId": min_id})
+
+
+# 全域 Finnhub 客戶端，由 app 的 lifespan 關閉
+finnhub_client = AsyncFinnhubClient()
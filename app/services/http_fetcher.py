@@ -0,0 +1,167 @@
+import html
+import re
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+from app.services.browser_pool import CONTEXT_OPTIONS
+
+# 與瀏覽器相同的 User-Agent 與 headers（Accept-Encoding 交給 httpx 決定）
+HTTP_HEADERS = {
+    'User-Agent': CONTEXT_OPTIONS["user_agent"],
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# 機器人驗證頁面的特徵
+CHALLENGE_STATUSES = {403, 429, 503}
+CHALLENGE_MARKERS = (
+    "cf-browser-verification",
+    "cf-chl-",
+    "challenge-platform",
+    "just a moment...",
+    "attention required! | cloudflare",
+    "ddos-guard",
+    "g-recaptcha",
+    "h-captcha",
+    "px-captcha",
+    "_incapsula_resource",
+    "perimeterx",
+)
+
+# 只有 JS 外殼的頁面特徵
+JS_SHELL_MARKERS = (
+    "enable javascript",
+    "javascript is required",
+    "javascript is disabled",
+    "requires javascript",
+)
+_EMPTY_APP_ROOT = re.compile(r'<div[^>]+id=["\'](?:root|app|__next|___gatsby)["\'][^>]*>\s*</div>', re.I)
+
+_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.I | re.S)
+_SCRIPT_STYLE = re.compile(r"<(script|style|noscript|template)\b[^>]*>.*?</\1>", re.I | re.S)
+_TAG = re.compile(r"<[^>]+>")
+_WHITESPACE = re.compile(r"\s+")
+
+
+# 可抓取的內容類型（未提供 Content-Type 時視為 HTML）
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+
+class HttpFetchRejected(Exception):
+    """回應不適合抓取（非 HTML 或超過大小上限），status_code 為回給呼叫者的狀態碼"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class HttpFetchResult:
+    """純 HTTP 抓取的結果"""
+
+    def __init__(self, status: int, content: str, content_type: str, url: str):
+        self.status = status
+        self.content = content
+        self.content_type = content_type
+        self.url = url
+
+    @property
+    def title(self) -> str:
+        match = _TITLE.search(self.content)
+        return html.unescape(match.group(1)).strip() if match else ""
+
+
+def visible_text(content: str) -> str:
+    """粗略取得 HTML 中可見的文字"""
+    text = _TAG.sub(" ", _SCRIPT_STYLE.sub(" ", content))
+    return _WHITESPACE.sub(" ", html.unescape(text)).strip()
+
+
+def escalation_reason(result: HttpFetchResult) -> Optional[str]:
+    """
+    判斷 HTTP 結果是否需要改用瀏覽器重新抓取
+
+    Returns:
+        需要改用瀏覽器的原因，不需要時回傳 None
+    """
+    lowered = result.content[:200_000].lower()
+    if not lowered.strip():
+        return "empty_body"
+    if any(marker in lowered for marker in CHALLENGE_MARKERS):
+        return "bot_challenge"
+    if result.status in CHALLENGE_STATUSES:
+        return f"status_{result.status}"
+    if result.status in (404, 410):
+        # 不存在的頁面用瀏覽器也一樣
+        return None
+    text = visible_text(result.content)
+    if len(text) < settings.SCRAPE_HTTP_MIN_TEXT_LENGTH:
+        if _EMPTY_APP_ROOT.search(result.content) or any(marker in lowered for marker in JS_SHELL_MARKERS):
+            return "js_shell"
+        return "thin_content"
+    return None
+
+
+class HttpFetcher:
+    """
+    共用連線池（keep-alive）的非同步 HTTP 客戶端
+
+    回應以串流讀取：非 HTML 的內容不讀取本文，超過 max_bytes 時中止
+    """
+
+    def __init__(self, max_bytes: int = settings.SCRAPE_HTTP_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=HTTP_HEADERS,
+                timeout=settings.SCRAPE_HTTP_TIMEOUT,
+                follow_redirects=True,
+                verify=settings.SCRAPE_HTTP_VERIFY_TLS,
+                limits=httpx.Limits(
+                    max_connections=settings.SCRAPE_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.SCRAPE_HTTP_MAX_KEEPALIVE,
+                ),
+            )
+        return self._client
+
+    async def fetch(self, url: str) -> HttpFetchResult:
+        """
+        Raises:
+            HttpFetchRejected: 非 HTML 內容（415）或超過大小上限（413）
+            httpx.HTTPError: 連線或 TLS 驗證失敗等
+        """
+        async with self._get_client().stream("GET", url) as response:
+            content_type = response.headers.get("content-type", "").lower()
+            media_type = content_type.split(";", 1)[0].strip()
+            if media_type and media_type not in HTML_CONTENT_TYPES:
+                raise HttpFetchRejected(415, f"Unsupported content type: {media_type}")
+            declared = response.headers.get("content-length", "")
+            if declared.isdigit() and int(declared) > self.max_bytes:
+                raise HttpFetchRejected(413, f"Response is larger than {self.max_bytes} bytes")
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                # 以解壓後的大小計算，壓縮炸彈也會被中止
+                if len(body) > self.max_bytes:
+                    raise HttpFetchRejected(413, f"Response is larger than {self.max_bytes} bytes")
+            return HttpFetchResult(
+                status=response.status_code,
+                content=body.decode(response.encoding or "utf-8", errors="replace"),
+                content_type=content_type,
+                url=str(response.url),
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# 全域 HTTP 客戶端，由 app 的 lifespan 關閉
+http_fetcher = HttpFetcher()
@@ -0,0 +1,210 @@
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 指標名稱 -> 預設參數（未指定的參數依序補上預設值）
+INDICATOR_DEFAULTS: Dict[str, Tuple[float, ...]] = {
+    "sma": (20,),
+    "ema": (20,),
+    "rsi": (14,),
+    "macd": (12, 26, 9),
+    "bbands": (20, 2),
+    "vwap": (),
+}
+INDICATOR_ALIASES = {"bollinger": "bbands", "bb": "bbands"}
+
+
+class IndicatorSpec:
+    """解析後的指標設定，例如 "macd:12:26:9" """
+
+    def __init__(self, name: str, params: Tuple[float, ...]):
+        self.name = name
+        self.params = params
+
+    @property
+    def key(self) -> str:
+        return ":".join([self.name] + [_format_param(p) for p in self.params])
+
+    @classmethod
+    def parse(cls, text: str) -> "IndicatorSpec":
+        """
+        Raises:
+            ValueError: 未知的指標或參數錯誤
+        """
+        name, *raw_params = [part.strip() for part in text.strip().lower().split(":")]
+        name = INDICATOR_ALIASES.get(name, name)
+        if name not in INDICATOR_DEFAULTS:
+            raise ValueError(f"Unknown indicator {name!r}. Choose from: {', '.join(INDICATOR_DEFAULTS)}")
+        defaults = INDICATOR_DEFAULTS[name]
+        if len(raw_params) > len(defaults):
+            raise ValueError(f"Too many parameters for {name}")
+        try:
+            params = tuple(float(p) for p in raw_params) + defaults[len(raw_params):]
+        except ValueError:
+            raise ValueError(f"Invalid parameters for {name}: {text}")
+        # 週期參數必須是正整數（bbands 的倍數除外）
+        periods = params[:1] if name == "bbands" else params
+        if any(p < 1 or p != int(p) for p in periods):
+            raise ValueError(f"Periods must be positive integers: {text}")
+        if name == "macd" and params[0] >= params[1]:
+            raise ValueError("MACD fast period must be shorter than slow period")
+        return cls(name, params)
+
+
+def _format_param(value: float) -> str:
+    return str(int(value)) if value == int(value) else str(value)
+
+
+def _ewm(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """
+    向量化的指數加權平均：y[i] = (1 - alpha) * y[i - 1] + alpha * x[i]，y[-1] = initial
+
+    分段以封閉形式計算，段長使 (1 - alpha) 的負次方不超過 e^30 以避免溢位
+    """
+    decay = 1.0 - alpha
+    result = np.empty_like(values, dtype=np.float64)
+    if values.size == 0:
+        return result
+    if decay <= 0:
+        result[:] = values
+        return result
+    block = max(1, min(512, int(30 / -math.log(decay))))
+    powers = decay ** np.arange(block + 1)
+    previous = initial
+    for start in range(0, values.size, block):
+        chunk = values[start:start + block]
+        n = chunk.size
+        scaled = np.cumsum(chunk / powers[:n])
+        result[start:start + n] = powers[1:n + 1] * previous + alpha * powers[:n] * scaled
+        previous = result[start + n - 1]
+    return result
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    result = np.full(values.size, np.nan)
+    if values.size >= period:
+        cumsum = np.cumsum(np.insert(values, 0, 0.0))
+        result[period - 1:] = (cumsum[period:] - cumsum[:-period]) / period
+    return result
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """以前 period 筆的 SMA 為起點的 EMA（alpha = 2 / (period + 1)）"""
+    result = np.full(values.size, np.nan)
+    if values.size >= period:
+        seed = values[:period].mean()
+        result[period - 1] = seed
+        result[period:] = _ewm(values[period:], 2.0 / (period + 1), seed)
+    return result
+
+
+def rolling_std(values: np.ndarray, period: int) -> np.ndarray:
+    result = np.full(values.size, np.nan)
+    if values.size >= period:
+        result[period - 1:] = sliding_window_view(values, period).std(axis=1)
+    return result
+
+
+def rsi(values: np.ndarray, period: int) -> np.ndarray:
+    """Wilder RSI"""
+    result = np.full(values.size, np.nan)
+    if values.size <= period:
+        return result
+    delta = np.diff(values)
+    gains = np.clip(delta, 0, None)
+    losses = np.clip(-delta, 0, None)
+    avg_gain = np.empty(delta.size - period + 1)
+    avg_loss = np.empty(delta.size - period + 1)
+    avg_gain[0] = gains[:period].mean()
+    avg_loss[0] = losses[:period].mean()
+    avg_gain[1:] = _ewm(gains[period:], 1.0 / period, avg_gain[0])
+    avg_loss[1:] = _ewm(losses[period:], 1.0 / period, avg_loss[0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        values_rsi = 100.0 - 100.0 / (1.0 + rs)
+    # 沒有下跌時 RSI 為 100
+    values_rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), values_rsi)
+    result[period:] = values_rsi
+    return result
+
+
+def vwap(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+         session: Optional[np.ndarray] = None) -> np.ndarray:
+    """成交量加權平均價，指定 session（例如日期）時每個 session 重新累計"""
+    typical = (high + low + close) / 3.0
+    weighted = np.cumsum(typical * volume)
+    cumulative_volume = np.cumsum(volume)
+    if session is not None and session.size:
+        # 找出每個 session 起點前的累計值並扣除
+        starts = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+        lengths = np.diff(np.r_[starts, session.size])
+        base_weighted = np.repeat(np.r_[0.0, weighted][starts], lengths)
+        base_volume = np.repeat(np.r_[0.0, cumulative_volume][starts], lengths)
+        weighted = weighted - base_weighted
+        cumulative_volume = cumulative_volume - base_volume
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(cumulative_volume > 0, weighted / cumulative_volume, np.nan)
+
+
+def compute_indicators(arrays: Dict[str, np.ndarray], specs: List[IndicatorSpec],
+                       session: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    一次計算多個指標
+
+    共用的中間結果（相同週期的 SMA、EMA、標準差）只計算一次
+
+    Returns:
+        指標 key -> 陣列，或包含多條線的 dict
+    """
+    close = arrays["c"]
+    memo: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def cached(kind: str, period: int, fn: Callable[[np.ndarray, int], np.ndarray]) -> np.ndarray:
+        if (kind, period) not in memo:
+            memo[(kind, period)] = fn(close, period)
+        return memo[(kind, period)]
+
+    results: Dict[str, Any] = {}
+    for spec in specs:
+        if spec.key in results:
+            continue
+        p = spec.params
+        if spec.name == "sma":
+            results[spec.key] = cached("sma", int(p[0]), sma)
+        elif spec.name == "ema":
+            results[spec.key] = cached("ema", int(p[0]), ema)
+        elif spec.name == "rsi":
+            results[spec.key] = cached("rsi", int(p[0]), rsi)
+        elif spec.name == "macd":
+            fast, slow, signal_period = int(p[0]), int(p[1]), int(p[2])
+            line = cached("ema", fast, ema) - cached("ema", slow, ema)
+            signal = np.full(close.size, np.nan)
+            valid = np.flatnonzero(~np.isnan(line))
+            if valid.size:
+                signal[valid[0]:] = ema(line[valid[0]:], signal_period)
+            results[spec.key] = {"macd": line, "signal": signal, "histogram": line - signal}
+        elif spec.name == "bbands":
+            period, width = int(p[0]), p[1]
+            middle = cached("sma", period, sma)
+            deviation = cached("std", period, rolling_std)
+            results[spec.key] = {
+                "middle": middle,
+                "upper": middle + width * deviation,
+                "lower": middle - width * deviation,
+            }
+        elif spec.name == "vwap":
+            results[spec.key] = vwap(arrays["h"], arrays["l"], close, arrays["v"], session)
+    return results
+
+
+def to_json_values(values: np.ndarray) -> List[Optional[float]]:
+    """NaN 轉為 None 以便輸出 JSON"""
+    return [None if v != v else v for v in values.tolist()]
+
+
+def serialize(result: Any) -> Any:
+    if isinstance(result, dict):
+        return {name: to_json_values(line) for name, line in result.items()}
+    return to_json_values(result)
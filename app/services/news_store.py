@@ -0,0 +1,267 @@
+import asyncio
+import bisect
+import re
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+from app.services.finnhub_client import AsyncFinnhubClient, finnhub_client
+
+logger = setup_logger(__name__, "news_store.log")
+
+# 台股代碼 -> 公司名稱別名（英文新聞常用名稱與中文簡稱）
+TW_STOCK_ALIASES: Dict[str, List[str]] = {
+    "2330.TW": ["TSMC", "Taiwan Semiconductor", "台積電"],
+    "2317.TW": ["Hon Hai", "Foxconn", "鴻海"],
+    "2412.TW": ["Chunghwa Telecom", "中華電"],
+    "2882.TW": ["Cathay Financial", "國泰金"],
+    "1303.TW": ["Nan Ya Plastics", "南亞"],
+    "2454.TW": ["MediaTek", "聯發科"],
+    "2308.TW": ["Delta Electronics", "台達電"],
+    "2303.TW": ["United Microelectronics", "UMC", "聯電"],
+    "2379.TW": ["Realtek", "瑞昱"],
+    "3034.TW": ["Novatek", "聯詠"],
+    "2881.TW": ["Fubon Financial", "富邦金"],
+    "2884.TW": ["E.Sun Financial", "玉山金"],
+    "2886.TW": ["Mega Financial", "兆豐金"],
+    "2891.TW": ["CTBC Financial", "中信金"],
+    "2885.TW": ["Yuanta Financial", "元大金"],
+    "1301.TW": ["Formosa Plastics", "台塑"],
+    "1326.TW": ["Formosa Chemicals", "台化"],
+    "1402.TW": ["Far Eastern New Century", "遠東新"],
+    "2105.TW": ["Cheng Shin Rubber", "Maxxis", "正新"],
+    "2207.TW": ["Hotai Motor", "和泰車"],
+    "2912.TW": ["President Chain Store", "統一超"],
+    "1216.TW": ["Uni-President", "統一"],
+    "1101.TW": ["Taiwan Cement", "台泥"],
+    "2002.TW": ["China Steel", "中鋼"],
+    "2301.TW": ["Lite-On", "光寶科"],
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.tw)?")
+# 帶 .TW 的 4 到 6 位數字一律視為台股代碼；沒有後綴的數字（年份、金額）只接受已知的代碼
+_TW_CODE_RE = re.compile(r"^\d{4,6}\.tw$")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_news_symbol(symbol: str) -> str:
+    """2330、2330.tw -> 2330.TW，其他代碼轉為大寫"""
+    symbol = symbol.strip().upper()
+    if symbol.isdigit():
+        return f"{symbol}.TW"
+    return symbol
+
+
+class AliasMatcher:
+    """
+    在新聞文字中找出提及的股票
+
+    英文別名以 token 序列比對（以第一個 token 查表），中文別名以子字串比對，
+    台股代碼從 token 判斷：帶 .TW 後綴，或是 aliases 中的代碼。每篇新聞只在寫入時比對一次。
+    """
+
+    def __init__(self, aliases: Dict[str, List[str]]):
+        self._codes = {symbol.split(".")[0] for symbol in aliases if symbol.endswith(".TW")}
+        self._phrases: Dict[str, List[Tuple[Tuple[str, ...], str]]] = defaultdict(list)
+        self._substrings: List[Tuple[str, str]] = []
+        for symbol, names in aliases.items():
+            for name in names:
+                if name.isascii():
+                    tokens = tuple(tokenize(name))
+                    if tokens:
+                        self._phrases[tokens[0]].append((tokens, symbol))
+                else:
+                    self._substrings.append((name, symbol))
+
+    def match(self, text: str, related: Iterable[str] = ()) -> Set[str]:
+        symbols = {normalize_news_symbol(item) for item in related if item.strip()}
+        tokens = tokenize(text)
+        for index, token in enumerate(tokens):
+            if token in self._codes or _TW_CODE_RE.match(token):
+                symbols.add(normalize_news_symbol(token.split(".")[0]))
+            for phrase, symbol in self._phrases.get(token, ()):
+                if tuple(tokens[index:index + len(phrase)]) == phrase:
+                    symbols.add(symbol)
+        for name, symbol in self._substrings:
+            if name in text:
+                symbols.add(symbol)
+        return symbols
+
+
+class NewsStore:
+    """
+    背景更新的新聞索引
+
+    以 min_id 增量輪詢 general_news，依 id 去除重複，並建立股票代碼 / 公司別名 -> 新聞的反向索引。
+    每個索引項目是依 (時間, id) 由新到舊排序的串列，分頁查詢只需切片。
+
+    Args:
+        client: Finnhub 客戶端（與其他請求共用限流配額）
+        category: general_news 的新聞類別
+        refresh_interval: 輪詢間隔（秒），每個 worker 各自輪詢，實際間隔乘以 workers 讓上游請求總數不變
+        retry_interval: 尚未載入成功時，查詢觸發的同步更新至少間隔多久（秒）
+        max_articles: 最多保留的新聞數量，超過時移除最舊的
+        workers: worker 程序數量
+    """
+
+    def __init__(
+        self,
+        client: AsyncFinnhubClient = finnhub_client,
+        category: str = "general",
+        refresh_interval: float = settings.NEWS_REFRESH_INTERVAL,
+        max_articles: int = settings.NEWS_MAX_ARTICLES,
+        aliases: Dict[str, List[str]] = TW_STOCK_ALIASES,
+        workers: int = settings.WEB_CONCURRENCY,
+        retry_interval: float = settings.NEWS_RETRY_INTERVAL,
+    ):
+        self.client = client
+        self.category = category
+        self.refresh_interval = refresh_interval * max(1, workers)
+        self.retry_interval = retry_interval
+        self.max_articles = max_articles
+        self.matcher = AliasMatcher(aliases)
+        self.last_id = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.last_attempt: Optional[float] = None  # time.monotonic()
+        self._articles: Dict[int, Dict[str, Any]] = {}
+        self._symbols: Dict[int, Set[str]] = {}
+        # 排序 key 為 (-datetime, -id)，串列由新到舊
+        self._timeline: List[Tuple[int, int]] = []
+        self._index: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    async def start(self) -> None:
+        if self.refresh_interval > 0:
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Failed to refresh news: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+    async def refresh(self, initial: bool = False) -> int:
+        """
+        取得 last_id 之後的新聞並寫入索引
+
+        Args:
+            initial: 只在尚未載入成功且距上次嘗試超過 retry_interval 時更新（ensure_loaded 使用）
+
+        Returns:
+            新增的新聞數量
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # 等待鎖的期間其他請求可能已載入或剛嘗試失敗
+            if initial and not self._initial_due():
+                return 0
+            self.last_attempt = time.monotonic()
+            try:
+                items = await self.client.general_news(self.category, min_id=self.last_id)
+            except Exception:
+                self.failures += 1
+                raise
+            added = self.add(items or [])
+            self.refreshes += 1
+        if added:
+            logger.info("Indexed %s new articles (total %s, last id %s)", added, len(self._articles), self.last_id)
+        return added
+
+    def _initial_due(self) -> bool:
+        return self.refreshes == 0 and (
+            self.last_attempt is None or time.monotonic() - self.last_attempt >= self.retry_interval
+        )
+
+    async def ensure_loaded(self) -> None:
+        """
+        尚未載入過時（例如背景輪詢未啟動）先同步更新一次
+
+        上游失敗時 retry_interval 秒內不再重試，直接使用目前（可能為空）的索引
+        """
+        if self._initial_due():
+            await self.refresh(initial=True)
+
+    def add(self, items: Iterable[Dict[str, Any]]) -> int:
+        added = 0
+        for item in items:
+            article_id = item.get("id")
+            if not isinstance(article_id, int) or article_id in self._articles:
+                continue
+            self.last_id = max(self.last_id, article_id)
+            sort_key = (-int(item.get("datetime") or 0), -article_id)
+            text = f"{item.get('headline', '')} {item.get('summary', '')}"
+            related = (item.get("related") or "").split(",")
+            symbols = self.matcher.match(text, related)
+
+            self._articles[article_id] = item
+            self._symbols[article_id] = symbols
+            bisect.insort(self._timeline, sort_key)
+            for symbol in symbols:
+                bisect.insort(self._index[symbol], sort_key)
+            added += 1
+        self._evict()
+        return added
+
+    def _evict(self) -> None:
+        while len(self._timeline) > self.max_articles:
+            sort_key = self._timeline.pop()
+            article_id = -sort_key[1]
+            self._articles.pop(article_id, None)
+            for symbol in self._symbols.pop(article_id, ()):
+                entries = self._index[symbol]
+                position = bisect.bisect_left(entries, sort_key)
+                if position < len(entries) and entries[position] == sort_key:
+                    del entries[position]
+                if not entries:
+                    del self._index[symbol]
+
+    def _page(self, entries: List[Tuple[int, int]], offset: int, limit: int) -> Tuple[int, List[Dict[str, Any]]]:
+        return len(entries), [self._articles[-key[1]] for key in entries[offset:offset + limit]]
+
+    def latest(self, offset: int = 0, limit: int = 20) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Returns:
+            (新聞總數, 該頁的新聞)，由新到舊
+        """
+        return self._page(self._timeline, offset, limit)
+
+    def search(self, symbol: str, offset: int = 0, limit: int = 20) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Returns:
+            (提及該股票的新聞總數, 該頁的新聞)，由新到舊
+        """
+        return self._page(self._index.get(normalize_news_symbol(symbol), []), offset, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "articles": len(self._articles),
+            "symbols": len(self._index),
+            "last_id": self.last_id,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+
+# 全域新聞索引，由 app 的 lifespan 啟動背景輪詢
+news_store = NewsStore()
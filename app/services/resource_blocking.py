@@ -0,0 +1,80 @@
+from typing import TYPE_CHECKING, Iterable, Optional, Set
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    # Playwright 載入較慢，只在型別檢查時匯入
+    from playwright.async_api import Page, Route
+
+# 常見的追蹤、廣告與分析服務網域
+TRACKER_DOMAINS = {
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googletagservices.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "analytics.twitter.com",
+    "ads-twitter.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "hotjar.com",
+    "segment.io",
+    "segment.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "newrelic.com",
+    "nr-data.net",
+    "criteo.com",
+    "taboola.com",
+    "outbrain.com",
+    "adnxs.com",
+    "amazon-adsystem.com",
+    "clarity.ms",
+    "bat.bing.com",
+}
+
+# Playwright 的資源類型
+RESOURCE_TYPES = {
+    "document", "stylesheet", "image", "media", "font", "script", "texttrack",
+    "xhr", "fetch", "eventsource", "websocket", "manifest", "other",
+}
+
+
+def _matches_domain(host: str, domains: Set[str]) -> bool:
+    # 比對網域本身及其所有上層網域（包含 localhost 這類單一標籤的主機）
+    parts = host.split(".")
+    return any(".".join(parts[i:]) in domains for i in range(len(parts)))
+
+
+async def install_resource_blocking(
+    page: "Page",
+    resource_types: Iterable[str],
+    block_trackers: bool = True,
+    extra_domains: Optional[Iterable[str]] = None,
+) -> None:
+    """
+    攔截頁面的子請求，中止指定類型的資源及追蹤器網域
+
+    主文件（document）不會被攔截
+    """
+    blocked_types = {t for t in resource_types if t != "document"}
+    blocked_domains = set(TRACKER_DOMAINS) if block_trackers else set()
+    blocked_domains.update(d.lower().lstrip(".") for d in (extra_domains or []))
+    if not blocked_types and not blocked_domains:
+        return
+
+    async def handle(route: "Route") -> None:
+        request = route.request
+        if request.resource_type in blocked_types:
+            await route.abort()
+            return
+        if blocked_domains:
+            host = (urlsplit(request.url).hostname or "").lower()
+            if host and _matches_domain(host, blocked_domains):
+                await route.abort()
+                return
+        await route.continue_()
+
+    await page.route("**/*", handle)
@@ -0,0 +1,152 @@
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.core.cache import CacheBackend, DiskStore, DistributedSingleFlight, create_backend
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+
+logger = setup_logger(__name__, "scrape_cache.log")
+
+# X-Cache 標頭的值
+CACHE_HIT = "HIT"
+CACHE_MISS = "MISS"
+CACHE_COALESCED = "COALESCED"
+CACHE_BYPASS = "BYPASS"
+CACHE_REFRESH = "REFRESH"
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    正規化 URL 作為快取鍵
+
+    scheme 與 host 轉小寫、移除預設 port 與 fragment、查詢參數依名稱排序
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def make_cache_key(url: str, options: Dict[str, Any]) -> str:
+    """以正規化 URL 與影響抓取結果的選項組成快取鍵"""
+    return f"{normalize_url(url)}|{json.dumps(options, sort_keys=True, default=str)}"
+
+
+class ScrapeCache:
+    """
+    /scrape 的結果快取
+
+    - 依 CACHE_BACKEND 使用記憶體 LRU（項目數量與總大小上限）或多個 worker 共用的後端，加上可選的磁碟層
+    - 相同請求同時進行時只渲染一次（single-flight，共用後端時跨 worker）
+    """
+
+    def __init__(
+        self,
+        ttl: int = settings.SCRAPE_CACHE_TTL,
+        max_entries: int = settings.SCRAPE_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.SCRAPE_CACHE_MAX_BYTES,
+        directory: Optional[str] = settings.SCRAPE_CACHE_DIR,
+        backend: Optional[CacheBackend] = None,
+    ):
+        self.ttl = ttl
+        self.backend = backend or create_backend(
+            "scrape",
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            sizeof=lambda value: len(value.get("content", "")) + len(value.get("title", "")),
+        )
+        self.disk = DiskStore(directory) if directory else None
+        self.flight = DistributedSingleFlight(self.backend, lock_ttl=settings.CACHE_SCRAPE_LOCK_TTL)
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    async def get(self, key: str) -> Optional[dict]:
+        try:
+            entry = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("Failed to read scrape cache backend: %s", e)
+            entry = None
+        value = entry[0] if entry is not None else None
+        if value is None and self.disk is not None:
+            try:
+                value = await self.disk.get(key)
+            except Exception as e:
+                logger.warning("Failed to read scrape cache from disk: %s", e)
+                value = None
+            if value is not None:
+                await self._set_backend(key, value)
+        return value
+
+    async def set(self, key: str, value: dict) -> None:
+        await self._set_backend(key, value)
+        if self.disk is not None:
+            try:
+                await self.disk.set(key, value, self.ttl)
+            except Exception as e:
+                logger.warning("Failed to write scrape cache to disk: %s", e)
+
+    async def _set_backend(self, key: str, value: dict) -> None:
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logger.warning("Failed to write scrape cache backend: %s", e)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    async def fetch(
+        self,
+        key: str,
+        render: Callable[[], Awaitable[dict]],
+        mode: str = "default",
+        cacheable: Callable[[dict], bool] = lambda value: True,
+    ) -> Tuple[dict, str]:
+        """
+        從快取取得結果，沒有時呼叫 render 並寫入快取
+
+        Args:
+            mode: default（使用快取）、bypass（不讀也不寫快取）、refresh（強制重新渲染並更新快取）
+            cacheable: 判斷結果是否可寫入快取
+
+        Returns:
+            (結果, X-Cache 狀態)
+        """
+        if mode == "bypass":
+            return await render(), CACHE_BYPASS
+
+        if mode != "refresh":
+            value = await self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value, CACHE_HIT
+        self.misses += 1
+
+        async def render_and_store() -> dict:
+            value = await render()
+            if cacheable(value):
+                await self.set(key, value)
+            return value
+
+        value, shared = await self.flight.do(key, render_and_store)
+        if shared:
+            return value, CACHE_COALESCED
+        return value, CACHE_REFRESH if mode == "refresh" else CACHE_MISS
+
+
+# 全域 /scrape 結果快取
+scrape_cache = ScrapeCache()
@@ -0,0 +1,373 @@
+import asyncio
+import itertools
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Set
+
+import httpx
+from fastapi import HTTPException
+from pydantic import BaseModel, Field, HttpUrl
+
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+from app.services.scraper import ScrapeResponse, URLRequest, cached_scrape
+
+logger = setup_logger(__name__, "scrape_jobs.log")
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+
+class ScrapeJobRequest(URLRequest):
+    priority: int = Field(5, ge=0, le=9, description="優先順序，數字越大越先執行")
+    callback_url: Optional[HttpUrl] = Field(None, description="完成時以 POST 通知的 webhook")
+
+class ScrapeJob(BaseModel):
+    id: str
+    status: JobStatus
+    priority: int
+    url: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[ScrapeResponse] = None
+    error: Optional[str] = None
+
+
+class JobStore:
+    """
+    以 SQLite 保存的工作紀錄，重啟後可恢復尚未完成的工作
+
+    sqlite3 為阻塞操作，JobQueue 會在執行緒中呼叫
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS scrape_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    request TEXT NOT NULL,
+                    callback_url TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL,
+                    owner TEXT
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status ON scrape_jobs (status)")
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(scrape_jobs)")}
+            # 舊版資料庫沒有心跳與取得者欄位
+            for column, column_type in (("heartbeat_at", "REAL"), ("owner", "TEXT")):
+                if column in columns:
+                    continue
+                try:
+                    self._conn.execute(f"ALTER TABLE scrape_jobs ADD COLUMN {column} {column_type}")
+                except sqlite3.OperationalError:
+                    pass  # 其他 worker 已同時加入
+
+    def insert(self, job_id: str, priority: int, request: dict, callback_url: Optional[str], created_at: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO scrape_jobs (id, status, priority, request, callback_url, created_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, priority, json.dumps(request), callback_url, created_at),
+            )
+
+    def claim(self, job_id: str) -> Optional[str]:
+        """
+        將排隊中的工作標記為執行中
+
+        多個 worker 程序共用同一個資料庫，只有一個能成功取得工作
+
+        Returns:
+            取得工作的 token，之後的心跳與完成都需帶上（已被其他 worker 取得或已完成時為 None）
+        """
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE scrape_jobs SET status = 'running', started_at = ?, heartbeat_at = ?, owner = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, now, token, job_id),
+            )
+        return token if cursor.rowcount == 1 else None
+
+    def heartbeat(self, job_id: str, token: str) -> bool:
+        """更新心跳，工作已被重新排隊並由其他 worker 取得時為 False"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE scrape_jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running' AND owner = ?",
+                (time.time(), job_id, token),
+            )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, token: str, status: str, result: Optional[dict], error: Optional[str]) -> bool:
+        """
+        寫入結果
+
+        Returns:
+            是否寫入（lease 逾時後工作已交給其他 worker 時為 False，結果以該 worker 為準）
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE scrape_jobs SET status = ?, result = ?, error = ?, finished_at = ?, owner = NULL "
+                "WHERE id = ? AND status = 'running' AND owner = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, token),
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM scrape_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """取得排隊中的工作"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, priority, created_at FROM scrape_jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def requeue_stale(self, expired_before: float) -> List[Dict[str, Any]]:
+        """
+        將心跳早於 expired_before 的 running 工作改回 queued
+
+        心跳停止代表執行的 worker 已中止；仍在執行的工作會持續更新心跳，不會被其他 worker 搶走
+        """
+        with self._lock, self._conn:
+            # 先取得寫入鎖，查詢與更新之間不會有其他程序更新心跳
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT id, priority, created_at FROM scrape_jobs "
+                "WHERE status = 'running' AND COALESCE(heartbeat_at, started_at, 0) < ? ORDER BY created_at",
+                (expired_before,),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE scrape_jobs SET status = 'queued', started_at = NULL, heartbeat_at = NULL, owner = NULL WHERE id = ?",
+                [(row["id"],) for row in rows],
+            )
+        return [dict(row) for row in rows]
+
+    def purge(self, older_than: float) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM scrape_jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?", (older_than,)
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _row_to_job(row: Dict[str, Any]) -> ScrapeJob:
+    request = json.loads(row["request"])
+    return ScrapeJob(
+        id=row["id"],
+        status=row["status"],
+        priority=row["priority"],
+        url=request["url"],
+        created_at=row["created_at"],
+        started_at=row["started_at"],
+        finished_at=row["finished_at"],
+        result=ScrapeResponse(**json.loads(row["result"])) if row["result"] else None,
+        error=row["error"],
+    )
+
+
+class JobQueue:
+    """
+    非同步抓取工作佇列
+
+    - 工作依 priority（大者優先）與建立順序排入記憶體中的優先佇列
+    - 固定數量的 worker 在同一事件迴圈中執行工作
+    - 工作狀態與結果寫入 SQLite，完成時可選擇以 webhook 通知
+    - 多個程序共用資料庫時，工作以條件式 UPDATE 取得，不會重複執行；
+      執行中的工作定期更新心跳，心跳逾時 lease 秒的工作才會被重新排隊
+    """
+
+    def __init__(
+        self,
+        db_path: str = settings.SCRAPE_JOB_DB,
+        workers: int = settings.SCRAPE_JOB_WORKERS,
+        max_queued: int = settings.SCRAPE_JOB_MAX_QUEUED,
+        lease: float = settings.SCRAPE_JOB_LEASE,
+    ):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.lease = lease
+        self._store: Optional[JobStore] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._recover_task: Optional[asyncio.Task] = None
+        self._callbacks: Set[asyncio.Task] = set()
+        self._callback_client: Optional[httpx.AsyncClient] = None
+        self._sequence = itertools.count()
+
+    async def start(self) -> None:
+        self._store = await asyncio.to_thread(JobStore, self.db_path)
+        self._queue = asyncio.PriorityQueue()
+        self._callback_client = httpx.AsyncClient(timeout=settings.SCRAPE_JOB_CALLBACK_TIMEOUT)
+
+        purged = await asyncio.to_thread(self._store.purge, time.time() - settings.SCRAPE_JOB_RETENTION)
+        stale = await asyncio.to_thread(self._store.requeue_stale, time.time() - self.lease)
+        pending = await asyncio.to_thread(self._store.pending)
+        for row in pending:
+            self._enqueue(row["id"], row["priority"])
+        logger.info(
+            "Scrape job queue started: %s jobs restored (%s interrupted), %s old jobs purged",
+            len(pending),
+            len(stale),
+            purged,
+        )
+
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._recover_task = asyncio.create_task(self._recover_loop())
+
+    async def stop(self) -> None:
+        tasks = self._tasks + list(self._callbacks) + ([self._recover_task] if self._recover_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._recover_task = None
+        if self._callback_client is not None:
+            await self._callback_client.aclose()
+            self._callback_client = None
+        if self._store is not None:
+            # 執行到一半的工作保持 running，心跳逾時後會重新排隊
+            await asyncio.to_thread(self._store.close)
+            self._store = None
+
+    def _enqueue(self, job_id: str, priority: int) -> None:
+        self._queue.put_nowait((-priority, next(self._sequence), job_id))
+
+    async def submit(self, request: ScrapeJobRequest) -> ScrapeJob:
+        if self._store is None:
+            raise HTTPException(status_code=503, detail="Scrape job queue is not running")
+        if self._queue.qsize() >= self.max_queued:
+            raise HTTPException(status_code=503, detail="Scrape job queue is full")
+
+        job_id = uuid.uuid4().hex
+        created_at = time.time()
+        payload = request.model_dump(mode="json", exclude={"priority", "callback_url"})
+        callback_url = str(request.callback_url) if request.callback_url else None
+        await asyncio.to_thread(self._store.insert, job_id, request.priority, payload, callback_url, created_at)
+        self._enqueue(job_id, request.priority)
+        return ScrapeJob(
+            id=job_id, status="queued", priority=request.priority, url=payload["url"], created_at=created_at
+        )
+
+    async def get(self, job_id: str) -> Optional[ScrapeJob]:
+        if self._store is None:
+            raise HTTPException(status_code=503, detail="Scrape job queue is not running")
+        row = await asyncio.to_thread(self._store.get, job_id)
+        return _row_to_job(row) if row else None
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize() if self._queue else 0, "workers": len(self._tasks)}
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Worker %s failed to run job %s: %s", index, job_id, e, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _recover_loop(self) -> None:
+        """定期將中止的 worker 留下的 running 工作重新排隊"""
+        while True:
+            await asyncio.sleep(self.lease)
+            try:
+                stale = await asyncio.to_thread(self._store.requeue_stale, time.time() - self.lease)
+            except Exception as e:
+                logger.error("Failed to recover interrupted jobs: %s", e, exc_info=True)
+                continue
+            for row in stale:
+                self._enqueue(row["id"], row["priority"])
+            if stale:
+                logger.warning("Requeued %s interrupted scrape jobs", len(stale))
+
+    async def _heartbeat(self, job_id: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                if not await asyncio.to_thread(self._store.heartbeat, job_id, token):
+                    logger.warning("Lost lease of job %s", job_id)
+                    return
+            except Exception as e:
+                logger.warning("Failed to update heartbeat of job %s: %s", job_id, e)
+
+    async def _run(self, job_id: str) -> None:
+        # 其他 worker 程序可能已取得同一個工作
+        token = await asyncio.to_thread(self._store.claim, job_id)
+        if token is None:
+            return
+        row = await asyncio.to_thread(self._store.get, job_id)
+
+        result, error = None, None
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, token))
+        try:
+            response, _ = await cached_scrape(URLRequest(**json.loads(row["request"])))
+            result = response.model_dump()
+        except HTTPException as e:
+            error = str(e.detail)
+        except Exception as e:
+            error = str(e)
+        finally:
+            heartbeat.cancel()
+        status = "failed" if error is not None else "succeeded"
+        if not await asyncio.to_thread(self._store.finish, job_id, token, status, result, error):
+            # lease 逾時後已由其他 worker 執行，由該 worker 寫入結果與通知
+            logger.warning("Discarding result of scrape job %s: lease expired", job_id)
+            return
+        logger.info("Scrape job %s %s", job_id, status)
+
+        if row["callback_url"]:
+            # 通知在背景執行，避免 webhook 重試佔用 worker
+            job = await self.get(job_id)
+            task = asyncio.create_task(self._notify(row["callback_url"], job))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _notify(self, callback_url: str, job: ScrapeJob) -> None:
+        """以 POST 將工作結果送到 webhook，失敗時重試"""
+        body = job.model_dump_json()
+        for attempt in range(settings.SCRAPE_JOB_CALLBACK_RETRIES + 1):
+            try:
+                response = await self._callback_client.post(
+                    callback_url, content=body, headers={"Content-Type": "application/json"}
+                )
+                if response.status_code < 500:
+                    return
+                logger.warning("Callback for job %s returned %s", job.id, response.status_code)
+            except Exception as e:
+                logger.warning("Callback for job %s failed: %s", job.id, e)
+            if attempt < settings.SCRAPE_JOB_CALLBACK_RETRIES:
+                await asyncio.sleep(2 ** attempt)
+        logger.error("Giving up on callback for job %s", job.id)
+
+
+# 全域工作佇列，由 app 的 lifespan 管理
+scrape_jobs = JobQueue()
@@ -0,0 +1,353 @@
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Literal, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field, HttpUrl, field_validator, model_validator
+
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+from app.core.metrics import registry
+from app.services import extraction
+from app.services.browser_pool import BROWSER_PHASE_DURATION, browser_pool, BrowserPoolTimeout
+from app.services.http_fetcher import HttpFetchRejected, escalation_reason, http_fetcher
+from app.services.resource_blocking import RESOURCE_TYPES, install_resource_blocking
+from app.services.scrape_cache import make_cache_key, scrape_cache
+
+if TYPE_CHECKING:
+    # Playwright 載入較慢，只在型別檢查時匯入（實際使用時由瀏覽器池載入）
+    from playwright.async_api import Page
+
+logger = setup_logger(__name__, "scraper.log")
+
+HTTP_FETCH_DURATION = registry.histogram(
+    "scrape_http_fetch_duration_seconds", "Latency of the plain HTTP tier of /scrape"
+)
+
+class URLRequest(BaseModel):
+    url: HttpUrl
+    wait_time: Optional[int] = 5  # 等待時間（秒）；設定就緒條件時為最長等待時間
+    cache: Literal["default", "bypass", "refresh"] = "default"  # 快取模式
+    # 抓取方式：auto 先用 HTTP，必要時才改用瀏覽器
+    mode: Literal["auto", "http", "browser"] = Field(default_factory=lambda: settings.SCRAPE_DEFAULT_MODE)
+    # 輸出格式：html（原始 HTML）、text（正文文字）、fragments（選擇器片段）、links（連結與 metadata）
+    output: Literal["html", "text", "fragments", "links"] = "html"
+    selectors: List[str] = Field(default_factory=list, description="output=fragments 時使用的 CSS 或 XPath 選擇器")
+    fragment_format: Literal["html", "text"] = "html"
+    # 就緒條件：任一設定時改為條件滿足即提前結束，全部未設定時固定等待 wait_time
+    wait_selector: Optional[str] = Field(None, description="等待此 CSS 選擇器出現")
+    wait_function: Optional[str] = Field(None, description="等待此 JS 表達式回傳 truthy")
+    wait_network_idle: bool = Field(False, description="等待網路閒置")
+    # 資源攔截
+    block_resources: Optional[List[str]] = Field(None, description="要攔截的資源類型，未指定時使用預設值")
+    block_trackers: bool = Field(True, description="攔截常見追蹤器與廣告網域")
+    block_domains: List[str] = Field(default_factory=list, description="額外要攔截的網域")
+
+    @field_validator("block_resources")
+    @classmethod
+    def validate_block_resources(cls, value: Optional[List[str]]) -> Optional[List[str]]:
+        if value is not None:
+            unknown = set(value) - RESOURCE_TYPES
+            if unknown:
+                raise ValueError(f"Unknown resource types: {', '.join(sorted(unknown))}")
+        return value
+
+    @model_validator(mode="after")
+    def validate_selectors(self) -> "URLRequest":
+        if self.output == "fragments" and not self.selectors:
+            raise ValueError("selectors is required when output is 'fragments'")
+        return self
+
+class ScrapeResponse(BaseModel):
+    title: str
+    content: str
+    status: int
+    tier: Literal["http", "browser"] = "browser"  # 實際使用的抓取方式
+    escalation: Optional[str] = None  # auto 模式改用瀏覽器的原因
+    output: str = "html"
+    fragments: Optional[Dict[str, List[str]]] = None
+    links: Optional[List[Dict[str, str]]] = None
+    metadata: Optional[Dict[str, str]] = None
+
+class BatchScrapeRequest(BaseModel):
+    items: List[URLRequest] = Field(..., min_length=1, max_length=settings.SCRAPE_BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = Field(None, ge=1, description="同時抓取的頁面數量")
+    per_domain_concurrency: int = Field(2, ge=1, description="同一網域同時抓取的頁面數量")
+    per_domain_delay: float = Field(0.0, ge=0, description="同一網域兩次請求之間的最短間隔（秒）")
+
+class BatchScrapeResult(BaseModel):
+    index: int
+    url: str
+    result: Optional[ScrapeResponse] = None
+    error: Optional[str] = None
+    cache: Optional[str] = None
+
+# 額外的請求 headers
+EXTRA_HTTP_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Cache-Control': 'max-age=0',
+}
+
+
+async def wait_until_ready(page: "Page", request: URLRequest) -> None:
+    """
+    等待頁面就緒
+
+    設定了就緒條件時等待所有條件滿足，最多等待 wait_time 秒，逾時則使用當前內容；
+    未設定任何條件時固定等待 wait_time 秒
+    """
+    wait_time = request.wait_time or 0
+    # Playwright 的 timeout=0 代表不限時，因此至少給 1 毫秒
+    timeout_ms = max(wait_time * 1000, 1)
+    waits = []
+    if request.wait_selector:
+        waits.append(page.wait_for_selector(request.wait_selector, timeout=timeout_ms))
+    if request.wait_function:
+        waits.append(page.wait_for_function(request.wait_function, timeout=timeout_ms))
+    if request.wait_network_idle:
+        waits.append(page.wait_for_load_state("networkidle", timeout=timeout_ms))
+
+    if not waits:
+        await asyncio.sleep(wait_time)
+        return
+
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    results = await asyncio.gather(*waits, return_exceptions=True)
+    for result in results:
+        if isinstance(result, PlaywrightTimeoutError):
+            logger.info("Readiness wait timed out after %ss for %s", wait_time, request.url)
+        elif isinstance(result, Exception):
+            raise result
+
+
+async def scrape(request: URLRequest) -> ScrapeResponse:
+    """
+    依 mode 抓取單一頁面
+
+    - http: 只使用 HTTP 客戶端
+    - browser: 只使用瀏覽器
+    - auto: 先用 HTTP，遇到 JS 外殼、機器人驗證、空白內容或需要就緒條件時改用瀏覽器
+    - 非 HTML 的回應回傳 415，超過 SCRAPE_HTTP_MAX_BYTES 回傳 413（不改用瀏覽器）
+    """
+    if request.mode == "browser":
+        return await scrape_with_browser(request)
+
+    if request.mode == "auto" and (request.wait_selector or request.wait_function):
+        # 就緒條件需要執行 JS，只能用瀏覽器
+        result = await scrape_with_browser(request)
+        result.escalation = "readiness_condition"
+        return result
+
+    try:
+        with HTTP_FETCH_DURATION.time(server_timing="http-fetch"):
+            fetched = await http_fetcher.fetch(str(request.url))
+    except HttpFetchRejected as e:
+        # 非 HTML 或過大的回應改用瀏覽器也不適合
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        if request.mode == "http":
+            raise HTTPException(status_code=502, detail=f"HTTP fetch failed: {str(e)}")
+        reason = "http_error"
+        logger.info("HTTP fetch failed for %s, escalating to browser: %s", request.url, e)
+    else:
+        reason = escalation_reason(fetched) if request.mode == "auto" else None
+        if reason is None:
+            return ScrapeResponse(
+                title=fetched.title,
+                content=fetched.content,
+                status=fetched.status,
+                tier="http",
+            )
+        logger.info("Escalating %s to browser: %s", request.url, reason)
+
+    result = await scrape_with_browser(request)
+    result.escalation = reason
+    return result
+
+
+async def scrape_with_browser(request: URLRequest) -> ScrapeResponse:
+    """
+    使用瀏覽器池抓取單一頁面
+
+    Raises:
+        HTTPException: 瀏覽器池已滿（503）或抓取失敗（500）
+    """
+    try:
+        # 從瀏覽器池取得頁面，池滿時會排隊等待
+        async with browser_pool.page() as page:
+            # 設置額外的 headers
+            await page.set_extra_http_headers(EXTRA_HTTP_HEADERS)
+
+            # 設置超時時間
+            page.set_default_timeout(60000)  # 60 seconds
+
+            # 攔截不需要的資源以節省頻寬
+            await install_resource_blocking(
+                page,
+                settings.SCRAPE_BLOCKED_RESOURCES if request.block_resources is None else request.block_resources,
+                block_trackers=request.block_trackers,
+                extra_domains=request.block_domains,
+            )
+
+            try:
+                # 訪問頁面
+                with BROWSER_PHASE_DURATION.time("navigate", server_timing="navigate"):
+                    response = await page.goto(
+                        str(request.url),
+                        wait_until='domcontentloaded',  # 改用 domcontentloaded 而不是 networkidle
+                        timeout=60000  # 60 seconds
+                    )
+
+                if not response:
+                    raise HTTPException(status_code=400, detail="Failed to load page")
+
+                # 等待頁面就緒
+                with BROWSER_PHASE_DURATION.time("ready", server_timing="ready"):
+                    await wait_until_ready(page, request)
+
+                # 獲取頁面內容
+                with BROWSER_PHASE_DURATION.time("content", server_timing="content"):
+                    title = await page.title()
+                    content = await page.content()
+
+                return ScrapeResponse(
+                    title=title,
+                    content=content,
+                    status=response.status
+                )
+
+            except Exception as e:
+                # 如果頁面加載失敗，嘗試獲取當前內容
+                try:
+                    title = await page.title()
+                    content = await page.content()
+                    return ScrapeResponse(
+                        title=title,
+                        content=content,
+                        status=500
+                    )
+                except:
+                    raise HTTPException(status_code=500, detail=str(e))
+
+    except BrowserPoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def apply_output(result: ScrapeResponse, request: URLRequest) -> ScrapeResponse:
+    """
+    依 request.output 將原始 HTML 轉換為較小的輸出
+
+    解析 HTML 較耗 CPU，呼叫端應在執行緒中執行
+    """
+    if request.output == "html":
+        return result
+    base_url = str(request.url)
+    update: Dict = {"output": request.output, "content": ""}
+    if request.output == "text":
+        update["content"] = extraction.extract_main_text(result.content)
+    elif request.output == "fragments":
+        try:
+            update["fragments"] = extraction.extract_fragments(
+                result.content, request.selectors, as_text=request.fragment_format == "text"
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif request.output == "links":
+        update["links"] = extraction.extract_links(result.content, base_url)
+        update["metadata"] = extraction.extract_metadata(result.content, base_url)
+    return result.model_copy(update=update)
+
+
+# 不影響渲染結果、不應納入快取鍵的欄位（輸出格式在讀取快取後才套用）
+_CACHE_KEY_EXCLUDE = {"url", "cache", "output", "selectors", "fragment_format"}
+
+async def cached_scrape(request: URLRequest) -> Tuple[ScrapeResponse, str]:
+    """
+    經過結果快取的 scrape，相同請求同時進行時只渲染一次
+
+    Returns:
+        (抓取結果, X-Cache 狀態)
+    """
+    key = make_cache_key(str(request.url), request.model_dump(exclude=_CACHE_KEY_EXCLUDE))
+    mode = request.cache if settings.SCRAPE_CACHE_ENABLED else "bypass"
+
+    async def render() -> dict:
+        return (await scrape(request)).model_dump()
+
+    value, status = await scrape_cache.fetch(
+        key, render, mode=mode,
+        # 只快取成功載入的頁面
+        cacheable=lambda value: value["status"] < 400,
+    )
+    result = ScrapeResponse(**value)
+    if request.output != "html":
+        result = await asyncio.to_thread(apply_output, result, request)
+    return result, status
+
+
+class DomainThrottle:
+    """同一網域的禮貌限制：同時請求數量上限，以及兩次請求開始之間的最短間隔"""
+
+    def __init__(self, max_concurrent: int, min_interval: float = 0.0):
+        self.min_interval = min_interval
+        self._semaphores: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(max_concurrent))
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._last_start: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, domain: str) -> AsyncIterator[None]:
+        async with self._semaphores[domain]:
+            if self.min_interval > 0:
+                loop = asyncio.get_running_loop()
+                async with self._locks[domain]:
+                    wait = self._last_start.get(domain, 0.0) + self.min_interval - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    self._last_start[domain] = loop.time()
+            yield
+
+
+async def scrape_batch(batch: BatchScrapeRequest) -> AsyncIterator[str]:
+    """
+    以有限的併發抓取多個頁面，每完成一個就輸出一行 NDJSON
+
+    結果依完成順序輸出，可用 index 對應回請求中的位置
+    """
+    concurrency = min(batch.concurrency or settings.SCRAPE_BATCH_DEFAULT_CONCURRENCY,
+                      settings.SCRAPE_BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    throttle = DomainThrottle(batch.per_domain_concurrency, batch.per_domain_delay)
+
+    async def run(index: int, item: URLRequest) -> BatchScrapeResult:
+        # 先等網域的名額，避免等待中的請求佔用全域併發名額
+        async with throttle.slot(item.url.host or ""):
+            async with semaphore:
+                try:
+                    result, cache_status = await cached_scrape(item)
+                    return BatchScrapeResult(index=index, url=str(item.url), result=result, cache=cache_status)
+                except HTTPException as e:
+                    return BatchScrapeResult(index=index, url=str(item.url), error=str(e.detail))
+                except Exception as e:
+                    return BatchScrapeResult(index=index, url=str(item.url), error=str(e))
+
+    tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(batch.items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            yield result.model_dump_json() + "\n"
+    finally:
+        # 客戶端中斷時取消尚未完成的抓取
+        for task in tasks:
+            task.cancel()
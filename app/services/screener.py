@@ -0,0 +1,193 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+from app.services.candle_store import candle_store
+from app.services.finance_cache import finance_cache
+
+logger = setup_logger(__name__, "screener.log")
+
+NUMERIC_FIELDS = ("price", "change_percent", "volume", "market_cap")
+SORT_FIELDS = NUMERIC_FIELDS + ("symbol",)
+# 每個股票每輪更新的上游請求數（報價、日 K 線與公司資料）
+# 公司資料平時由 finance_cache 快取，但冷啟動與過期時也會打到上游，仍需計入配額
+CALLS_PER_SYMBOL = 3
+DAY_SECONDS = 86400
+
+
+class Screener:
+    """
+    股票池的欄位式記憶體快照
+
+    背景 task 依序更新每個股票（價格、漲跌幅、成交量、市值、產業），依 SCREENER_RATE_BUDGET 控制節奏，
+    只使用部分上游配額；每個 worker 各自維護快照，配額由 workers 個 worker 平分。查詢時直接對 NumPy 欄位做篩選與排序，不會呼叫上游。
+    更新時只覆寫單一列，查詢之間不會讀到更新一半的資料（同一個 event loop）。
+    """
+
+    def __init__(self, rate_budget: float = settings.SCREENER_RATE_BUDGET,
+                 min_cycle_seconds: float = settings.SCREENER_MIN_CYCLE_SECONDS,
+                 workers: int = settings.WEB_CONCURRENCY):
+        self.rate_budget = rate_budget
+        self.workers = max(1, workers)
+        self.min_cycle_seconds = min_cycle_seconds
+        self.cycles = 0
+        self.errors = 0
+        self._index: Dict[str, int] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.set_universe([])
+
+    def set_universe(self, symbols: Sequence[str]) -> None:
+        symbols = list(dict.fromkeys(symbols))
+        size = len(symbols)
+        self._index = {symbol: i for i, symbol in enumerate(symbols)}
+        self._columns = {
+            "symbol": np.asarray(symbols, dtype=object),
+            "market": np.asarray(["TW" if s.endswith(".TW") else "US" for s in symbols], dtype=object),
+            "sector": np.full(size, "", dtype=object),
+            "sector_key": np.full(size, "", dtype=object),  # 小寫的產業名稱，用於篩選
+            "updated_at": np.zeros(size, dtype=np.float64),
+            **{field: np.full(size, np.nan) for field in NUMERIC_FIELDS},
+        }
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    async def start(self, symbols: Sequence[str]) -> None:
+        self.set_universe(symbols)
+        if settings.SCREENER_ENABLED and symbols:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _symbol_interval(self) -> float:
+        # 每個股票之間的間隔，讓所有 worker 的背景更新合計只使用 rate_budget 比例的配額
+        per_minute = settings.FINNHUB_RATE_LIMIT_PER_MINUTE * self.rate_budget / self.workers
+        paced = CALLS_PER_SYMBOL * 60 / per_minute if per_minute > 0 else 0.0
+        return max(paced, self.min_cycle_seconds / max(1, len(self)))
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await self.refresh_all(self._symbol_interval())
+            logger.info("Screener refreshed %s symbols in %.1fs", len(self), time.monotonic() - started)
+
+    async def refresh_all(self, interval: float = 0.0) -> None:
+        for symbol in list(self._index):
+            await self.refresh(symbol)
+            if interval > 0:
+                await asyncio.sleep(interval)
+        self.cycles += 1
+
+    async def refresh(self, symbol: str) -> None:
+        """更新單一股票，個別欄位失敗時保留舊值"""
+        row = self._index.get(symbol)
+        if row is None:
+            return
+        # 區間對齊到 UTC 日界，同一天內的 K 線快取 key 不變（只用到最後一天的成交量）
+        today = int(time.time()) // DAY_SECONDS * DAY_SECONDS
+        start = today - 7 * DAY_SECONDS
+        end = today + DAY_SECONDS - 1
+        quote, profile, candles = await asyncio.gather(
+            finance_cache.quote(symbol),
+            finance_cache.company_profile2(symbol=symbol),
+            candle_store.get_candles(symbol, "D", start, end),
+            return_exceptions=True,
+        )
+        columns = self._columns
+        if isinstance(quote, dict) and quote.get("c"):
+            columns["price"][row] = quote["c"]
+            columns["change_percent"][row] = quote.get("dp") if quote.get("dp") is not None else np.nan
+        if isinstance(profile, dict) and profile:
+            columns["market_cap"][row] = profile.get("marketCapitalization") or np.nan
+            columns["sector"][row] = profile.get("finnhubIndustry") or ""
+            columns["sector_key"][row] = columns["sector"][row].lower()
+        if isinstance(candles, dict) and candles.get("v"):
+            columns["volume"][row] = candles["v"][-1]
+        failed = [r for r in (quote, profile, candles) if isinstance(r, BaseException)]
+        if failed:
+            self.errors += 1
+            logger.warning("Screener refresh of %s partially failed: %s", symbol, failed[0])
+        columns["updated_at"][row] = time.time()
+
+    def query(
+        self,
+        market: Optional[str] = None,
+        sectors: Optional[List[str]] = None,
+        ranges: Optional[Dict[str, tuple]] = None,
+        sort: str = "change_percent",
+        descending: bool = True,
+        limit: int = 20,
+    ) -> Dict[str, Any]:
+        """
+        篩選並排序快照
+
+        Args:
+            market: US 或 TW
+            sectors: 產業（不分大小寫）
+            ranges: 欄位 -> (最小值, 最大值)，None 表示不限制
+            sort: 排序欄位，缺值的股票排在最後
+            limit: 回傳前幾名
+
+        Returns:
+            {"total_matched": int, "results": [...]}
+        """
+        columns = self._columns
+        mask = np.ones(len(self), dtype=bool)
+        if market:
+            mask &= columns["market"] == market.upper()
+        if sectors:
+            mask &= np.isin(columns["sector_key"], [sector.strip().lower() for sector in sectors])
+        for field, (low, high) in (ranges or {}).items():
+            values = columns[field]
+            with np.errstate(invalid="ignore"):
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+
+        rows = np.flatnonzero(mask)
+        if sort == "symbol":
+            order = np.argsort(columns["symbol"][rows].astype(str), kind="stable")
+            if descending:
+                order = order[::-1]
+        else:
+            values = columns[sort][rows]
+            keys = -values if descending else values
+            # lexsort 以最後一個 key 為主：先排缺值，再依數值
+            order = np.lexsort((keys, np.isnan(values)))
+        selected = rows[order[:limit]]
+
+        results = []
+        for i in selected.tolist():
+            item = {"symbol": columns["symbol"][i], "market": columns["market"][i], "sector": columns["sector"][i] or None}
+            for field in NUMERIC_FIELDS:
+                value = float(columns[field][i])
+                item[field] = None if value != value else value
+            item["updated_at"] = datetime.fromtimestamp(columns["updated_at"][i]).isoformat() if columns["updated_at"][i] else None
+            results.append(item)
+        return {"total_matched": int(rows.size), "results": results}
+
+    def stats(self) -> Dict[str, Any]:
+        updated = self._columns["updated_at"]
+        filled = updated[updated > 0]
+        return {
+            "symbols": len(self),
+            "filled": int(filled.size),
+            "cycles": self.cycles,
+            "errors": self.errors,
+            "oldest_age_seconds": round(time.time() - float(filled.min()), 1) if filled.size else None,
+        }
+
+
+# 全域選股快照，由 app 的 lifespan 以熱門股票池啟動
+screener = Screener()
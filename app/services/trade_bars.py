@@ -0,0 +1,244 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+from app.services.ws_hub import WebSocketHub, ws_hub
+
+logger = setup_logger(__name__, "trade_bars.log")
+
+# 聚合週期 -> 秒數
+BAR_INTERVALS = {"1s": 1, "1m": 60, "5m": 300}
+# /stock/{symbol}/history 的分鐘線週期對應的聚合週期
+RESOLUTION_INTERVALS = {"1": "1m", "5": "5m"}
+
+
+class BarRing:
+    """
+    固定大小的 OHLCV 環狀緩衝
+
+    t 為 K 線起始時間（秒），寫滿後覆蓋最舊的 K 線，記憶體用量固定。
+    比最新 K 線更早的成交（延遲送達）只更新仍在緩衝中的 K 線的高低價與成交量。
+    """
+
+    def __init__(self, interval: int, capacity: int):
+        self.interval = interval
+        self.capacity = max(1, capacity)
+        self.t = np.zeros(self.capacity, dtype=np.int64)
+        self.o = np.zeros(self.capacity, dtype=np.float64)
+        self.h = np.zeros(self.capacity, dtype=np.float64)
+        self.l = np.zeros(self.capacity, dtype=np.float64)
+        self.c = np.zeros(self.capacity, dtype=np.float64)
+        self.v = np.zeros(self.capacity, dtype=np.float64)
+        self.count = 0
+        self.late_dropped = 0
+        self._head = 0  # 下一根 K 線寫入的位置
+
+    def _ordered_indices(self) -> np.ndarray:
+        return (self._head - self.count + np.arange(self.count)) % self.capacity
+
+    def add_trades(self, times: np.ndarray, prices: np.ndarray, volumes: np.ndarray) -> None:
+        """
+        寫入一批成交（times 為秒，需已依時間排序）
+
+        同一根 K 線的成交先以向量運算合併，再逐根併入緩衝
+        """
+        if times.size == 0:
+            return
+        starts = times - times % self.interval
+        unique_starts, first = np.unique(starts, return_index=True)
+        last = np.r_[first[1:], starts.size] - 1
+        opens = prices[first]
+        highs = np.maximum.reduceat(prices, first)
+        lows = np.minimum.reduceat(prices, first)
+        closes = prices[last]
+        sums = np.add.reduceat(volumes, first)
+        for bar in zip(unique_starts.tolist(), opens.tolist(), highs.tolist(), lows.tolist(), closes.tolist(), sums.tolist()):
+            self._merge(*bar)
+
+    def _merge(self, start: int, o: float, h: float, l: float, c: float, v: float) -> None:
+        if self.count:
+            latest = (self._head - 1) % self.capacity
+            latest_start = self.t[latest]
+            if start == latest_start:
+                self.h[latest] = max(self.h[latest], h)
+                self.l[latest] = min(self.l[latest], l)
+                self.c[latest] = c
+                self.v[latest] += v
+                return
+            if start < latest_start:
+                indices = self._ordered_indices()
+                position = np.searchsorted(self.t[indices], start)
+                if position < indices.size and self.t[indices[position]] == start:
+                    index = indices[position]
+                    self.h[index] = max(self.h[index], h)
+                    self.l[index] = min(self.l[index], l)
+                    self.v[index] += v
+                else:
+                    self.late_dropped += 1
+                return
+        index = self._head
+        self.t[index], self.o[index], self.h[index], self.l[index], self.c[index], self.v[index] = start, o, h, l, c, v
+        self._head = (self._head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def window(self, start: Optional[int] = None, end: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        依時間排序取出 [start, end] 區間（起始時間）的 K 線，limit 為最多取最新的幾根
+
+        Returns:
+            與 candle_format.to_arrays 相同格式的陣列
+        """
+        indices = self._ordered_indices()
+        times = self.t[indices]
+        low = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        high = indices.size if end is None else int(np.searchsorted(times, end, side="right"))
+        if limit is not None:
+            low = max(low, high - limit)
+        selected = indices[low:high]
+        return {
+            "t": self.t[selected],
+            "o": self.o[selected],
+            "h": self.h[selected],
+            "l": self.l[selected],
+            "c": self.c[selected],
+            "v": self.v[selected],
+        }
+
+
+class _TrackingSubscriber:
+    """聚合器在 hub 的訂閱身分，只用來讓 hub 維持上游訂閱，不接收訊息"""
+
+    def __init__(self):
+        self.subscriptions: Set[Tuple[str, str]] = set()
+
+    def put(self, message: str, coalesce_key: Any = None) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class TradeAggregator:
+    """
+    將上游的即時成交聚合成 1s / 1m / 5m K 線
+
+    透過 hub 的 listener 收到所有經過共用連線的成交（包含客戶端訂閱的股票），
+    另外可主動追蹤股票讓 hub 保持上游訂閱。股票數量有上限，超過時移除最久沒有成交的。
+
+    Args:
+        hub: 共用的上游 WebSocket hub
+        max_symbols: 最多保留的股票數量
+        capacities: 各聚合週期的緩衝大小
+    """
+
+    def __init__(
+        self,
+        hub: WebSocketHub = ws_hub,
+        max_symbols: int = settings.TRADE_BARS_MAX_SYMBOLS,
+        capacities: Optional[Dict[str, int]] = None,
+    ):
+        self.hub = hub
+        self.max_symbols = max_symbols
+        self.capacities = capacities or {
+            "1s": settings.TRADE_BARS_CAPACITY_1S,
+            "1m": settings.TRADE_BARS_CAPACITY_1M,
+            "5m": settings.TRADE_BARS_CAPACITY_5M,
+        }
+        self.trades = 0
+        self._rings: "OrderedDict[str, Dict[str, BarRing]]" = OrderedDict()
+        self._tracker = _TrackingSubscriber()
+        self._listening = False
+
+    @property
+    def tracked(self) -> Set[str]:
+        return {symbol for _, symbol in self._tracker.subscriptions}
+
+    async def start(self, symbols: Iterable[str] = settings.TRADE_BARS_SYMBOLS) -> None:
+        if not self._listening:
+            self.hub.add_listener("trade", self.on_trades)
+            self._listening = True
+        for symbol in symbols:
+            await self.track(symbol)
+
+    async def stop(self) -> None:
+        for symbol in list(self.tracked):
+            await self.hub.unsubscribe(self._tracker, "trade", symbol)
+
+    async def track(self, symbol: str) -> bool:
+        """
+        讓 hub 持續訂閱該股票的成交
+
+        Returns:
+            False 表示追蹤的股票已達上限
+        """
+        if symbol in self.tracked:
+            return True
+        if len(self.tracked) >= self.max_symbols:
+            return False
+        await self.hub.subscribe(self._tracker, "trade", symbol)
+        return True
+
+    async def untrack(self, symbol: str) -> bool:
+        """
+        停止訂閱該股票的成交
+
+        Returns:
+            False 表示該股票沒有被追蹤
+        """
+        if symbol not in self.tracked:
+            return False
+        await self.hub.unsubscribe(self._tracker, "trade", symbol)
+        return True
+
+    def on_trades(self, data: List[Dict[str, Any]]) -> None:
+        """hub listener：寫入一則上游成交訊息"""
+        by_symbol: Dict[str, List[Dict[str, Any]]] = {}
+        for trade in data:
+            if "s" in trade and "p" in trade and "t" in trade:
+                by_symbol.setdefault(trade["s"], []).append(trade)
+        for symbol, trades in by_symbol.items():
+            times = np.fromiter((trade["t"] for trade in trades), dtype=np.int64, count=len(trades)) // 1000
+            prices = np.fromiter((trade["p"] for trade in trades), dtype=np.float64, count=len(trades))
+            volumes = np.fromiter((trade.get("v") or 0 for trade in trades), dtype=np.float64, count=len(trades))
+            order = np.argsort(times, kind="stable")
+            times, prices, volumes = times[order], prices[order], volumes[order]
+            for ring in self._get_rings(symbol).values():
+                ring.add_trades(times, prices, volumes)
+            self.trades += len(trades)
+
+    def _get_rings(self, symbol: str) -> Dict[str, BarRing]:
+        rings = self._rings.get(symbol)
+        if rings is None:
+            rings = {name: BarRing(BAR_INTERVALS[name], self.capacities[name]) for name in BAR_INTERVALS}
+            self._rings[symbol] = rings
+            while len(self._rings) > self.max_symbols:
+                evicted, _ = self._rings.popitem(last=False)
+                logger.info("Evicted trade bars of %s", evicted)
+        else:
+            self._rings.move_to_end(symbol)
+        return rings
+
+    def bars(self, symbol: str, interval: str, start: Optional[int] = None, end: Optional[int] = None,
+             limit: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Returns:
+            K 線陣列，沒有該股票的成交時回傳 None
+        """
+        rings = self._rings.get(symbol)
+        if rings is None:
+            return None
+        return rings[interval].window(start, end, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self._rings),
+            "tracked": sorted(self.tracked),
+            "trades": self.trades,
+        }
+
+
+# 全域成交聚合器，由 app 的 lifespan 啟動
+trade_bars = TradeAggregator()
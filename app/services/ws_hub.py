@@ -0,0 +1,269 @@
+import asyncio
+import itertools
+import json
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+import websockets
+
+from app.core.config import settings
+from app.core.logging_config import setup_logger
+
+logger = setup_logger(__name__, "ws_hub.log")
+
+# 客戶端與上游共用的訂閱頻道：Finnhub 訊息類型 -> 訂閱 / 取消訂閱指令
+CHANNELS = {
+    "trade": ("subscribe", "unsubscribe"),
+    "news": ("subscribe-news", "unsubscribe-news"),
+}
+CLIENT_POLICIES = ("coalesce", "drop_oldest", "drop_newest")
+
+
+class ClientSubscriber:
+    """
+    單一客戶端的有界傳送佇列
+
+    由獨立的 task 依序送出，慢的客戶端不會拖慢其他客戶端或上游的讀取。佇列已滿時依 policy 處理：
+    - coalesce: 同一股票尚未送出的成交訊息直接以最新的取代，仍超過上限時丟棄最舊的
+    - drop_oldest: 丟棄最舊的訊息
+    - drop_newest: 丟棄新進的訊息
+
+    Args:
+        send: 送出文字訊息的 coroutine function（例如 WebSocket.send_text）
+        max_queue: 待送訊息的上限
+        policy: 佇列已滿時的處理方式
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        max_queue: int = settings.WS_CLIENT_QUEUE_SIZE,
+        policy: str = settings.WS_CLIENT_POLICY,
+    ):
+        if policy not in CLIENT_POLICIES:
+            raise ValueError(f"Invalid policy {policy!r}. Choose from: {', '.join(CLIENT_POLICIES)}")
+        self._send = send
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self.subscriptions: Set[Tuple[str, str]] = set()
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+        self._pending: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._sequence = itertools.count()
+        self._ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def put(self, message: str, coalesce_key: Optional[Hashable] = None) -> None:
+        """放入待送訊息（不會等待），coalesce_key 相同的訊息在 coalesce 模式下只保留最新的"""
+        if self.closed:
+            return
+        if self.policy == "coalesce" and coalesce_key is not None and coalesce_key in self._pending:
+            self._pending[coalesce_key] = message
+            self.coalesced += 1
+            return
+        if len(self._pending) >= self.max_queue:
+            if self.policy == "drop_newest":
+                self.dropped += 1
+                return
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        key = coalesce_key if self.policy == "coalesce" and coalesce_key is not None else next(self._sequence)
+        self._pending[key] = message
+        if self._ready is not None:
+            self._ready.set()
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self._pending:
+                    _, message = self._pending.popitem(last=False)
+                    await self._send(message)
+                    self.sent += 1
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 客戶端已斷線，停止送出
+            logger.info("Stopped sending to WebSocket client: %s", e)
+            self.closed = True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._pending),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+
+class WebSocketHub:
+    """
+    共用的上游 Finnhub WebSocket
+
+    所有客戶端共用一條上游連線，第一個訂閱某股票的客戶端才會向上游訂閱，最後一個取消時才取消。
+    上游訊息依股票分送給有訂閱的客戶端，每則訊息只序列化一次。斷線時自動重連並重新訂閱。
+
+    Args:
+        url: 上游 WebSocket 位址
+        token: Finnhub API key
+    """
+
+    def __init__(self, url: str = settings.FINNHUB_WS_URL, token: str = settings.FINNHUB_API_KEY):
+        self.url = url
+        self.token = token
+        self.upstream_messages = 0
+        self.reconnects = 0
+        self._subscribers: Dict[Tuple[str, str], Set[ClientSubscriber]] = defaultdict(set)
+        self._clients: Set[ClientSubscriber] = set()
+        self._upstream: Optional[Any] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: Dict[str, list] = defaultdict(list)
+
+    @property
+    def connected(self) -> bool:
+        return self._upstream is not None
+
+    def add_listener(self, channel: str, callback: Callable[[Any], None]) -> None:
+        """註冊程式內部的訊息處理函式（例如成交聚合），會收到上游訊息的 data"""
+        self._listeners[channel].append(callback)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for client in list(self._clients):
+            await client.close()
+        self._clients.clear()
+        self._subscribers.clear()
+
+    def _ensure_running(self) -> None:
+        # 有訂閱時才連線上游
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _send_upstream(self, action: str, symbol: str) -> None:
+        if self._upstream is None:
+            # 尚未連線，連線後會重新訂閱
+            return
+        try:
+            await self._upstream.send(json.dumps({"type": action, "symbol": symbol}))
+        except Exception as e:
+            logger.warning("Failed to send %s %s upstream: %s", action, symbol, e)
+
+    def register(self, client: ClientSubscriber) -> None:
+        self._clients.add(client)
+        client.start()
+
+    async def unregister(self, client: ClientSubscriber) -> None:
+        for channel, symbol in list(client.subscriptions):
+            await self.unsubscribe(client, channel, symbol)
+        self._clients.discard(client)
+        await client.close()
+
+    async def subscribe(self, client: ClientSubscriber, channel: str, symbol: str) -> None:
+        key = (channel, symbol)
+        subscribers = self._subscribers[key]
+        if client in subscribers:
+            return
+        subscribers.add(client)
+        client.subscriptions.add(key)
+        if len(subscribers) == 1:
+            self._ensure_running()
+            await self._send_upstream(CHANNELS[channel][0], symbol)
+
+    async def unsubscribe(self, client: ClientSubscriber, channel: str, symbol: str) -> None:
+        key = (channel, symbol)
+        subscribers = self._subscribers.get(key)
+        client.subscriptions.discard(key)
+        if not subscribers or client not in subscribers:
+            return
+        subscribers.discard(client)
+        if not subscribers:
+            del self._subscribers[key]
+            await self._send_upstream(CHANNELS[channel][1], symbol)
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                async with websockets.connect(f"{self.url}?token={self.token}") as upstream:
+                    self._upstream = upstream
+                    delay = 1.0
+                    logger.info("Connected to upstream WebSocket (%s subscriptions)", len(self._subscribers))
+                    for channel, symbol in list(self._subscribers):
+                        await upstream.send(json.dumps({"type": CHANNELS[channel][0], "symbol": symbol}))
+                    async for raw in upstream:
+                        self.upstream_messages += 1
+                        self.dispatch(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Upstream WebSocket disconnected: %s, reconnecting in %.0fs", e, delay)
+            finally:
+                self._upstream = None
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.FINNHUB_WS_RECONNECT_MAX_DELAY)
+
+    def dispatch(self, raw: Any) -> None:
+        """將上游訊息依股票分組後分送給訂閱的客戶端"""
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            logger.warning("Ignoring non-JSON upstream message: %s", str(raw)[:100])
+            return
+        channel = message.get("type")
+        if channel not in CHANNELS:
+            return
+        data = message.get("data") or []
+        for callback in self._listeners.get(channel, ()):
+            try:
+                callback(data)
+            except Exception as e:
+                logger.error("WebSocket listener failed: %s", e, exc_info=True)
+
+        grouped: Dict[str, list] = defaultdict(list)
+        for item in data:
+            if channel == "trade":
+                grouped[item.get("s", "")].append(item)
+            else:
+                for symbol in (item.get("related") or "").split(","):
+                    grouped[symbol.strip()].append(item)
+        for symbol, items in grouped.items():
+            subscribers = self._subscribers.get((channel, symbol))
+            if not subscribers:
+                continue
+            payload = json.dumps({"type": channel, "data": items})
+            coalesce_key = (channel, symbol) if channel == "trade" else None
+            for client in subscribers:
+                client.put(payload, coalesce_key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "clients": len(self._clients),
+            "subscriptions": len(self._subscribers),
+            "upstream_messages": self.upstream_messages,
+            "reconnects": self.reconnects,
+            "dropped": sum(client.dropped for client in self._clients),
+            "coalesced": sum(client.coalesced for client in self._clients),
+        }
+
+
+# 全域 WebSocket hub，由 app 的 lifespan 關閉
+ws_hub = WebSocketHub()
@@ -0,0 +1,64 @@
+import threading
+
+import httpx
+import pytest
+
+from app.core.cache import MemoryBackend, StaleWhileRevalidateCache
+from app.main import app
+from app.services.candle_store import candle_store
+from app.services.finance_cache import finance_cache
+from app.services.finnhub_client import finnhub_client
+from app.services.http_fetcher import http_fetcher
+from tools.fake_finnhub import create_app as create_fake_finnhub
+from tools.static_pages import create_server as create_static_pages
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    """直接呼叫 app 的 HTTP 客戶端（不啟動 lifespan，需要的服務由各測試自行設定）"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        yield client
+
+
+@pytest.fixture
+async def fake_finnhub(monkeypatch, tmp_path):
+    """
+    將 Finnhub 客戶端導向 tools.fake_finnhub（經由 ASGITransport，不開 port）
+
+    快取與 K 線資料庫每個測試各自一份；回傳假上游 app，request_count 為上游請求數
+    """
+    upstream = create_fake_finnhub()
+    monkeypatch.setattr(finnhub_client.limiter, "rate", 0)
+    monkeypatch.setattr(finnhub_client, "_client", httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=upstream), base_url="http://finnhub/api/v1"
+    ))
+    caches = {
+        name: StaleWhileRevalidateCache(name, cache.ttl, cache.stale_ttl, backend=MemoryBackend(name))
+        for name, cache in finance_cache.caches.items()
+    }
+    monkeypatch.setattr(finance_cache, "caches", caches)
+    monkeypatch.setattr(candle_store, "path", str(tmp_path / "candles.sqlite3"))
+    monkeypatch.setattr(candle_store, "_db", None)
+    yield upstream
+    await candle_store.close()
+    await finance_cache.close()
+    await finnhub_client._client.aclose()
+
+
+@pytest.fixture
+async def static_pages():
+    """tools.static_pages 的本機網站，回傳 base URL"""
+    server = create_static_pages(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    # 共用的 HTTP 客戶端綁定在目前的事件迴圈，測試結束時關閉
+    await http_fetcher.close()
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.services.browser_pool import BrowserPool, _BrowserSlot
+
+pytestmark = pytest.mark.anyio
+
+
+class FakePage:
+    async def close(self) -> None:
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    async def new_page(self) -> FakePage:
+        return FakePage()
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.connected = True
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def new_context(self, **options) -> FakeContext:
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+    async def close(self) -> None:
+        self.connected = False
+
+
+def make_pool(monkeypatch, launch_delay: float = 0.0, size: int = 1, **kwargs) -> BrowserPool:
+    pool = BrowserPool(size=size, **kwargs)
+    launches = []
+
+    async def launch() -> _BrowserSlot:
+        launches.append(asyncio.get_running_loop().time())
+        await asyncio.sleep(launch_delay)
+        return _BrowserSlot(FakeBrowser())
+
+    monkeypatch.setattr(pool, "_launch", launch)
+    pool.launches = launches
+    return pool
+
+
+async def test_contexts_are_closed_after_each_page(monkeypatch):
+    pool = make_pool(monkeypatch)
+    await pool.start(background=False)
+
+    for _ in range(3):
+        async with pool.page():
+            pass
+
+    # 每個頁面使用新的上下文，用完即關閉，不會帶著儲存空間與權限給下一個請求
+    browser = pool._slots[0].browser
+    assert len(browser.contexts) == 3
+    assert all(context.closed for context in browser.contexts)
+    await pool.stop()
+
+
+async def test_launch_does_not_block_other_acquirers(monkeypatch):
+    pool = make_pool(monkeypatch, launch_delay=0.3, size=2, max_pages_per_browser=1)
+    pool._init_primitives()
+    pool._slots.append(_BrowserSlot(FakeBrowser()))
+
+    async def use_page() -> float:
+        started = asyncio.get_running_loop().time()
+        async with pool.page():
+            await asyncio.sleep(0.01)
+        return asyncio.get_running_loop().time() - started
+
+    # 其中一個瀏覽器正在啟動（約 0.3 秒），已啟動的瀏覽器可立即使用
+    elapsed = await use_page()
+    assert elapsed < 0.1
+    assert len(pool.launches) == 1
+    await pool.stop()
+
+
+async def test_retired_browser_is_replaced(monkeypatch):
+    pool = make_pool(monkeypatch, max_pages_per_browser=2)
+    await pool.start(background=False)
+    first = pool._slots[0]
+
+    for _ in range(3):
+        async with pool.page():
+            pass
+
+    assert first not in pool._slots
+    assert not first.browser.is_connected()
+    assert len(pool.launches) == 2
+    await pool.stop()
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import MemoryBackend, RedisBackend, SQLiteBackend, StaleWhileRevalidateCache
+from tools.fake_redis import FakeRedis
+
+pytestmark = pytest.mark.anyio
+
+
+class Upstream:
+    """計算呼叫次數的假上游，每次回傳遞增的版本"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def fetch(self) -> dict:
+        self.calls += 1
+        version = self.calls
+        await asyncio.sleep(self.delay)
+        return {"version": version}
+
+
+@pytest.fixture
+async def fake_redis():
+    server = FakeRedis()
+    port = await server.start()
+    yield server, f"redis://127.0.0.1:{port}/0"
+    await server.stop()
+
+
+async def test_fresh_hit_does_not_refetch():
+    cache = StaleWhileRevalidateCache("test", ttl=60, backend=MemoryBackend("test"))
+    upstream = Upstream(delay=0)
+    assert await cache.get_or_fetch("k", upstream.fetch) == {"version": 1}
+    assert await cache.get_or_fetch("k", upstream.fetch) == {"version": 1}
+    assert upstream.calls == 1
+    assert cache.hits == 1 and cache.misses == 1
+
+
+async def test_stale_value_served_while_refreshing():
+    cache = StaleWhileRevalidateCache("test", ttl=0.05, stale_ttl=60, backend=MemoryBackend("test"))
+    upstream = Upstream(delay=0.05)
+    await cache.get_or_fetch("k", upstream.fetch)
+    await asyncio.sleep(0.06)
+
+    # 過期但仍在 stale 期間：立即回傳舊值，背景更新
+    assert await cache.get_or_fetch("k", upstream.fetch) == {"version": 1}
+    assert cache.stale_hits == 1
+    await asyncio.sleep(0.1)
+    assert upstream.calls == 2
+    assert await cache.get_or_fetch("k", upstream.fetch) == {"version": 2}
+    await cache.close()
+
+
+async def test_concurrent_misses_fetch_once():
+    cache = StaleWhileRevalidateCache("test", ttl=60, backend=MemoryBackend("test"))
+    upstream = Upstream()
+    results = await asyncio.gather(*(cache.get_or_fetch("k", upstream.fetch) for _ in range(10)))
+    assert results == [{"version": 1}] * 10
+    assert upstream.calls == 1
+
+
+async def _two_workers_fetch_once(make_backend) -> None:
+    # 兩個快取各自有程序內的 single-flight，模擬共用後端的兩個 worker
+    workers = [StaleWhileRevalidateCache("quote", ttl=60, backend=make_backend()) for _ in range(2)]
+    upstream = Upstream(delay=0.1)
+    results = await asyncio.gather(*(
+        worker.get_or_fetch("AAPL", upstream.fetch) for worker in workers for _ in range(5)
+    ))
+    assert results == [{"version": 1}] * 10
+    assert upstream.calls == 1
+    for worker in workers:
+        await worker.close()
+
+
+async def test_sqlite_backend_single_flight_across_workers(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    await _two_workers_fetch_once(lambda: SQLiteBackend("quote", path=path))
+
+
+async def test_redis_backend_single_flight_across_workers(fake_redis):
+    _, url = fake_redis
+    await _two_workers_fetch_once(lambda: RedisBackend("quote", url=url))
+
+
+async def test_sqlite_close_keeps_shared_database_open(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    finance = SQLiteBackend("finance", path=path)
+    scrape = SQLiteBackend("scrape", path=path)
+    await finance.set("k", 1, ttl=60)
+    await scrape.set("k", 2, ttl=60)
+
+    await finance.close()
+    value, _ = await scrape.get("k")
+    assert value == 2
+    await scrape.close()
+
+
+async def test_redis_connect_timeout():
+    async def silent(reader, writer):
+        await reader.read()
+
+    server = await asyncio.start_server(silent, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    backend = RedisBackend("test", url=f"redis://:secret@127.0.0.1:{port}/0", timeout=0.1)
+    with pytest.raises(asyncio.TimeoutError):
+        await backend.get("k")
+    server.close()
+    await server.wait_closed()
@@ -0,0 +1,61 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.candle_store import candle_store, find_gaps, merge_ranges
+
+pytestmark = pytest.mark.anyio
+
+DAY = 86400
+
+
+def ts(date: str) -> int:
+    return int(datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+
+
+def test_find_gaps():
+    assert find_gaps(0, 100, []) == [(0, 100)]
+    assert find_gaps(0, 100, [(10, 20), (30, 40)]) == [(0, 9), (21, 29), (41, 100)]
+    assert find_gaps(15, 35, [(10, 20), (30, 40)]) == [(21, 29)]
+    assert find_gaps(0, 100, [(-5, 200)]) == []
+
+
+def test_merge_ranges():
+    assert merge_ranges([(30, 40), (0, 10), (11, 20), (35, 50)]) == [(0, 20), (30, 50)]
+
+
+async def test_only_missing_ranges_are_fetched(fake_finnhub):
+    fetches = candle_store.upstream_fetches
+    january = await candle_store.get_candles("AAPL", "D", ts("2024-01-01"), ts("2024-01-31"))
+    assert january["s"] == "ok" and len(january["t"]) == 23
+    assert candle_store.upstream_fetches == fetches + 1
+
+    # 已取得的一月直接從本機讀取，只向上游補二月
+    quarter = await candle_store.get_candles("AAPL", "D", ts("2024-01-01"), ts("2024-02-29"))
+    assert candle_store.upstream_fetches == fetches + 2
+    assert quarter["t"][:23] == january["t"] and quarter["c"][:23] == january["c"]
+    assert quarter["t"] == sorted(set(quarter["t"]))
+
+    requests = fake_finnhub.state.request_count
+    await candle_store.get_candles("AAPL", "D", ts("2024-01-10"), ts("2024-02-10"))
+    assert fake_finnhub.state.request_count == requests
+    assert candle_store.upstream_fetches == fetches + 2
+
+
+async def test_unsettled_range_is_not_marked_covered(fake_finnhub):
+    now = int(time.time())
+    data = await candle_store.get_candles("MSFT", "60", now - 3 * DAY, now)
+    assert data["s"] == "ok"
+
+    db = await candle_store._get_db()
+    covered = db.coverage("MSFT", "60")
+    # 最近兩小時內的 K 線仍可能變動，下次查詢會重新取得
+    assert covered and covered[-1][1] <= now - 7200
+    assert find_gaps(now - 3 * DAY, now, covered)
+
+
+async def test_no_data_range(fake_finnhub):
+    # 週末沒有日 K
+    data = await candle_store.get_candles("AAPL", "D", ts("2024-01-06"), ts("2024-01-07"))
+    assert data["s"] == "no_data" and data["t"] == []
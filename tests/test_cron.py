@@ -0,0 +1,204 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from croniter import croniter
+
+from app.services.cron import CronRegistry, CronTime, compile_cron
+
+pytestmark = pytest.mark.anyio
+
+
+def _random_field(rng: random.Random, low: int, high: int, extra: tuple = ()) -> str:
+    roll = rng.random()
+    if roll < 0.3:
+        return "*"
+    if roll < 0.45:
+        return f"*/{rng.randint(1, high - low + 1)}"
+    if roll < 0.7:
+        start = rng.randint(low, high)
+        end = rng.randint(start, high)
+        return f"{start}-{end}" if roll < 0.6 else f"{start}-{end}/{rng.randint(1, 5)}"
+    if extra and roll < 0.8:
+        return rng.choice(extra)
+    return ",".join(str(rng.randint(low, high)) for _ in range(rng.randint(1, 3)))
+
+
+def _random_expressions(seed: int, count: int):
+    rng = random.Random(seed)
+    expressions = []
+    while len(expressions) < count:
+        weekday_extra = (f"{rng.randint(0, 6)}#{rng.randint(1, 5)}", f"{rng.randint(0, 6)}#{rng.randint(1, 5)}")
+        expression = " ".join([
+            _random_field(rng, 0, 59),
+            _random_field(rng, 0, 23),
+            _random_field(rng, 1, 31, ("L",)),
+            _random_field(rng, 1, 12),
+            _random_field(rng, 0, 6, weekday_extra),
+        ])
+        try:
+            compile_cron(expression)
+        except Exception:
+            continue
+        expressions.append(expression)
+    return rng, expressions
+
+
+def _random_moment(rng: random.Random) -> datetime:
+    moment = datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 60 * 24 * 800))
+    if rng.random() < 0.5:
+        # 常見的整點時間較容易命中
+        moment = moment.replace(hour=rng.choice([0, 12, 23]), minute=rng.choice([0, 5, 30]))
+    return moment
+
+
+def test_match_equivalent_to_croniter():
+    rng, expressions = _random_expressions(seed=1, count=400)
+    for expression in expressions:
+        compiled = compile_cron(expression)
+        for _ in range(15):
+            moment = _random_moment(rng)
+            expected = croniter.match(expression, moment)
+            assert compiled.match(CronTime.from_datetime(moment)) == expected, (expression, moment)
+
+
+@pytest.mark.parametrize("expression, moment", [
+    ("* 23 28-31 * 5#2", "2025-10-10T23:08:00"),
+    ("* * */10 1 5#2", "2024-01-31T10:00:00"),
+    ("0 10 * * 1#1", "2025-01-06T10:00:00"),
+    ("0 0 L * *", "2025-02-28T00:00:00"),
+    ("* * 31 6,11 3-6", "2024-11-06T19:18:00"),
+])
+def test_match_special_cases(expression, moment):
+    moment = datetime.fromisoformat(moment)
+    assert compile_cron(expression).match(CronTime.from_datetime(moment)) == croniter.match(expression, moment)
+
+
+def test_registry_due_equivalent_to_croniter():
+    rng, expressions = _random_expressions(seed=2, count=200)
+    registry = CronRegistry()
+    for index, expression in enumerate(expressions):
+        registry.register(f"job-{index}", expression)
+    for _ in range(40):
+        moment = _random_moment(rng)
+        expected = sorted(
+            f"job-{index}" for index, expression in enumerate(expressions) if croniter.match(expression, moment)
+        )
+        assert sorted(registry.due(moment)) == expected, moment
+
+
+def test_registry_window_first_fire():
+    registry = CronRegistry()
+    registry.register("hourly", "5 * * * *")
+    registry.register("monday", "0 10 * * 1#1")
+    registry.register("never", "0 0 31 2 *")
+    start, end = datetime(2025, 1, 1), datetime(2025, 1, 8)
+    assert registry.window(start, end) == {
+        "hourly": datetime(2025, 1, 1, 0, 5),
+        "monday": datetime(2025, 1, 6, 10, 0),
+    }
+
+
+async def test_check_endpoint(client):
+    response = await client.get(
+        "/api/v1/cron/check", params={"cron": "* 23 28-31 * 5#2", "datetime_str": "2025-10-10T23:08:00"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"shouldRun": False}
+
+    response = await client.get("/api/v1/cron/check", params={"cron": "bad cron", "datetime_str": "2025-10-10T23:08:00"})
+    assert response.status_code == 400
+
+
+async def test_next_endpoint(client):
+    response = await client.get(
+        "/api/v1/cron/next", params={"cron": "0 9 * * *", "count": 2, "datetime_str": "2025-01-01T10:00:00"}
+    )
+    assert response.status_code == 200
+    assert response.json()["next"] == ["2025-01-02T09:00:00", "2025-01-03T09:00:00"]
+
+    # 永遠不會觸發的表達式
+    response = await client.get("/api/v1/cron/next", params={"cron": "0 0 31 2 *"})
+    assert response.status_code == 200
+    assert response.json()["next"] == []
+
+
+def test_registry_window_equivalent_to_croniter():
+    rng, expressions = _random_expressions(seed=3, count=150)
+    registry = CronRegistry()
+    registry.register_many([(f"job-{index}", expression) for index, expression in enumerate(expressions)])
+    start, end = datetime(2025, 3, 1, 6, 30, 15), datetime(2025, 3, 4, 18, 0)
+    expected = {}
+    for index, expression in enumerate(expressions):
+        fired = compile_cron(expression).next_times(start, 1)
+        if fired and fired[0] <= end:
+            expected[f"job-{index}"] = fired[0]
+    assert registry.window(start, end) == expected
+
+
+def test_registry_remove_and_replace():
+    registry = CronRegistry()
+    registry.register_many([("a", "*/5 * * * *"), ("b", "0 * * * *"), ("c", "0 12 * * 1#1")])
+    moment = datetime(2025, 1, 6, 12, 0)
+    assert sorted(registry.due(moment)) == ["a", "b", "c"]
+
+    assert registry.remove("a") is True
+    assert registry.remove("a") is False
+    registry.register("b", "30 * * * *")
+    assert registry.due(moment) == ["c"]
+    assert registry.due(moment.replace(minute=30)) == ["b"]
+
+    # 空出的位置可被新工作使用，不會帶到舊工作的 bit
+    registry.register("d", "15 3 * * *")
+    assert registry.due(moment.replace(minute=5)) == []
+    assert len(registry) == 3
+
+
+def test_register_many_reports_errors_and_overflow():
+    registry = CronRegistry(max_jobs=2)
+    errors = registry.register_many([("a", "* * * * *"), ("bad", "not a cron"), ("b", "0 0 * * *")])
+    assert errors == {"bad": "Invalid cron expression."}
+    assert len(registry) == 2
+    with pytest.raises(OverflowError):
+        registry.register_many([("c", "* * * * *")])
+    # 取代既有工作不佔用新的位置
+    registry.register_many([("a", "5 * * * *")])
+    assert registry.due(datetime(2025, 1, 1, 0, 5)) == ["a"]
+
+
+def test_registry_scales_with_many_jobs():
+    registry = CronRegistry()
+    jobs = [(f"job-{index}", f"{index % 60} {index % 24} * * *") for index in range(50000)]
+    registry.register_many(jobs)
+    assert len(registry.due(datetime(2025, 1, 1, 5, 5))) == sum(
+        1 for index in range(50000) if index % 60 == 5 and index % 24 == 5
+    )
+
+    # 單筆註冊與移除只更新該工作的欄位值，與工作總數無關
+    started = time.perf_counter()
+    for index in range(200):
+        registry.register(f"extra-{index}", "* * * * *")
+        registry.remove(f"extra-{index}")
+    assert time.perf_counter() - started < 1.0
+
+
+async def test_jobs_endpoints(client, monkeypatch):
+    monkeypatch.setattr("app.api.v1.endpoints.cron.cron_registry", CronRegistry())
+    response = await client.put("/api/v1/cron/jobs", json={"jobs": [
+        {"id": "hourly", "cron": "0 * * * *"},
+        {"id": "bad", "cron": "bad cron"},
+    ]})
+    assert response.status_code == 200
+    assert response.json()["registered"] == 1
+    assert response.json()["errors"] == {"bad": "Invalid cron expression."}
+
+    response = await client.get("/api/v1/cron/jobs/due", params={"datetime_str": "2025-01-01T10:00:00"})
+    assert response.json()["jobs"] == ["hourly"]
+    response = await client.get(
+        "/api/v1/cron/jobs/window", params={"start": "2025-01-01T10:01:00", "end": "2025-01-01T12:00:00"}
+    )
+    assert response.json()["jobs"] == [{"id": "hourly", "first_fire": "2025-01-01T11:00:00"}]
+
+    assert (await client.delete("/api/v1/cron/jobs/hourly")).status_code == 204
+    assert (await client.delete("/api/v1/cron/jobs/hourly")).status_code == 404
@@ -0,0 +1,114 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from app.core.compression import CompressionMiddleware
+from app.services import extraction
+
+pytestmark = pytest.mark.anyio
+
+PAGE = """<!DOCTYPE html>
+<html lang="zh-TW">
+<head>
+<title> 台積電 法說會 </title>
+<meta name="description" content="Quarterly results">
+<meta property="og:title" content="TSMC earnings">
+<link rel="canonical" href="/news/1">
+</head>
+<body>
+<nav><a href="/">Home</a><a href="#top">Top</a></nav>
+<div class="share-buttons">Share this</div>
+<article>
+<h1>TSMC reports record revenue</h1>
+<p>Revenue grew strongly in the quarter thanks to demand for advanced chips.</p>
+<p>Guidance for the next quarter was raised <a href="/guidance">see details</a>.</p>
+<script>track()</script>
+</article>
+<footer>Copyright <a href="https://example.org/terms">Terms</a></footer>
+</body>
+</html>"""
+
+BASE = "https://news.example.com/2024/article"
+
+
+def test_main_text_drops_noise():
+    text = extraction.extract_main_text(PAGE)
+    assert text.splitlines() == [
+        "TSMC reports record revenue",
+        "Revenue grew strongly in the quarter thanks to demand for advanced chips.",
+        "Guidance for the next quarter was raised see details.",
+    ]
+    assert extraction.extract_main_text("") == ""
+
+
+def test_fragments_css_and_xpath():
+    fragments = extraction.extract_fragments(PAGE, ["article h1", "//article/p[1]/text()", "xpath=//a/@href"])
+    assert fragments["article h1"] == ["<h1>TSMC reports record revenue</h1>"]
+    assert fragments["//article/p[1]/text()"][0].startswith("Revenue grew")
+    assert "/guidance" in fragments["xpath=//a/@href"]
+
+    as_text = extraction.extract_fragments(PAGE, ["article p"], as_text=True)
+    assert as_text["article p"][1] == "Guidance for the next quarter was raised see details."
+
+    with pytest.raises(ValueError):
+        extraction.extract_fragments(PAGE, ["//["])
+
+
+def test_links_and_metadata():
+    links = extraction.extract_links(PAGE, BASE)
+    assert [link["url"] for link in links] == [
+        "https://news.example.com/",
+        "https://news.example.com/guidance",
+        "https://example.org/terms",
+    ]
+    metadata = extraction.extract_metadata(PAGE, BASE)
+    assert metadata == {
+        "title": "台積電 法說會",
+        "lang": "zh-TW",
+        "description": "Quarterly results",
+        "og:title": "TSMC earnings",
+        "canonical": "https://news.example.com/news/1",
+    }
+
+
+def _compressed_app() -> httpx.AsyncClient:
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse("price " * 1000)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for _ in range(3):
+                yield ("line " * 500 + "\n").encode()
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=CompressionMiddleware(app, minimum_size=1024)), base_url="http://test"
+    )
+
+
+async def test_compression_middleware():
+    async with _compressed_app() as client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) < 6000
+        assert response.text == "price " * 1000
+
+        # 小的回應、串流回應與拒絕 gzip 的客戶端不壓縮
+        for path, accept in (("/small", "gzip"), ("/stream", "gzip"), ("/large", "gzip;q=0, identity")):
+            response = await client.get(path, headers={"Accept-Encoding": accept})
+            assert "content-encoding" not in response.headers
+
+
+async def test_scrape_output_requires_selectors(client):
+    response = await client.post("/scrape", json={"url": "http://example.com/", "output": "fragments"})
+    assert response.status_code == 422
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.core.etag import etag_matches
+from app.services import candle_format
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_quotes_are_cached(client, fake_finnhub):
+    response = await client.get("/api/v1/finance/quotes", params={"symbols": "AAPL,MSFT"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 2
+    assert fake_finnhub.state.request_count == 2
+
+    # 重複請求與並行請求都由快取回應，不再打到上游
+    responses = await asyncio.gather(*(
+        client.get("/api/v1/finance/quotes", params={"symbols": "AAPL,MSFT"}) for _ in range(5)
+    ))
+    assert all(response.json()["succeeded"] == 2 for response in responses)
+    assert fake_finnhub.state.request_count == 2
+
+
+async def test_history_formats_agree(client, fake_finnhub, monkeypatch):
+    params = {"from_date": "2024-01-01", "to_date": "2024-02-29", "resolution": "D"}
+    url = "/api/v1/finance/stock/AAPL/history"
+    rows = (await client.get(url, params=params)).json()
+    columnar = (await client.get(url, params={**params, "format": "columnar"})).json()
+    csv = (await client.get(url, params={**params, "format": "csv"})).text.splitlines()
+
+    data = rows["data"]
+    assert len(data) == len(columnar["t"]) == len(csv) - 1 == 44
+    assert [row["date"] for row in data] == columnar["date"]
+    assert [row["close"] for row in data] == columnar["c"]
+    assert all(isinstance(volume, int) for volume in columnar["v"])
+    assert csv[0] == "date,open,high,low,close,volume"
+    first = data[0]
+    assert csv[1] == f"{first['date']},{first['open']},{first['high']},{first['low']},{first['close']},{first['volume']}"
+
+    # 超過門檻時分段串流，內容與一次輸出相同
+    monkeypatch.setattr(candle_format, "CHUNK_ROWS", 5)
+    monkeypatch.setattr(settings, "HISTORY_STREAM_THRESHOLD", 10)
+    assert (await client.get(url, params=params)).json() == rows
+    assert (await client.get(url, params={**params, "format": "columnar"})).json() == columnar
+
+    response = await client.get(url, params={**params, "format": "xml"})
+    assert response.status_code == 400
+
+
+def test_format_dates_matches_localtime():
+    timestamps = np.array([0, 1_700_000_000, 1_710_054_000, 1_730_602_800], dtype=np.int64)
+    expected = [time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(int(t))) for t in timestamps]
+    assert candle_format.format_dates(timestamps).tolist() == expected
+
+
+async def test_history_etag_not_modified(client, fake_finnhub):
+    params = {"from_date": "2024-01-01", "to_date": "2024-03-01", "resolution": "60"}
+    headers = {"Accept-Encoding": "gzip"}
+    response = await client.get("/api/v1/finance/stock/AAPL/history", params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    etag = response.headers["etag"]
+
+    # 內容未變時回傳 304，不帶內容
+    response = await client.get(
+        "/api/v1/finance/stock/AAPL/history", params=params, headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+    assert "content-encoding" not in response.headers
+
+    # 不同的資料有不同的 ETag
+    response = await client.get(
+        "/api/v1/finance/stock/MSFT/history", params=params, headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+async def test_errors_are_not_tagged(client, fake_finnhub):
+    response = await client.get("/api/v1/finance/stock/AAPL/history", params={"resolution": "2"})
+    assert response.status_code == 400
+    assert "etag" not in response.headers
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    ('W/"abc"', True),
+    ('"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ("*", True),
+    ('"xyz"', False),
+])
+def test_etag_weak_comparison(if_none_match, expected):
+    assert etag_matches(if_none_match, 'W/"abc"') is expected
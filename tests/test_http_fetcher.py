@@ -0,0 +1,118 @@
+import ssl
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services import scraper
+from app.services.http_fetcher import HttpFetcher, HttpFetchRejected, HttpFetchResult, escalation_reason
+from app.services.scraper import ScrapeResponse, URLRequest
+
+pytestmark = pytest.mark.anyio
+
+ARTICLE = "<html><head><title>Article</title></head><body><p>" + "word " * 100 + "</p></body></html>"
+
+
+def make_fetcher(handler, max_bytes: int = 1024 * 1024) -> HttpFetcher:
+    fetcher = HttpFetcher(max_bytes=max_bytes)
+    fetcher._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return fetcher
+
+
+def result(content: str, status: int = 200) -> HttpFetchResult:
+    return HttpFetchResult(status, content, "text/html", "http://example.com/")
+
+
+def test_tls_verified_by_default():
+    client = HttpFetcher()._get_client()
+    assert client._transport._pool._ssl_context.verify_mode == ssl.CERT_REQUIRED
+
+
+async def test_fetch_static_page(static_pages):
+    fetcher = HttpFetcher()
+    fetched = await fetcher.fetch(f"{static_pages}/page/3")
+    assert fetched.status == 200
+    assert fetched.title.startswith("Benchmark article 3")
+    assert escalation_reason(fetched) is None
+    await fetcher.close()
+
+
+async def test_non_html_is_rejected_without_reading_body():
+    fetcher = make_fetcher(lambda request: httpx.Response(
+        200, headers={"Content-Type": "application/pdf"}, content=b"%PDF" * 1000
+    ))
+    with pytest.raises(HttpFetchRejected) as error:
+        await fetcher.fetch("http://example.com/file.pdf")
+    assert error.value.status_code == 415
+
+
+@pytest.mark.parametrize("declare_length", [True, False])
+async def test_body_size_is_capped(declare_length):
+    async def body():
+        for _ in range(100):
+            yield b"<p>" + b"x" * 1021
+
+    def handler(request):
+        headers = {"Content-Type": "text/html; charset=utf-8"}
+        if declare_length:
+            return httpx.Response(200, headers=headers, content=b"x" * 102400)
+        return httpx.Response(200, headers=headers, content=body())
+
+    fetcher = make_fetcher(handler, max_bytes=10 * 1024)
+    with pytest.raises(HttpFetchRejected) as error:
+        await fetcher.fetch("http://example.com/big")
+    assert error.value.status_code == 413
+
+
+async def test_charset_is_respected():
+    fetcher = make_fetcher(lambda request: httpx.Response(
+        200, headers={"Content-Type": "text/html; charset=big5"},
+        content="<title>台積電</title>".encode("big5"),
+    ))
+    assert (await fetcher.fetch("http://example.com/")).title == "台積電"
+
+
+@pytest.mark.parametrize("content, status, reason", [
+    (ARTICLE, 200, None),
+    ("", 200, "empty_body"),
+    ("<html><body>Just a moment...</body></html>", 200, "bot_challenge"),
+    (ARTICLE, 429, "status_429"),
+    ("<html><body>gone</body></html>", 404, None),
+    ('<html><body><div id="root"></div></body></html>', 200, "js_shell"),
+    ("<html><body><p>short</p></body></html>", 200, "thin_content"),
+])
+def test_escalation_reason(content, status, reason):
+    assert escalation_reason(result(content, status)) == reason
+
+
+async def test_auto_mode_escalates_to_browser(monkeypatch):
+    async def fetch(url):
+        return result('<html><body><div id="app"></div></body></html>')
+
+    async def scrape_with_browser(request):
+        return ScrapeResponse(title="Rendered", content="<html></html>", status=200)
+
+    monkeypatch.setattr(scraper.http_fetcher, "fetch", fetch)
+    monkeypatch.setattr(scraper, "scrape_with_browser", scrape_with_browser)
+
+    response = await scraper.scrape(URLRequest(url="http://example.com/", mode="auto"))
+    assert response.title == "Rendered"
+    assert response.escalation == "js_shell"
+
+    # http 模式不改用瀏覽器
+    response = await scraper.scrape(URLRequest(url="http://example.com/", mode="http"))
+    assert response.tier == "http"
+
+
+async def test_rejected_response_is_not_escalated(monkeypatch):
+    async def fetch(url):
+        raise HttpFetchRejected(415, "Unsupported content type: image/png")
+
+    async def scrape_with_browser(request):
+        raise AssertionError("should not use the browser")
+
+    monkeypatch.setattr(scraper.http_fetcher, "fetch", fetch)
+    monkeypatch.setattr(scraper, "scrape_with_browser", scrape_with_browser)
+    with pytest.raises(HTTPException) as error:
+        await scraper.scrape(URLRequest(url="http://example.com/a.png", mode="auto"))
+    assert error.value.status_code == 415
@@ -0,0 +1,53 @@
+import pytest
+
+from app.api.v1.endpoints import finance
+from app.services.candle_store import candle_store
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_indicators_realign_when_candles_grow(client, fake_finnhub, monkeypatch):
+    finance.indicator_cache.clear()
+    candles = {"count": 30}
+
+    async def get_candles(symbol, resolution, start, end):
+        count = candles["count"]
+        t = [start + day * 86400 for day in range(count)]
+        c = [float(day + 1) for day in range(count)]
+        return {"s": "ok", "t": t, "o": c, "h": c, "l": c, "c": c, "v": [1000] * count}
+
+    monkeypatch.setattr(candle_store, "get_candles", get_candles)
+    params = {"from_date": "2024-01-01", "to_date": "2024-03-01"}
+
+    response = await client.get("/api/v1/finance/stock/AAPL/indicators", params={**params, "indicators": "sma:5"})
+    assert len(response.json()["t"]) == 30
+
+    # K 線增加後，只請求新指標也會重算並更新時間軸
+    candles["count"] = 31
+    response = await client.get("/api/v1/finance/stock/AAPL/indicators", params={**params, "indicators": "ema:5"})
+    assert len(response.json()["t"]) == 31
+
+    # 先前快取的 sma:5 對應舊時間軸，不可與新時間軸混用
+    response = await client.get(
+        "/api/v1/finance/stock/AAPL/indicators", params={**params, "indicators": "sma:5,ema:5"}
+    )
+    body = response.json()
+    assert len(body["t"]) == 31
+    assert len(body["indicators"]["sma:5"]) == 31
+    assert len(body["indicators"]["ema:5"]) == 31
+    assert body["indicators"]["sma:5"][-1] == pytest.approx(29.0)
+
+
+async def test_indicator_cache_bounded_by_bytes(client, fake_finnhub, monkeypatch):
+    finance.indicator_cache.clear()
+    monkeypatch.setattr(finance.indicator_cache, "max_bytes", 64 * 1024)
+    params = {"from_date": "2024-01-01", "to_date": "2024-03-01", "resolution": "60", "indicators": "sma:5,ema:5"}
+
+    for symbol in ("AAPL", "MSFT", "NVDA", "AMD"):
+        response = await client.get(f"/api/v1/finance/stock/{symbol}/indicators", params=params)
+        assert response.status_code == 200
+        assert len(response.json()["indicators"]["sma:5"]) == len(response.json()["t"])
+
+    # 快取以陣列大小計算，超過上限時淘汰最舊的項目
+    assert 0 < finance.indicator_cache.total_bytes <= 64 * 1024
+    assert len(finance.indicator_cache) < 12
@@ -0,0 +1,94 @@
+import json
+import logging
+import queue
+
+from app.core import logging_config
+from app.core.logging_config import JsonFormatter, LazyQueueHandler, SamplingFilter, _QueuePipeline
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def make_record(level: int = logging.INFO, name: str = "test", args=("world",)) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, "hello %s", args, None)
+
+
+def test_json_formatter_includes_extra_and_exception():
+    logger = logging.getLogger("test.json")
+    handler = ListHandler()
+    logger.addHandler(handler)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.error("failed %s", "AAPL", exc_info=True, extra={"symbol": "AAPL", "elapsed": 0.5})
+    logger.removeHandler(handler)
+
+    entry = json.loads(JsonFormatter().format(handler.records[0]))
+    assert entry["message"] == "failed AAPL"
+    assert entry["level"] == "ERROR" and entry["logger"] == "test.json"
+    assert entry["symbol"] == "AAPL" and entry["elapsed"] == 0.5
+    assert "ValueError: boom" in entry["exc_info"]
+    assert "args" not in entry and "msg" not in entry
+
+
+def test_sampling_filter_keeps_warnings():
+    sampler = SamplingFilter(sample_rate=0.0)
+    assert not sampler.filter(make_record(logging.INFO))
+    assert not sampler.filter(make_record(logging.DEBUG))
+    assert sampler.filter(make_record(logging.WARNING))
+    assert sampler.filter(make_record(logging.ERROR))
+    assert sampler.dropped == 2
+
+
+def test_sampling_filter_rate_limits_per_logger():
+    sampler = SamplingFilter(rate_per_second=5)
+    kept = sum(sampler.filter(make_record(name="a")) for _ in range(20))
+    assert kept == 5
+    # 各 logger 各自計算
+    assert sampler.filter(make_record(name="b"))
+    assert sampler.dropped == 15
+
+
+def test_filter_applies_without_queue(monkeypatch):
+    monkeypatch.setattr(logging_config.settings, "LOG_QUEUE_ENABLED", False)
+    monkeypatch.setattr(logging_config, "_filter", SamplingFilter(sample_rate=0.0))
+    logger = logging_config.setup_logger("test.plain")
+    handler = ListHandler()
+    logger.handlers = [handler]
+
+    logger.info("dropped %s", 1)
+    logger.warning("kept %s", 2)
+    assert [record.getMessage() for record in handler.records] == ["kept 2"]
+    assert logging_config.logging_stats()["sampled_out"] == 1
+    logger.filters.clear()
+
+
+def test_queue_handler_drops_when_full():
+    handler = LazyQueueHandler(queue.Queue(maxsize=1))
+    record = make_record()
+    handler.handle(record)
+    handler.handle(make_record())
+    assert handler.dropped == 1
+    # 不預先格式化，訊息在背景執行緒才建立
+    assert handler.queue.get_nowait() is record and record.args == ("world",)
+
+
+def test_queue_listener_flushes_on_stop(monkeypatch):
+    monkeypatch.setattr(logging_config.settings, "LOG_QUEUE_SIZE", 1000)
+    pipeline = _QueuePipeline(logging_config.log_format)
+    collector = ListHandler()
+    pipeline.router.routes["test.queue"] = [collector]
+
+    for index in range(500):
+        pipeline.queue_handler.handle(make_record(name="test.queue", args=(index,)))
+    pipeline.stop()
+
+    assert [record.getMessage() for record in collector.records] == [f"hello {index}" for index in range(500)]
+    # 重複停止（atexit）不會出錯
+    pipeline.stop()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core.metrics import HTTP_REQUEST_DURATION, LoopLagMonitor, MetricsMiddleware, MetricsRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("path",))
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+    registry.add_collector(lambda: [("hit_ratio", "gauge", "Hit ratio", [({"cache": "quote"}, 0.75)])])
+    # 重複註冊回傳同一個指標
+    assert registry.counter("requests_total", "Requests", ("path",)) is requests
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{path="/a\\"b"} 3',
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 3.65",
+        "latency_seconds_count 4",
+        "# HELP hit_ratio Hit ratio",
+        "# TYPE hit_ratio gauge",
+        'hit_ratio{cache="quote"} 0.75',
+    ]
+
+
+async def test_middleware_labels_by_route_and_adds_server_timing():
+    registry = MetricsRegistry()
+    phase = registry.histogram("phase_seconds", "Phase")
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        with phase.time(server_timing="db"):
+            await asyncio.sleep(0.01)
+        return {"id": item_id}
+
+    transport = httpx.ASGITransport(app=MetricsMiddleware(app, server_timing=True))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/items/1")
+        await client.get("/items/2")
+        await client.get("/missing")
+
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=") and ", app;dur=" in timing
+    assert float(timing.split("db;dur=")[1].split(",")[0]) >= 10
+
+    counts = {labels: sum(series[:-1]) for labels, series in HTTP_REQUEST_DURATION._series.items()}
+    assert counts[("GET", "/items/{item_id}", "200")] >= 2
+    assert ("GET", "unmatched", "404") in counts
+    assert "phase_seconds_count 2" in registry.render()
+
+
+async def test_metrics_endpoint(client):
+    await client.get("/")
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in body
+    assert '# TYPE cache_hit_ratio gauge' in body
+
+
+async def test_loop_lag_monitor_records_blocking():
+    monitor = LoopLagMonitor(interval=0.01)
+    await monitor.start()
+    await asyncio.sleep(0.02)
+    # 同步阻塞事件迴圈
+    time.sleep(0.1)
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+    assert monitor.max_lag >= 0.05
@@ -0,0 +1,76 @@
+import pytest
+
+from app.services.news_store import TW_STOCK_ALIASES, AliasMatcher, NewsStore
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeNewsClient:
+    def __init__(self, items=(), fail: bool = False):
+        self.items = list(items)
+        self.fail = fail
+        self.calls = 0
+
+    async def general_news(self, category: str, min_id: int = 0):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [item for item in self.items if item["id"] > min_id]
+
+
+def article(article_id: int, headline: str, datetime: int = 0, related: str = "") -> dict:
+    return {"id": article_id, "headline": headline, "summary": "", "datetime": datetime or article_id, "related": related}
+
+
+def test_matcher_only_accepts_known_or_explicit_codes():
+    matcher = AliasMatcher(TW_STOCK_ALIASES)
+    assert matcher.match("TSMC and 2317 report 2024 revenue of 5000 million") == {"2330.TW", "2317.TW"}
+    assert matcher.match("Shares of 6669.TW jumped") == {"6669.TW"}
+    assert matcher.match("台積電與聯發科", related=["AAPL"]) == {"2330.TW", "2454.TW", "AAPL"}
+    assert matcher.match("Sales in 2024 rose 1234 units") == set()
+
+
+def test_search_orders_newest_first_and_evicts_oldest():
+    store = NewsStore(client=FakeNewsClient(), refresh_interval=0, max_articles=3)
+    store.add([
+        article(1, "TSMC expands", datetime=100),
+        article(2, "Foxconn and TSMC", datetime=300),
+        article(3, "Year 2024 outlook", datetime=200),
+    ])
+    total, items = store.search("2330")
+    assert total == 2 and [item["id"] for item in items] == [2, 1]
+    assert store.search("2024") == (0, [])
+
+    store.add([article(4, "MediaTek news", datetime=400), article(4, "duplicate", datetime=500)])
+    assert len(store) == 3
+    assert [item["id"] for item in store.latest()[1]] == [4, 2, 3]
+    assert store.search("2330.TW")[0] == 1
+    assert store.stats()["symbols"] == 3
+
+
+async def test_incremental_refresh():
+    client = FakeNewsClient([article(1, "TSMC"), article(2, "UMC")])
+    store = NewsStore(client=client, refresh_interval=0)
+    assert await store.refresh() == 2
+    client.items.append(article(3, "Realtek"))
+    assert await store.refresh() == 1
+    assert store.last_id == 3 and store.refreshes == 2
+
+
+async def test_ensure_loaded_backs_off_while_upstream_fails():
+    client = FakeNewsClient(fail=True)
+    store = NewsStore(client=client, refresh_interval=0, retry_interval=60)
+    with pytest.raises(RuntimeError):
+        await store.ensure_loaded()
+
+    # 失敗後 retry_interval 內的查詢不再同步打到上游
+    for _ in range(5):
+        await store.ensure_loaded()
+    assert client.calls == 1
+    assert store.stats()["failures"] == 1
+
+    client.fail = False
+    store.last_attempt -= 60
+    await store.ensure_loaded()
+    await store.ensure_loaded()
+    assert client.calls == 2 and store.refreshes == 1
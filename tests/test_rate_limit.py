@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.rate_limit import RateLimitExceeded, TokenBucket
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_waiters_are_spaced_by_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    started = time.monotonic()
+
+    async def acquire() -> float:
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    elapsed = await asyncio.gather(*(acquire() for _ in range(4)))
+    assert elapsed[0] < 0.02
+    assert elapsed[3] == pytest.approx(0.15, abs=0.04)
+
+
+async def test_timeout_fails_immediately_while_others_wait():
+    bucket = TokenBucket(rate=10, capacity=1)
+    await bucket.acquire()
+    waiter = asyncio.create_task(bucket.acquire(timeout=1))
+    await asyncio.sleep(0)
+
+    # 排在 waiter 之後需等待約 0.2 秒，超過 timeout 時不需等待 waiter 完成
+    started = time.monotonic()
+    with pytest.raises(RateLimitExceeded):
+        await bucket.acquire(timeout=0.15)
+    assert time.monotonic() - started < 0.02
+    await waiter
+
+
+async def test_penalize_delays_waiters():
+    bucket = TokenBucket(rate=100, capacity=1)
+    await bucket.acquire()
+    bucket.penalize(0.1)
+    started = time.monotonic()
+    await bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+
+
+async def test_penalize_keeps_waiters_spaced():
+    bucket = TokenBucket(rate=20, capacity=1)
+    await bucket.acquire()
+    started = time.monotonic()
+
+    async def acquire() -> float:
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    waiters = [asyncio.create_task(acquire()) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    bucket.penalize(0.2)
+    elapsed = await asyncio.gather(*waiters)
+
+    # 暫停期間不補充 token，排隊中的呼叫者整體延後且仍間隔 1 / rate
+    assert elapsed[0] == pytest.approx(0.25, abs=0.04)
+    assert elapsed[1] - elapsed[0] == pytest.approx(0.05, abs=0.02)
+    assert elapsed[2] - elapsed[1] == pytest.approx(0.05, abs=0.02)
+
+    # 暫停結束後新的呼叫者排在既有預約之後
+    await bucket.acquire()
+    assert time.monotonic() - started == pytest.approx(0.4, abs=0.05)
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from app.services.resource_blocking import TRACKER_DOMAINS, _matches_domain, install_resource_blocking
+from app.services.scraper import URLRequest, wait_until_ready
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeRoute:
+    def __init__(self, url: str, resource_type: str):
+        self.request = SimpleNamespace(url=url, resource_type=resource_type)
+        self.outcome = None
+
+    async def abort(self) -> None:
+        self.outcome = "abort"
+
+    async def continue_(self) -> None:
+        self.outcome = "continue"
+
+
+class FakePage:
+    def __init__(self, selector_delay: float = 0.0):
+        self.handler = None
+        self.selector_delay = selector_delay
+
+    async def route(self, pattern: str, handler) -> None:
+        self.handler = handler
+
+    async def wait_for_selector(self, selector: str, timeout: float) -> None:
+        if self.selector_delay * 1000 > timeout:
+            await asyncio.sleep(timeout / 1000)
+            raise PlaywrightTimeoutError("timeout")
+        await asyncio.sleep(self.selector_delay)
+
+    async def wait_for_load_state(self, state: str, timeout: float) -> None:
+        pass
+
+
+@pytest.mark.parametrize("host, expected", [
+    ("doubleclick.net", True),
+    ("stats.g.doubleclick.net", True),
+    ("notdoubleclick.net", False),
+    ("localhost", True),
+    ("example.com", False),
+])
+def test_matches_domain(host, expected):
+    assert _matches_domain(host, TRACKER_DOMAINS | {"localhost"}) is expected
+
+
+async def test_blocks_resource_types_and_domains():
+    page = FakePage()
+    await install_resource_blocking(page, ["image", "document"], extra_domains=[".Ads.Example.com", "intranet"])
+
+    async def outcome(url: str, resource_type: str = "script") -> str:
+        route = FakeRoute(url, resource_type)
+        await page.handler(route)
+        return route.outcome
+
+    assert await outcome("https://example.com/logo.png", "image") == "abort"
+    # 主文件不攔截
+    assert await outcome("https://example.com/", "document") == "continue"
+    assert await outcome("https://www.google-analytics.com/analytics.js") == "abort"
+    assert await outcome("https://cdn.ads.example.com/a.js") == "abort"
+    assert await outcome("http://intranet:8080/app.js") == "abort"
+    assert await outcome("https://example.com/app.js") == "continue"
+
+
+async def test_no_route_when_nothing_blocked():
+    page = FakePage()
+    await install_resource_blocking(page, [], block_trackers=False)
+    assert page.handler is None
+
+
+async def test_readiness_returns_when_condition_met():
+    page = FakePage(selector_delay=0.05)
+    request = URLRequest(url="http://example.com/", wait_time=5, wait_selector="#app", wait_network_idle=True)
+    started = asyncio.get_running_loop().time()
+    await wait_until_ready(page, request)
+    # 條件滿足即結束，不等滿 wait_time
+    assert asyncio.get_running_loop().time() - started < 1
+
+
+async def test_readiness_timeout_uses_current_content():
+    page = FakePage(selector_delay=10)
+    request = URLRequest(url="http://example.com/", wait_time=0, wait_selector="#never")
+    await wait_until_ready(page, request)
@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.scraper import DomainThrottle
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batch_streams_one_line_per_item(client, static_pages):
+    items = [{"url": f"{static_pages}/page/{n}", "mode": "http", "cache": "bypass"} for n in range(5)]
+    # 連不上的網站只影響自己那一行
+    items.append({"url": "http://127.0.0.1:1/page/1", "mode": "http", "cache": "bypass"})
+    response = await client.post("/scrape/batch", json={"items": items, "concurrency": 3})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == list(range(6))
+    by_index = {line["index"]: line for line in lines}
+    for n in range(5):
+        assert by_index[n]["result"]["title"].startswith(f"Benchmark article {n}")
+        assert by_index[n]["result"]["tier"] == "http"
+    assert by_index[5]["result"] is None
+    assert by_index[5]["error"].startswith("HTTP fetch failed")
+
+
+async def test_batch_validates_items(client):
+    response = await client.post("/scrape/batch", json={"items": []})
+    assert response.status_code == 422
+
+
+async def test_domain_throttle_limits_concurrency_and_spacing():
+    throttle = DomainThrottle(max_concurrent=2, min_interval=0.05)
+    loop = asyncio.get_running_loop()
+    starts = {"a": [], "b": []}
+    active = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0}
+
+    async def fetch(domain: str) -> None:
+        async with throttle.slot(domain):
+            starts[domain].append(loop.time())
+            active[domain] += 1
+            peak[domain] = max(peak[domain], active[domain])
+            await asyncio.sleep(0.02)
+            active[domain] -= 1
+
+    await asyncio.gather(*(fetch(domain) for domain in ("a", "b") for _ in range(4)))
+
+    for domain in ("a", "b"):
+        assert peak[domain] <= 2
+        gaps = [later - earlier for earlier, later in zip(starts[domain], starts[domain][1:])]
+        assert all(gap >= 0.045 for gap in gaps)
+    # 不同網域互不等待
+    assert abs(starts["a"][0] - starts["b"][0]) < 0.02
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import MemoryBackend
+from app.services import scraper
+from app.services.scrape_cache import ScrapeCache, make_cache_key, normalize_url
+
+pytestmark = pytest.mark.anyio
+
+
+class Renderer:
+    def __init__(self, status: int = 200, delay: float = 0.05):
+        self.status = status
+        self.delay = delay
+        self.calls = 0
+
+    async def render(self) -> dict:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"title": f"render {self.calls}", "content": "<html></html>", "status": self.status}
+
+
+def make_cache(**kwargs) -> ScrapeCache:
+    return ScrapeCache(ttl=60, directory=None, backend=MemoryBackend("scrape"), **kwargs)
+
+
+def test_normalize_url():
+    assert normalize_url("HTTP://Example.COM:80/a?b=2&a=1#frag") == "http://example.com/a?a=1&b=2"
+    assert normalize_url("https://example.com:8443") == "https://example.com:8443/"
+    assert make_cache_key("http://example.com/?b=1&a=2", {"x": 1}) == make_cache_key("http://EXAMPLE.com/?a=2&b=1", {"x": 1})
+
+
+async def test_concurrent_requests_render_once():
+    cache = make_cache()
+    renderer = Renderer()
+    results = await asyncio.gather(*(cache.fetch("k", renderer.render) for _ in range(5)))
+    assert renderer.calls == 1
+    assert {value["title"] for value, _ in results} == {"render 1"}
+    assert sorted(status for _, status in results) == ["COALESCED"] * 4 + ["MISS"]
+
+    assert await cache.fetch("k", renderer.render) == (results[0][0], "HIT")
+    assert cache.stats()["hits"] == 1
+
+
+async def test_cache_modes():
+    cache = make_cache()
+    renderer = Renderer(delay=0)
+    await cache.fetch("k", renderer.render)
+
+    value, status = await cache.fetch("k", renderer.render, mode="bypass")
+    assert status == "BYPASS" and value["title"] == "render 2"
+    assert (await cache.fetch("k", renderer.render))[0]["title"] == "render 1"
+
+    value, status = await cache.fetch("k", renderer.render, mode="refresh")
+    assert status == "REFRESH" and value["title"] == "render 3"
+    assert (await cache.fetch("k", renderer.render)) == (value, "HIT")
+
+
+async def test_failed_pages_are_not_cached():
+    cache = make_cache()
+    renderer = Renderer(status=500, delay=0)
+    cacheable = lambda value: value["status"] < 400
+    await cache.fetch("k", renderer.render, cacheable=cacheable)
+    _, status = await cache.fetch("k", renderer.render, cacheable=cacheable)
+    assert status == "MISS" and renderer.calls == 2
+
+
+async def test_disk_tier_survives_restart(tmp_path):
+    renderer = Renderer(delay=0)
+    await ScrapeCache(ttl=60, directory=str(tmp_path), backend=MemoryBackend("scrape")).fetch("k", renderer.render)
+    # 新的記憶體層（例如重新啟動後）從磁碟讀回
+    cache = ScrapeCache(ttl=60, directory=str(tmp_path), backend=MemoryBackend("scrape"))
+    assert (await cache.fetch("k", renderer.render))[1] == "HIT"
+    assert renderer.calls == 1
+
+
+async def test_scrape_endpoint_reports_cache_status(client, static_pages, monkeypatch):
+    monkeypatch.setattr(scraper, "scrape_cache", make_cache())
+    body = {"url": f"{static_pages}/page/7", "mode": "http"}
+    first = await client.post("/scrape", json=body)
+    assert first.status_code == 200 and first.headers["x-cache"] == "MISS"
+
+    # 輸出格式不影響快取鍵
+    second = await client.post("/scrape", json={**body, "output": "text"})
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json()["output"] == "text"
+    assert "Benchmark article 7" in first.json()["title"]
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import scrape_jobs as scrape_jobs_module
+from app.services.scrape_jobs import JobQueue, JobStore, ScrapeJobRequest
+
+pytestmark = pytest.mark.anyio
+
+
+def test_claim_is_atomic_across_stores(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first, second = JobStore(path), JobStore(path)
+    first.insert("job", 5, {"url": "http://example.com/"}, None, time.time())
+
+    assert first.claim("job") is not None
+    assert second.claim("job") is None
+    assert second.get("job")["status"] == "running"
+    first.close()
+    second.close()
+
+
+def test_expired_worker_cannot_overwrite_result(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.insert("job", 5, {"url": "http://example.com/"}, None, time.time())
+    expired = store.claim("job")
+    store.requeue_stale(time.time() + 1)
+    current = store.claim("job")
+
+    # lease 逾時的 worker 不可更新心跳或覆寫新 worker 的結果
+    assert store.heartbeat("job", expired) is False
+    assert store.finish("job", current, "succeeded", {"title": "new"}, None) is True
+    assert store.finish("job", expired, "failed", None, "late") is False
+    row = store.get("job")
+    assert row["status"] == "succeeded" and row["error"] is None
+    store.close()
+
+
+def test_requeue_only_expired_leases(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    now = time.time()
+    for job_id in ("alive", "dead"):
+        store.insert(job_id, 5, {"url": "http://example.com/"}, None, now)
+        store.claim(job_id)
+    store._conn.execute("UPDATE scrape_jobs SET heartbeat_at = ? WHERE id = 'dead'", (now - 600,))
+    store._conn.commit()
+
+    # 心跳仍在更新的工作不會被重新排隊
+    stale = store.requeue_stale(now - 120)
+    assert [row["id"] for row in stale] == ["dead"]
+    assert [row["id"] for row in store.pending()] == ["dead"]
+    assert store.get("alive")["status"] == "running"
+    store.close()
+
+
+async def test_two_queues_run_job_once(tmp_path, static_pages, monkeypatch):
+    calls = []
+    original = scrape_jobs_module.cached_scrape
+
+    async def counting_scrape(request):
+        calls.append(str(request.url))
+        return await original(request)
+
+    monkeypatch.setattr(scrape_jobs_module, "cached_scrape", counting_scrape)
+    path = str(tmp_path / "jobs.sqlite3")
+    queues = [JobQueue(db_path=path, workers=2, lease=30) for _ in range(2)]
+    for queue in queues:
+        await queue.start()
+
+    try:
+        request = ScrapeJobRequest(url=f"{static_pages}/page/1", mode="http", cache="bypass")
+        job = await queues[0].submit(request)
+        # 模擬另一個 worker 程序也看到同一個工作
+        queues[1]._enqueue(job.id, job.priority)
+
+        for _ in range(100):
+            result = await queues[1].get(job.id)
+            if result.status in ("succeeded", "failed"):
+                break
+            await asyncio.sleep(0.05)
+        await asyncio.gather(*(queue._queue.join() for queue in queues))
+
+        assert result.status == "succeeded", result.error
+        assert result.result.status == 200
+        assert calls == [f"{static_pages}/page/1"]
+    finally:
+        for queue in queues:
+            await queue.stop()
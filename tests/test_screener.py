@@ -0,0 +1,55 @@
+import pytest
+
+from app.services.screener import Screener
+
+pytestmark = pytest.mark.anyio
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "2330.TW", "2317.TW"]
+
+
+async def test_repeated_refresh_hits_caches(fake_finnhub):
+    screener = Screener()
+    screener.set_universe(SYMBOLS)
+    # 第一輪取得整個區間，之後只補未定案的部分
+    await screener.refresh_all()
+    await screener.refresh_all()
+    warm = fake_finnhub.state.request_count
+    assert screener.stats()["filled"] == len(SYMBOLS)
+
+    # K 線區間與定案界線對齊到日界，同一天內再次更新都由快取回應
+    await screener.refresh_all()
+    await screener.refresh_all()
+    assert fake_finnhub.state.request_count == warm
+    assert screener.cycles == 4
+
+
+async def test_query_filters_and_sorts(fake_finnhub):
+    screener = Screener()
+    screener.set_universe(SYMBOLS)
+    await screener.refresh_all()
+
+    result = screener.query(market="TW", sort="symbol", descending=False)
+    assert result["total_matched"] == 2
+    assert [item["symbol"] for item in result["results"]] == ["2317.TW", "2330.TW"]
+
+    result = screener.query(sort="market_cap", limit=3)
+    caps = [item["market_cap"] for item in result["results"]]
+    assert len(caps) == 3 and caps == sorted(caps, reverse=True)
+
+    lowest = min(item["price"] for item in screener.query(limit=10)["results"])
+    result = screener.query(ranges={"price": (lowest + 0.01, None)})
+    assert result["total_matched"] == len(SYMBOLS) - 1
+
+
+async def test_screener_endpoint(client, fake_finnhub, monkeypatch):
+    screener = Screener()
+    screener.set_universe(SYMBOLS)
+    await screener.refresh_all()
+    monkeypatch.setattr("app.api.v1.endpoints.finance.screener", screener)
+
+    response = await client.get("/api/v1/finance/screener", params={"market": "US", "sort": "volume", "limit": 2})
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 2
+
+    response = await client.get("/api/v1/finance/screener", params={"sort": "bogus"})
+    assert response.status_code == 400
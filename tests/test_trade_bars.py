@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from app.services.trade_bars import BarRing, TradeAggregator
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeHub:
+    """記錄訂閱的假 hub"""
+
+    def __init__(self):
+        self.listeners = {}
+        self.subscribed = []
+
+    def add_listener(self, channel, callback) -> None:
+        self.listeners[channel] = callback
+
+    async def subscribe(self, client, channel: str, symbol: str) -> None:
+        client.subscriptions.add((channel, symbol))
+        self.subscribed.append(symbol)
+
+    async def unsubscribe(self, client, channel: str, symbol: str) -> None:
+        client.subscriptions.discard((channel, symbol))
+
+
+def add(ring: BarRing, *trades) -> None:
+    times, prices, volumes = (np.array(values) for values in zip(*trades))
+    ring.add_trades(times.astype(np.int64), prices.astype(np.float64), volumes.astype(np.float64))
+
+
+def test_ring_aggregates_ohlcv():
+    ring = BarRing(interval=60, capacity=10)
+    add(ring, (60, 10.0, 1), (75, 12.0, 2), (90, 9.0, 3), (119, 11.0, 4), (120, 11.5, 5))
+    bars = ring.window()
+    assert bars["t"].tolist() == [60, 120]
+    assert bars["o"].tolist() == [10.0, 11.5]
+    assert bars["h"].tolist() == [12.0, 11.5]
+    assert bars["l"].tolist() == [9.0, 11.5]
+    assert bars["c"].tolist() == [11.0, 11.5]
+    assert bars["v"].tolist() == [10.0, 5.0]
+
+    # 同一根 K 線的後續成交
+    add(ring, (150, 13.0, 1))
+    assert ring.window()["h"].tolist() == [12.0, 13.0]
+    assert ring.window()["c"].tolist() == [11.0, 13.0]
+
+
+def test_ring_overwrites_oldest_and_handles_late_trades():
+    ring = BarRing(interval=1, capacity=3)
+    add(ring, *((t, float(t), 1) for t in range(5)))
+    assert ring.window()["t"].tolist() == [2, 3, 4]
+
+    # 延遲送達的成交只更新仍在緩衝中的 K 線，收盤價不變
+    add(ring, (3, 100.0, 5))
+    bars = ring.window()
+    assert bars["h"].tolist() == [2.0, 100.0, 4.0]
+    assert bars["c"].tolist() == [2.0, 3.0, 4.0]
+    assert bars["v"].tolist() == [1.0, 6.0, 1.0]
+    add(ring, (0, 1.0, 1))
+    assert ring.late_dropped == 1
+
+    assert ring.window(start=3)["t"].tolist() == [3, 4]
+    assert ring.window(end=3, limit=1)["t"].tolist() == [3]
+
+
+def test_aggregator_groups_symbols_and_evicts():
+    aggregator = TradeAggregator(hub=FakeHub(), max_symbols=2, capacities={"1s": 10, "1m": 10, "5m": 10})
+    aggregator.on_trades([
+        {"s": "AAPL", "p": 190.0, "t": 61_500, "v": 10},
+        {"s": "AAPL", "p": 189.0, "t": 60_200, "v": 5},
+        {"s": "MSFT", "p": 400.0, "t": 60_000, "v": 1},
+        {"p": 1.0},
+    ])
+    bars = aggregator.bars("AAPL", "1m")
+    # 同一批成交依時間排序後才聚合
+    assert bars["o"].tolist() == [189.0] and bars["c"].tolist() == [190.0]
+    assert aggregator.bars("AAPL", "1s")["t"].tolist() == [60, 61]
+    assert aggregator.trades == 3
+
+    aggregator.on_trades([{"s": "NVDA", "p": 100.0, "t": 60_000, "v": 1}])
+    assert aggregator.bars("AAPL", "1m") is None
+    assert aggregator.stats()["symbols"] == 2
+
+
+async def test_bars_endpoint_is_read_only(client, monkeypatch):
+    hub = FakeHub()
+    aggregator = TradeAggregator(hub=hub, max_symbols=1)
+    monkeypatch.setattr("app.api.v1.endpoints.finance.trade_bars", aggregator)
+
+    response = await client.get("/api/v1/finance/stock/AAPL/bars")
+    assert response.status_code == 200
+    assert response.json()["tracking"] is False and response.json()["t"] == []
+    # GET 不會向上游訂閱
+    assert hub.subscribed == [] and aggregator.tracked == set()
+
+    response = await client.post("/api/v1/finance/stock/AAPL/bars/track")
+    assert response.json() == {"symbol": "AAPL", "tracking": True}
+    assert hub.subscribed == ["AAPL"]
+    assert (await client.get("/api/v1/finance/stock/AAPL/bars")).json()["tracking"] is True
+    assert (await client.post("/api/v1/finance/stock/MSFT/bars/track")).status_code == 503
+
+    assert (await client.delete("/api/v1/finance/stock/AAPL/bars/track")).status_code == 200
+    assert (await client.delete("/api/v1/finance/stock/AAPL/bars/track")).status_code == 404
+    assert (await client.get("/api/v1/finance/stock/AAPL/bars", params={"interval": "2m"})).status_code == 400
@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.ws_hub import ClientSubscriber, WebSocketHub
+from tools.fake_finnhub_ws import FakeFinnhubWebSocket
+
+pytestmark = pytest.mark.anyio
+
+
+class Client:
+    """記錄收到的訊息，可設定每次送出的延遲（模擬慢的客戶端）"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.messages = []
+
+    async def send(self, message: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.messages.append(json.loads(message))
+
+    def symbols(self) -> set:
+        return {trade["s"] for message in self.messages for trade in message["data"]}
+
+
+@pytest.fixture
+async def upstream():
+    server = FakeFinnhubWebSocket(trade_interval_ms=10)
+    port = await server.start()
+    hub = WebSocketHub(url=f"ws://127.0.0.1:{port}", token="test")
+    yield server, hub
+    await hub.stop()
+    await server.stop()
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_subscriber_policies():
+    coalesce = ClientSubscriber(Client().send, max_queue=2, policy="coalesce")
+    for price in (1, 2, 3):
+        coalesce.put(f"AAPL {price}", ("trade", "AAPL"))
+    coalesce.put("MSFT 1", ("trade", "MSFT"))
+    coalesce.put("news", None)
+    # 同一股票只保留最新的成交，超過上限時丟棄最舊的
+    assert list(coalesce._pending.values()) == ["MSFT 1", "news"]
+    assert coalesce.coalesced == 2 and coalesce.dropped == 1
+
+    newest = ClientSubscriber(Client().send, max_queue=2, policy="drop_newest")
+    for index in range(4):
+        newest.put(str(index), ("trade", "AAPL"))
+    assert list(newest._pending.values()) == ["0", "1"] and newest.dropped == 2
+
+    with pytest.raises(ValueError):
+        ClientSubscriber(Client().send, policy="block")
+
+
+async def test_one_upstream_subscription_per_symbol(upstream):
+    server, hub = upstream
+    clients = [Client(), Client(), Client()]
+    subscribers = [ClientSubscriber(client.send) for client in clients]
+    for subscriber in subscribers:
+        hub.register(subscriber)
+    await hub.subscribe(subscribers[0], "trade", "AAPL")
+    await hub.subscribe(subscribers[1], "trade", "AAPL")
+    await hub.subscribe(subscribers[2], "trade", "MSFT")
+
+    await wait_for(lambda: all(client.messages for client in clients))
+    assert server.connections == 1
+    assert sorted(command["symbol"] for command in server.commands if command["type"] == "subscribe") == ["AAPL", "MSFT"]
+    # 每個客戶端只收到自己訂閱的股票
+    await wait_for(lambda: clients[2].symbols())
+    assert clients[0].symbols() == clients[1].symbols() == {"AAPL"}
+    assert clients[2].symbols() == {"MSFT"}
+
+    # 最後一個訂閱者離開時才向上游取消
+    await hub.unregister(subscribers[0])
+    assert not [command for command in server.commands if command["type"] == "unsubscribe"]
+    await hub.unregister(subscribers[1])
+    await wait_for(lambda: any(command["type"] == "unsubscribe" for command in server.commands))
+    assert hub.stats()["subscriptions"] == 1 and hub.stats()["clients"] == 1
+
+
+async def test_slow_client_does_not_block_others(upstream):
+    _, hub = upstream
+    slow, fast = Client(delay=0.5), Client()
+    slow_subscriber = ClientSubscriber(slow.send, max_queue=4)
+    fast_subscriber = ClientSubscriber(fast.send)
+    for subscriber in (slow_subscriber, fast_subscriber):
+        hub.register(subscriber)
+        await hub.subscribe(subscriber, "trade", "NVDA")
+
+    await wait_for(lambda: len(fast.messages) >= 20)
+    assert len(slow.messages) <= 1
+    # 慢的客戶端只保留最新的成交
+    assert slow_subscriber.coalesced > 0 and len(slow_subscriber._pending) <= 1
+
+
+async def test_reconnect_resubscribes(upstream):
+    server, hub = upstream
+    client = Client()
+    subscriber = ClientSubscriber(client.send)
+    hub.register(subscriber)
+    await hub.subscribe(subscriber, "trade", "AAPL")
+    await wait_for(lambda: client.messages)
+
+    await hub._upstream.close()
+    await wait_for(lambda: server.connections == 2, timeout=5)
+    count = len(client.messages)
+    await wait_for(lambda: len(client.messages) > count)
+    assert [command["symbol"] for command in server.commands] == ["AAPL", "AAPL"]
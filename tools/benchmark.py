@@ -0,0 +1,463 @@
+"""
+可重現的吞吐量與延遲測試
+
+啟動假 Finnhub（HTTP 與 WebSocket）、本機靜態頁面伺服器與 app（uvicorn 子程序），
+依序以固定併發對各情境送出請求，回報 RPS、p50/p95/p99 延遲與 app 程序（含 worker）的 CPU、記憶體，
+結果存成 JSON，可用 --compare 與之前的結果比較。全部在本機執行，不需要網路。
+
+使用方式：
+    python -m tools.benchmark --duration 10 --concurrency 32
+    python -m tools.benchmark --scenarios finance,cron_check --workers 2 --output bench.json
+    python -m tools.benchmark --env LOG_QUEUE_ENABLED=true --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "TSLA", "AMZN", "GOOGL", "META", "2330.TW", "2317.TW", "2454.TW"]
+CRON_EXPRESSIONS = ["*/5 * * * *", "0 9 * * 1-5", "30 8,12,18 * * *", "0 0 1 * *", "15 14 1 * *", "0 22 * * 1-5"]
+
+# (method, path, params, json body)
+RequestSpec = Tuple[str, str, Optional[Dict[str, Any]], Optional[Any]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    group: str
+    build: Callable[[int, "BenchContext"], RequestSpec]
+    description: str = ""
+
+
+@dataclass
+class BenchContext:
+    static_url: str
+    today: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d"))
+    month_ago: str = field(default_factory=lambda: (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"))
+
+
+def _symbol(i: int) -> str:
+    return SYMBOLS[i % len(SYMBOLS)]
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("finance_stock", "finance",
+             lambda i, ctx: ("GET", f"/api/v1/finance/stock/{_symbol(i)}", None, None),
+             "Quote + profile + news per symbol (cached upstream calls)"),
+    Scenario("finance_history", "finance",
+             lambda i, ctx: ("GET", f"/api/v1/finance/stock/{_symbol(i)}/history",
+                             {"from_date": ctx.month_ago, "to_date": ctx.today}, None),
+             "Daily candles from the candle store"),
+    Scenario("finance_indicators", "finance",
+             lambda i, ctx: ("GET", f"/api/v1/finance/stock/{_symbol(i)}/indicators",
+                             {"from_date": ctx.month_ago, "to_date": ctx.today}, None),
+             "Default indicator set over a month of daily candles"),
+    Scenario("finance_news", "finance",
+             lambda i, ctx: ("GET", "/api/v1/finance/finnhub/news", {"page": i % 5 + 1}, None),
+             "Paged general news from the news index"),
+    Scenario("finance_screener", "finance",
+             lambda i, ctx: ("GET", "/api/v1/finance/screener",
+                             {"market": ("us", "tw")[i % 2], "sort": "volume", "limit": 10}, None),
+             "Screener snapshot query"),
+    Scenario("cron_check", "cron",
+             lambda i, ctx: ("GET", "/api/v1/cron/check",
+                             {"cron": CRON_EXPRESSIONS[i % len(CRON_EXPRESSIONS)],
+                              "datetime_str": f"2024-03-{i % 28 + 1:02d}T{i % 24:02d}:{i % 60:02d}:00"}, None),
+             "Single cron match"),
+    Scenario("cron_batch", "cron",
+             lambda i, ctx: ("POST", "/api/v1/cron/check/batch", None, {
+                 "datetime_str": f"2024-03-{i % 28 + 1:02d}T09:00:00",
+                 "items": [{"cron": CRON_EXPRESSIONS[j % len(CRON_EXPRESSIONS)], "id": str(j)} for j in range(100)],
+             }),
+             "100 cron expressions against one datetime"),
+    Scenario("cron_next", "cron",
+             lambda i, ctx: ("GET", "/api/v1/cron/next",
+                             {"cron": CRON_EXPRESSIONS[i % len(CRON_EXPRESSIONS)], "count": 10,
+                              "datetime_str": "2024-03-01T00:00:00"}, None),
+             "Next 10 fire times"),
+    Scenario("scrape_http", "scrape",
+             lambda i, ctx: ("POST", "/scrape", None,
+                             {"url": f"{ctx.static_url}/page/{i}", "mode": "http", "cache": "bypass"}),
+             "Plain HTTP tier, cache bypassed"),
+    Scenario("scrape_text", "scrape",
+             lambda i, ctx: ("POST", "/scrape", None,
+                             {"url": f"{ctx.static_url}/page/{i % 50}", "mode": "http", "output": "text"}),
+             "Cached pages with main text extraction"),
+    Scenario("scrape_cached", "scrape",
+             lambda i, ctx: ("POST", "/scrape", None,
+                             {"url": f"{ctx.static_url}/page/{i % 50}", "mode": "http"}),
+             "Result cache hits"),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """線性內插的百分位數（sorted_values 需已排序）"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+class ProcessSampler:
+    """
+    讀取 /proc 取得程序樹（uvicorn 主程序與 worker）的 CPU 時間與 RSS，只支援 Linux
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK")
+
+    def _tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                stat = Path(f"/proc/{entry}/stat").read_text()
+            except OSError:
+                continue
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(entry))
+        pids, stack = [], [self.pid]
+        while stack:
+            pid = stack.pop()
+            pids.append(pid)
+            stack.extend(children.get(pid, []))
+        return pids
+
+    def sample(self) -> Tuple[float, int]:
+        """Returns: (累計 CPU 秒數, RSS bytes)"""
+        cpu, rss = 0.0, 0
+        for pid in self._tree():
+            try:
+                fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+                cpu += (int(fields[11]) + int(fields[12])) / self.ticks
+                for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) * 1024
+                        break
+            except (OSError, IndexError, ValueError):
+                continue
+        return cpu, rss
+
+
+class Stack:
+    """假上游與 app 子程序"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.processes: List[subprocess.Popen] = []
+        self.tempdir = tempfile.TemporaryDirectory(prefix="n8n-api-bench-")
+        self.finnhub_port = _free_port()
+        self.ws_port = _free_port()
+        self.static_port = _free_port()
+        self.app_port = _free_port()
+        self.app: Optional[subprocess.Popen] = None
+
+    @property
+    def app_url(self) -> str:
+        return self.args.app_url or f"http://127.0.0.1:{self.app_port}"
+
+    @property
+    def static_url(self) -> str:
+        return f"http://127.0.0.1:{self.static_port}"
+
+    def _spawn(self, argv: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+        process = subprocess.Popen(
+            [sys.executable, *argv], cwd=ROOT, env={**os.environ, **(env or {})},
+            stdout=subprocess.DEVNULL if not self.args.verbose else None,
+            stderr=subprocess.DEVNULL if not self.args.verbose else None,
+        )
+        self.processes.append(process)
+        return process
+
+    def _app_env(self) -> Dict[str, str]:
+        data = Path(self.tempdir.name)
+        env = {
+            "FINNHUB_API_KEY": "benchmark",
+            "FINNHUB_API_URL": f"http://127.0.0.1:{self.finnhub_port}/api/v1",
+            "FINNHUB_WS_URL": f"ws://127.0.0.1:{self.ws_port}",
+            "FINNHUB_RATE_LIMIT_PER_MINUTE": str(self.args.finnhub_rate_limit),
+            "WEB_CONCURRENCY": str(self.args.workers),
+            "CANDLE_STORE_PATH": str(data / "candles.sqlite3"),
+            "SCRAPE_JOB_DB": str(data / "scrape_jobs.sqlite3"),
+        }
+        for item in self.args.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+        return env
+
+    async def start(self) -> None:
+        self._spawn(["-m", "tools.static_pages", "--port", str(self.static_port),
+                     "--latency-ms", str(self.args.static_latency_ms)])
+        if self.args.app_url:
+            await self._wait_ready(self.static_url + "/")
+            return
+        self._spawn(["-m", "tools.fake_finnhub", "--port", str(self.finnhub_port),
+                     "--latency-ms", str(self.args.finnhub_latency_ms),
+                     "--rate-limit", str(self.args.finnhub_rate_limit)])
+        self._spawn(["-m", "tools.fake_finnhub_ws", "--port", str(self.ws_port),
+                     "--trade-interval-ms", str(self.args.ws_trade_interval_ms)])
+        await self._wait_ready(f"http://127.0.0.1:{self.finnhub_port}/api/v1/quote?symbol=AAPL")
+        await self._wait_ready(self.static_url + "/")
+        self.app = self._spawn(
+            ["-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(self.app_port),
+             "--workers", str(self.args.workers), "--log-level", "warning"],
+            self._app_env(),
+        )
+        await self._wait_ready(self.app_url + "/", timeout=self.args.startup_timeout)
+
+    async def _wait_ready(self, url: str, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while True:
+                try:
+                    if (await client.get(url, timeout=2)).status_code < 500:
+                        return
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+                await asyncio.sleep(0.2)
+
+    def stop(self) -> None:
+        for process in reversed(self.processes):
+            process.terminate()
+        for process in reversed(self.processes):
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.tempdir.cleanup()
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    ctx: BenchContext,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    sampler: Optional[ProcessSampler],
+) -> Dict[str, Any]:
+    """以 concurrency 個並行迴圈送出請求 duration 秒，warmup 期間的請求不計入結果"""
+    counter = iter(range(10 ** 12))
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    recording = False
+    stop_at = 0.0
+
+    async def worker() -> None:
+        while time.perf_counter() < stop_at:
+            method, path, params, body = scenario.build(next(counter), ctx)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body)
+                await response.aread()
+                key = str(response.status_code)
+            except httpx.HTTPError as e:
+                key = None
+                if recording:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            elapsed = time.perf_counter() - started
+            if recording and key is not None:
+                latencies.append(elapsed)
+                statuses[key] = statuses.get(key, 0) + 1
+
+    if warmup > 0:
+        stop_at = time.perf_counter() + warmup
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    peak_rss = 0
+    samples: List[Tuple[float, int]] = []
+
+    async def sample_resources() -> None:
+        nonlocal peak_rss
+        while True:
+            cpu, rss = sampler.sample()
+            samples.append((cpu, rss))
+            peak_rss = max(peak_rss, rss)
+            await asyncio.sleep(0.25)
+
+    recording = True
+    sampling = asyncio.create_task(sample_resources()) if sampler else None
+    started = time.perf_counter()
+    cpu_before = sampler.sample()[0] if sampler else 0.0
+    stop_at = started + duration
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cpu_after, rss_after = sampler.sample() if sampler else (0.0, 0)
+    if sampling:
+        sampling.cancel()
+        await asyncio.gather(sampling, return_exceptions=True)
+
+    latencies.sort()
+    completed = len(latencies)
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "name": scenario.name,
+        "group": scenario.group,
+        "description": scenario.description,
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 3),
+        "requests": completed,
+        "errors": sum(errors.values()),
+        "error_types": errors,
+        "status_counts": statuses,
+        "success_ratio": round(ok / completed, 4) if completed else 0.0,
+        "rps": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / completed * 1000, 3) if completed else 0.0,
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if completed else 0.0,
+        },
+        "cpu_percent": round((cpu_after - cpu_before) / elapsed * 100, 1) if sampler and elapsed else None,
+        "rss_mb": {
+            "end": round(rss_after / 2 ** 20, 1),
+            "peak": round(max(peak_rss, rss_after) / 2 ** 20, 1),
+        } if sampler else None,
+    }
+
+
+def select_scenarios(selection: Optional[str]) -> List[Scenario]:
+    """selection 為逗號分隔的情境名稱或群組（finance、cron、scrape），未指定時全部執行"""
+    if not selection:
+        return SCENARIOS
+    wanted = {name.strip() for name in selection.split(",") if name.strip()}
+    selected = [s for s in SCENARIOS if s.name in wanted or s.group in wanted]
+    unknown = wanted - {s.name for s in SCENARIOS} - {s.group for s in SCENARIOS}
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    return selected
+
+
+def _format_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[str]:
+    header = f"{'scenario':<20} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ok %':>6} {'cpu %':>7} {'rss MB':>8}"
+    if baseline is not None:
+        header += f" {'rps Δ':>8} {'p99 Δ':>8}"
+    yield header
+    for result in results:
+        latency = result["latency_ms"]
+        line = (
+            f"{result['name']:<20} {result['rps']:>9.1f} {latency['p50']:>9.2f} {latency['p95']:>9.2f} "
+            f"{latency['p99']:>9.2f} {result['success_ratio'] * 100:>6.1f} "
+            f"{result['cpu_percent'] if result['cpu_percent'] is not None else '-':>7} "
+            f"{result['rss_mb']['peak'] if result['rss_mb'] else '-':>8}"
+        )
+        previous = (baseline or {}).get(result["name"])
+        if previous:
+            rps_delta = (result["rps"] / previous["rps"] - 1) * 100 if previous["rps"] else 0.0
+            p99_delta = (latency["p99"] / previous["latency_ms"]["p99"] - 1) * 100 if previous["latency_ms"]["p99"] else 0.0
+            line += f" {rps_delta:>+7.1f}% {p99_delta:>+7.1f}%"
+        yield line
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    scenarios = select_scenarios(args.scenarios)
+    stack = Stack(args)
+    try:
+        await stack.start()
+        sampler = ProcessSampler(stack.app.pid) if stack.app is not None and Path("/proc").is_dir() else None
+        ctx = BenchContext(static_url=stack.static_url)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        results = []
+        async with httpx.AsyncClient(base_url=stack.app_url, limits=limits, timeout=args.timeout) as client:
+            idle_rss = sampler.sample()[1] if sampler else 0
+            for scenario in scenarios:
+                result = await run_scenario(
+                    client, scenario, ctx, args.concurrency, args.duration, args.warmup, sampler
+                )
+                results.append(result)
+                print(f"  {scenario.name}: {result['rps']:.1f} rps, p99 {result['latency_ms']['p99']:.2f} ms",
+                      file=sys.stderr)
+    finally:
+        stack.stop()
+
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "workers": args.workers,
+            "finnhub_latency_ms": args.finnhub_latency_ms,
+            "finnhub_rate_limit": args.finnhub_rate_limit,
+            "static_latency_ms": args.static_latency_ms,
+            "env": args.env,
+            "app_url": args.app_url,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "idle_rss_mb": round(idle_rss / 2 ** 20, 1) if sampler else None,
+        "scenarios": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load and latency benchmark for the API")
+    parser.add_argument("--scenarios", help="逗號分隔的情境名稱或群組（finance, cron, scrape），預設全部")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="每個情境的量測秒數")
+    parser.add_argument("--warmup", type=float, default=2.0, help="每個情境量測前的暖身秒數")
+    parser.add_argument("--timeout", type=float, default=30.0, help="單一請求逾時（秒）")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker 數量")
+    parser.add_argument("--finnhub-latency-ms", type=float, default=20.0)
+    parser.add_argument("--finnhub-rate-limit", type=int, default=0, help="假 Finnhub 與 app 的每分鐘配額（0 表示不限制）")
+    parser.add_argument("--ws-trade-interval-ms", type=float, default=100.0)
+    parser.add_argument("--static-latency-ms", type=float, default=10.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="傳給 app 的額外環境變數")
+    parser.add_argument("--app-url", help="測試已啟動的 app（不啟動 app 與假 Finnhub，也不量測 CPU / 記憶體）")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="結果 JSON 路徑，預設為 benchmark-<時間>.json")
+    parser.add_argument("--compare", help="與之前的結果 JSON 比較")
+    parser.add_argument("--list", action="store_true", help="列出情境後結束")
+    parser.add_argument("--verbose", action="store_true", help="顯示子程序的輸出")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for scenario in SCENARIOS:
+            print(f"{scenario.name:<20} {scenario.group:<8} {scenario.description}")
+        return
+
+    report = asyncio.run(run(args))
+    output = Path(args.output or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    baseline = None
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        baseline = {result["name"]: result for result in previous["scenarios"]}
+    print("\n".join(_format_table(report["scenarios"], baseline)))
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+本機的假 Finnhub 伺服器，用於測試與壓力測試
+
+回傳以股票代碼為種子產生的固定資料，可模擬上游延遲與每分鐘請求上限。
+
+使用方式：
+    python -m tools.fake_finnhub --port 9001 --latency-ms 50 --rate-limit 60
+    FINNHUB_API_URL=http://127.0.0.1:9001/api/v1 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Optional
+
+from fastapi import APIRouter, FastAPI, Query, Request
+from fastapi.responses import JSONResponse
+
+# 假新聞會提及的公司，讓台股新聞過濾有資料可比對
+_NEWS_COMPANIES = [
+    ("AAPL", "Apple"), ("MSFT", "Microsoft"), ("NVDA", "Nvidia"), ("TSLA", "Tesla"),
+    ("2330", "TSMC"), ("2317", "Hon Hai"), ("2454", "MediaTek"), ("2412", "Chunghwa Telecom"),
+]
+_RESOLUTION_SECONDS = {"1": 60, "5": 300, "15": 900, "30": 1800, "60": 3600, "D": 86400, "W": 604800, "M": 2592000}
+
+
+def _rng(*parts: object) -> random.Random:
+    seed = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+
+def _base_price(symbol: str) -> float:
+    return round(_rng(symbol, "price").uniform(20, 900), 2)
+
+
+def _news_item(news_id: int, now: int, category: str = "general") -> Dict:
+    rng = _rng("news", news_id)
+    symbol, company = _NEWS_COMPANIES[news_id % len(_NEWS_COMPANIES)]
+    return {
+        "id": news_id,
+        "category": category,
+        "datetime": now - (10_000 - news_id % 10_000) * 60,
+        "headline": f"{company} ({symbol}) shares move {rng.uniform(-5, 5):.2f}% on market news",
+        "summary": f"Analysts comment on {company} after trading session #{news_id}.",
+        "source": rng.choice(["Reuters", "Bloomberg", "CNBC", "MarketWatch"]),
+        "url": f"https://news.example.com/{news_id}",
+        "image": "",
+        "related": symbol,
+    }
+
+
+class _RateLimiter:
+    """滑動視窗的每分鐘請求上限"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._calls: Deque[float] = deque()
+
+    def allow(self) -> bool:
+        if self.per_minute <= 0:
+            return True
+        now = time.monotonic()
+        while self._calls and now - self._calls[0] >= 60:
+            self._calls.popleft()
+        if len(self._calls) >= self.per_minute:
+            return False
+        self._calls.append(now)
+        return True
+
+
+def create_app(latency_ms: float = 0.0, rate_limit: int = 0, news_count: int = 200) -> FastAPI:
+    """
+    建立假 Finnhub app
+
+    Args:
+        latency_ms: 每個請求的模擬延遲（毫秒）
+        rate_limit: 每分鐘請求上限，超過時回傳 429（0 表示不限制）
+        news_count: general_news 的新聞數量
+    """
+    app = FastAPI(title="Fake Finnhub")
+    router = APIRouter()
+    limiter = _RateLimiter(rate_limit)
+    app.state.request_count = 0
+    app.state.news_count = news_count
+
+    @app.middleware("http")
+    async def simulate_upstream(request: Request, call_next):
+        app.state.request_count += 1
+        if not limiter.allow():
+            return JSONResponse({"error": "API limit reached. Please try again later."}, status_code=429)
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+        return await call_next(request)
+
+    @router.get("/quote")
+    async def quote(symbol: str):
+        rng = _rng(symbol, "quote", int(time.time()) // 5)
+        base = _base_price(symbol)
+        current = round(base * rng.uniform(0.97, 1.03), 2)
+        return {
+            "c": current,
+            "d": round(current - base, 2),
+            "dp": round((current - base) / base * 100, 4),
+            "h": round(max(current, base) * 1.01, 2),
+            "l": round(min(current, base) * 0.99, 2),
+            "o": base,
+            "pc": base,
+            "t": int(time.time()),
+        }
+
+    @router.get("/stock/profile2")
+    async def profile2(symbol: str):
+        rng = _rng(symbol, "profile")
+        return {
+            "country": "TW" if symbol.endswith(".TW") else "US",
+            "currency": "TWD" if symbol.endswith(".TW") else "USD",
+            "exchange": "TAIWAN STOCK EXCHANGE" if symbol.endswith(".TW") else "NASDAQ NMS - GLOBAL MARKET",
+            "finnhubIndustry": rng.choice(["Technology", "Semiconductors", "Banking", "Retail", "Energy", "Media"]),
+            "ipo": "1990-01-01",
+            "marketCapitalization": round(rng.uniform(1_000, 3_000_000), 2),
+            "name": f"{symbol} Corp",
+            "shareOutstanding": round(rng.uniform(100, 20_000), 2),
+            "ticker": symbol,
+            "weburl": f"https://{symbol.lower()}.example.com",
+        }
+
+    @router.get("/company-news")
+    async def company_news(symbol: str, _from: str = Query(..., alias="from"), to: str = Query(...)):
+        start = datetime.strptime(_from, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        items = []
+        for day in range(7):
+            ts = int((start + timedelta(days=day, hours=14)).timestamp())
+            items.append({
+                "id": int(_rng(symbol, "news", day).random() * 1e9),
+                "category": "company",
+                "datetime": ts,
+                "headline": f"{symbol} daily update {day}",
+                "summary": f"News about {symbol}.",
+                "source": "Fake Wire",
+                "url": f"https://news.example.com/{symbol}/{day}",
+                "image": "",
+                "related": symbol,
+            })
+        return items
+
+    @router.get("/stock/candle")
+    async def candle(symbol: str, resolution: str, _from: int = Query(..., alias="from"), to: int = Query(...)):
+        step = _RESOLUTION_SECONDS.get(resolution)
+        if step is None or to < _from:
+            return {"s": "no_data"}
+        t: List[int] = []
+        o: List[float] = []
+        h: List[float] = []
+        l: List[float] = []
+        c: List[float] = []
+        v: List[int] = []
+        start = _from - _from % step
+        base = _base_price(symbol)
+        for ts in range(start, to + 1, step):
+            if step >= 86400 and resolution == "D" and datetime.fromtimestamp(ts, timezone.utc).weekday() >= 5:
+                continue
+            rng = _rng(symbol, resolution, ts)
+            open_ = base * (1 + rng.uniform(-0.2, 0.2))
+            close = open_ * (1 + rng.uniform(-0.03, 0.03))
+            t.append(ts)
+            o.append(round(open_, 2))
+            c.append(round(close, 2))
+            h.append(round(max(open_, close) * (1 + rng.uniform(0, 0.02)), 2))
+            l.append(round(min(open_, close) * (1 - rng.uniform(0, 0.02)), 2))
+            v.append(rng.randint(10_000, 5_000_000))
+        if not t:
+            return {"s": "no_data"}
+        return {"s": "ok", "t": t, "o": o, "h": h, "l": l, "c": c, "v": v}
+
+    @router.get("/news")
+    async def general_news(category: str = "general", minId: int = 0):
+        now = int(time.time())
+        # 新聞 ID 從 1 到 news_count，依時間由新到舊排列
+        return [
+            _news_item(news_id, now, category)
+            for news_id in range(app.state.news_count, 0, -1)
+            if news_id > minId
+        ]
+
+    app.include_router(router, prefix="/api/v1")
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Finnhub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="每分鐘請求上限（0 表示不限制）")
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(args.latency_ms, args.rate_limit), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+本機的假 Finnhub WebSocket 伺服器，用於測試與壓力測試
+
+支援 subscribe / unsubscribe / subscribe-news / unsubscribe-news，依訂閱定期推送成交與新聞，
+並定期送出 ping。成交價格以股票代碼為種子隨機漫步。
+
+使用方式：
+    python -m tools.fake_finnhub_ws --port 9002 --trade-interval-ms 100
+    FINNHUB_WS_URL=ws://127.0.0.1:9002 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import websockets
+
+
+def _base_price(symbol: str) -> float:
+    seed = hashlib.sha256(f"{symbol}|price".encode("utf-8")).hexdigest()
+    return round(random.Random(int(seed[:16], 16)).uniform(20, 900), 2)
+
+
+class FakeFinnhubWebSocket:
+    """
+    Args:
+        trade_interval_ms: 每個訂閱股票推送成交的間隔
+        trades_per_message: 每則訊息包含的成交筆數
+        news_interval_ms: 推送新聞的間隔（0 表示不推送）
+        ping_interval_ms: 送出 ping 的間隔（0 表示不送）
+    """
+
+    def __init__(
+        self,
+        trade_interval_ms: float = 100.0,
+        trades_per_message: int = 1,
+        news_interval_ms: float = 0.0,
+        ping_interval_ms: float = 0.0,
+    ):
+        self.trade_interval = trade_interval_ms / 1000
+        self.trades_per_message = max(1, trades_per_message)
+        self.news_interval = news_interval_ms / 1000
+        self.ping_interval = ping_interval_ms / 1000
+        self.connections = 0
+        self.commands: List[Dict[str, Any]] = []
+        self.sent_messages = 0
+        self._prices: Dict[str, float] = {}
+        self._news_ids = itertools.count(1)
+        self._server: Optional[Any] = None
+
+    def _trades(self, symbol: str) -> List[Dict[str, Any]]:
+        price = self._prices.setdefault(symbol, _base_price(symbol))
+        now = int(time.time() * 1000)
+        trades = []
+        for _ in range(self.trades_per_message):
+            price = max(0.01, round(price * (1 + random.gauss(0, 0.0005)), 2))
+            trades.append({"s": symbol, "p": price, "t": now, "v": random.randint(1, 500), "c": None})
+        self._prices[symbol] = price
+        return trades
+
+    def _news(self, symbol: str) -> Dict[str, Any]:
+        news_id = next(self._news_ids)
+        return {
+            "id": news_id,
+            "category": "company",
+            "datetime": int(time.time()),
+            "headline": f"{symbol} fake headline #{news_id}",
+            "summary": "",
+            "source": "Fake",
+            "url": f"https://news.example.com/ws/{news_id}",
+            "image": "",
+            "related": symbol,
+        }
+
+    async def _send(self, ws: Any, message: Dict[str, Any]) -> None:
+        await ws.send(json.dumps(message))
+        self.sent_messages += 1
+
+    async def _publish(self, ws: Any, trades: Set[str], news: Set[str]) -> None:
+        last_news = last_ping = time.monotonic()
+        while True:
+            await asyncio.sleep(self.trade_interval)
+            now = time.monotonic()
+            if trades:
+                data = [trade for symbol in sorted(trades) for trade in self._trades(symbol)]
+                await self._send(ws, {"type": "trade", "data": data})
+            if news and self.news_interval and now - last_news >= self.news_interval:
+                last_news = now
+                await self._send(ws, {"type": "news", "data": [self._news(symbol) for symbol in sorted(news)]})
+            if self.ping_interval and now - last_ping >= self.ping_interval:
+                last_ping = now
+                await self._send(ws, {"type": "ping"})
+
+    async def handler(self, ws: Any) -> None:
+        self.connections += 1
+        trades: Set[str] = set()
+        news: Set[str] = set()
+        publisher = asyncio.create_task(self._publish(ws, trades, news))
+        try:
+            async for raw in ws:
+                command = json.loads(raw)
+                self.commands.append(command)
+                target = news if command.get("type", "").endswith("-news") else trades
+                if command.get("type", "").startswith("subscribe"):
+                    target.add(command.get("symbol"))
+                else:
+                    target.discard(command.get("symbol"))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            publisher.cancel()
+            await asyncio.gather(publisher, return_exceptions=True)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """啟動伺服器，回傳實際使用的 port"""
+        self._server = await websockets.serve(self.handler, host, port)
+        return next(iter(self._server.sockets)).getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake Finnhub WebSocket server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9002)
+    parser.add_argument("--trade-interval-ms", type=float, default=100.0)
+    parser.add_argument("--trades-per-message", type=int, default=1)
+    parser.add_argument("--news-interval-ms", type=float, default=5000.0)
+    parser.add_argument("--ping-interval-ms", type=float, default=10000.0)
+    args = parser.parse_args(argv)
+
+    async def serve() -> None:
+        server = FakeFinnhubWebSocket(
+            args.trade_interval_ms, args.trades_per_message, args.news_interval_ms, args.ping_interval_ms
+        )
+        port = await server.start(args.host, args.port)
+        print(f"Fake Finnhub WebSocket listening on ws://{args.host}:{port}")
+        await asyncio.Future()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+本機的假 Redis 伺服器，用於測試 CACHE_BACKEND=redis
+
+實作快取用到的 RESP 指令：PING、AUTH、SELECT、GET、SET（EX / PX / NX / XX）、DEL、EXISTS、PTTL、
+DBSIZE、FLUSHALL。不支援 EVAL，客戶端會改用比對後刪除釋放鎖。
+
+使用方式：
+    python -m tools.fake_redis --port 6390
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0 uvicorn app.main:app --workers 4
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FakeRedis:
+    """
+    Args:
+        latency_ms: 每個指令的模擬延遲（毫秒）
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.commands = 0
+        self.connections = 0
+        # key -> (值, 過期時間 time.monotonic()，None 表示不過期)
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, args: List[bytes]) -> Any:
+        """執行一個指令，回傳值依型別編碼；例外代表錯誤回覆"""
+        self.commands += 1
+        name = args[0].upper().decode("utf-8", "replace")
+        if name == "PING":
+            return "PONG" if len(args) == 1 else args[1]
+        if name in ("AUTH", "SELECT"):
+            return "OK"
+        if name == "GET":
+            return self._get(args[1])
+        if name == "SET":
+            return self._set(args[1], args[2], args[3:])
+        if name == "DEL":
+            return sum(1 for key in args[1:] if self._get(key) is not None and self._data.pop(key, None))
+        if name == "EXISTS":
+            return sum(1 for key in args[1:] if self._get(key) is not None)
+        if name == "PTTL":
+            if self._get(args[1]) is None:
+                return -2
+            expires_at = self._data[args[1]][1]
+            return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+        if name == "DBSIZE":
+            return sum(1 for key in list(self._data) if self._get(key) is not None)
+        if name == "FLUSHALL":
+            self._data.clear()
+            return "OK"
+        raise ValueError(f"ERR unknown command '{name}'")
+
+    def _set(self, key: bytes, value: bytes, options: List[bytes]) -> Any:
+        expires_at = None
+        only_missing = only_existing = False
+        index = 0
+        while index < len(options):
+            option = options[index].upper()
+            if option in (b"EX", b"PX"):
+                amount = float(options[index + 1])
+                expires_at = time.monotonic() + (amount if option == b"EX" else amount / 1000)
+                index += 2
+                continue
+            if option == b"NX":
+                only_missing = True
+            elif option == b"XX":
+                only_existing = True
+            else:
+                raise ValueError("ERR syntax error")
+            index += 1
+        exists = self._get(key) is not None
+        if (only_missing and exists) or (only_existing and not exists):
+            return None
+        self._data[key] = (value, expires_at)
+        return "OK"
+
+    @staticmethod
+    def encode(reply: Any) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, str):
+            return f"+{reply}\r\n".encode("utf-8")
+        if isinstance(reply, int):
+            return f":{reply}\r\n".encode("utf-8")
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        raise TypeError(f"Cannot encode {type(reply)}")
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # inline 指令（例如 redis-cli 以外的 telnet 測試）
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            header = await reader.readline()
+            length = int(header[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def handler(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                if self.latency > 0:
+                    await asyncio.sleep(self.latency)
+                try:
+                    reply = self.encode(self.execute(args))
+                except (ValueError, IndexError) as e:
+                    message = str(e) if isinstance(e, ValueError) else "ERR wrong number of arguments"
+                    reply = f"-{message}\r\n".encode("utf-8")
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Returns: 實際的 port"""
+        self._server = await asyncio.start_server(self.handler, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake Redis server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    async def serve() -> None:
+        server = FakeRedis(args.latency_ms)
+        port = await server.start(args.host, args.port)
+        print(f"Fake Redis listening on redis://{args.host}:{port}")
+        await asyncio.Future()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+本機的靜態頁面伺服器，作為 /scrape 壓力測試的目標網站
+
+/page/{n} 回傳以 n 為種子產生的固定文章頁面（含標題、段落、連結與 metadata），
+內容足夠長，auto 模式不會改用瀏覽器。可模擬回應延遲。
+
+使用方式：
+    python -m tools.static_pages --port 9003 --latency-ms 20
+    curl -X POST localhost:8000/scrape -d '{"url": "http://127.0.0.1:9003/page/1", "mode": "http"}'
+"""
+import argparse
+import hashlib
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+_WORDS = (
+    "market shares revenue growth quarter guidance analyst semiconductor demand supply "
+    "earnings outlook investors capital dividend margin forecast inventory pricing"
+).split()
+
+
+def render_page(number: int, paragraphs: int = 12) -> bytes:
+    """產生第 number 頁的 HTML（相同 number 內容相同）"""
+    seed = hashlib.sha256(f"page|{number}".encode("utf-8")).hexdigest()
+    rng = random.Random(int(seed[:16], 16))
+    title = f"Benchmark article {number}: " + " ".join(rng.choice(_WORDS) for _ in range(5))
+    body = "\n".join(
+        "<p>" + " ".join(rng.choice(_WORDS) for _ in range(rng.randint(40, 80))) + ".</p>"
+        for _ in range(paragraphs)
+    )
+    links = "\n".join(f'<li><a href="/page/{rng.randint(1, 10_000)}">Related {i}</a></li>' for i in range(10))
+    html = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<meta name="description" content="Static page {number} for scrape benchmarks">
+<meta property="og:title" content="{title}">
+</head>
+<body>
+<nav><a href="/">Home</a></nav>
+<article>
+<h1>{title}</h1>
+{body}
+</article>
+<aside><ul>
+{links}
+</ul></aside>
+</body>
+</html>
+"""
+    return html.encode("utf-8")
+
+
+def create_server(host: str = "127.0.0.1", port: int = 9003, latency_ms: float = 0.0,
+                  paragraphs: int = 12) -> ThreadingHTTPServer:
+    """
+    Args:
+        latency_ms: 每個請求的模擬延遲（毫秒）
+        paragraphs: 每頁的段落數量（控制頁面大小）
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            if latency_ms > 0:
+                time.sleep(latency_ms / 1000)
+            path = self.path.split("?", 1)[0]
+            if path == "/":
+                number = 0
+            elif path.startswith("/page/") and path[len("/page/"):].isdigit():
+                number = int(path[len("/page/"):])
+            else:
+                self.send_error(404)
+                return
+            body = render_page(number, paragraphs)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Static page server for scrape benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9003)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--paragraphs", type=int, default=12)
+    args = parser.parse_args(argv)
+    server = create_server(args.host, args.port, args.latency_ms, args.paragraphs)
+    print(f"Static pages listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()